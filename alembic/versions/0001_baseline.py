@@ -0,0 +1,73 @@
+"""Baseline schema: books, members, borrows
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+Matches the tables previously created by Base.metadata.create_all. An
+existing database created that way can be adopted with
+``alembic stamp 0001_baseline``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _timestamps():
+    return [
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "books",
+        sa.Column("title", sa.String(length=255), nullable=False),
+        sa.Column("author", sa.String(length=255), nullable=False),
+        sa.Column("total_copies", sa.Integer(), nullable=False),
+        sa.Column("available_copies", sa.Integer(), nullable=False),
+        *_timestamps(),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_books_id", "books", ["id"])
+    op.create_table(
+        "members",
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=False),
+        sa.Column("hashed_password", sa.String(length=255), nullable=False),
+        *_timestamps(),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+    )
+    op.create_index("ix_members_id", "members", ["id"])
+    op.create_table(
+        "borrows",
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("member_id", sa.Integer(), nullable=False),
+        sa.Column("notification_sent", sa.Boolean(), nullable=True),
+        sa.Column("return_date", sa.DateTime(), nullable=True),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"]),
+        sa.ForeignKeyConstraint(["member_id"], ["members.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_borrows_id", "borrows", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_borrows_id", table_name="borrows")
+    op.drop_table("borrows")
+    op.drop_index("ix_members_id", table_name="members")
+    op.drop_table("members")
+    op.drop_index("ix_books_id", table_name="books")
+    op.drop_table("books")
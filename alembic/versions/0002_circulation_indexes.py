@@ -0,0 +1,40 @@
+"""Indexes for the circulation hot paths
+
+Revision ID: 0002_circulation_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-18 00:00:01
+
+- ix_borrows_member_created: member history pages, keyset on (created_at, id)
+- ix_borrows_member_open: open borrows per member (partial, return_date IS NULL)
+- ix_borrows_open_created: overdue scan over open borrows by date (partial)
+- ix_borrows_book_id: per-book lookups
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_circulation_indexes"
+down_revision: Union[str, None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPEN = sa.text("return_date IS NULL")
+
+
+def upgrade() -> None:
+    op.create_index("ix_borrows_member_created", "borrows", ["member_id", "created_at", "id"])
+    op.create_index("ix_borrows_member_open", "borrows", ["member_id", "created_at"],
+                    sqlite_where=OPEN, postgresql_where=OPEN)
+    op.create_index("ix_borrows_open_created", "borrows", ["created_at"],
+                    sqlite_where=OPEN, postgresql_where=OPEN)
+    op.create_index("ix_borrows_book_id", "borrows", ["book_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_borrows_book_id", table_name="borrows")
+    op.drop_index("ix_borrows_open_created", table_name="borrows")
+    op.drop_index("ix_borrows_member_open", table_name="borrows")
+    op.drop_index("ix_borrows_member_created", table_name="borrows")
@@ -0,0 +1,76 @@
+"""Full-text search index over book titles and authors
+
+Revision ID: 0003_book_search
+Revises: 0002_circulation_indexes
+Create Date: 2026-10-18 00:00:02
+
+SQLite: external-content FTS5 table books_fts kept in sync by triggers.
+Postgres: generated tsvector column books.search_vector with a GIN index.
+Existing books are indexed as part of the upgrade.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_book_search"
+down_revision: Union[str, None] = "0002_circulation_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE books_fts USING fts5("
+    "title, author, content='books', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER books_fts_insert AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END",
+    "CREATE TRIGGER books_fts_delete AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); END",
+    "CREATE TRIGGER books_fts_update AFTER UPDATE OF title, author ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); "
+    "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END",
+    "INSERT INTO books_fts(books_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS books_fts_update",
+    "DROP TRIGGER IF EXISTS books_fts_delete",
+    "DROP TRIGGER IF EXISTS books_fts_insert",
+    "DROP TABLE IF EXISTS books_fts",
+]
+
+POSTGRES_UPGRADE = [
+    "ALTER TABLE books ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(author, '')), 'B')) STORED",
+    "CREATE INDEX ix_books_search_vector ON books USING GIN (search_vector)",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_books_search_vector",
+    "ALTER TABLE books DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements) -> None:
+    for statement in statements:
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        _run(SQLITE_UPGRADE)
+    elif dialect == "postgresql":
+        _run(POSTGRES_UPGRADE)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        _run(SQLITE_DOWNGRADE)
+    elif dialect == "postgresql":
+        _run(POSTGRES_DOWNGRADE)
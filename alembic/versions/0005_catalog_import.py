@@ -0,0 +1,78 @@
+"""ISBN natural key for bulk imports and admin members
+
+Revision ID: 0005_catalog_import
+Revises: 0004_borrow_versions
+Create Date: 2026-10-18 00:00:04
+
+- books.isbn with the unique index ix_books_isbn, the conflict target of
+  catalog import upserts (books without an ISBN never conflict)
+- members.is_admin, required by the import endpoint
+- SQLite: books_fts_paused, and books_fts_insert recreated with a WHEN
+  clause on it, so bulk imports can index their rows in one statement;
+  books_fts_update only fires when the title or author actually changes
+
+Both columns are added in place; books is not rebuilt, so the FTS
+triggers from 0003 stay intact on SQLite.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_catalog_import"
+down_revision: Union[str, None] = "0004_borrow_versions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+FTS_INSERT = (
+    "CREATE TRIGGER books_fts_insert AFTER INSERT ON books{when} BEGIN "
+    "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END"
+)
+
+FTS_UPDATE = (
+    "CREATE TRIGGER books_fts_update AFTER UPDATE OF title, author ON books{when} BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); "
+    "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END"
+)
+
+SQLITE_UPGRADE = [
+    "CREATE TABLE books_fts_paused (paused INTEGER NOT NULL)",
+    "DROP TRIGGER books_fts_insert",
+    FTS_INSERT.format(when=" WHEN NOT EXISTS (SELECT 1 FROM books_fts_paused)"),
+    "DROP TRIGGER books_fts_update",
+    FTS_UPDATE.format(when=" WHEN old.title IS NOT new.title OR old.author IS NOT new.author"),
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER books_fts_update",
+    FTS_UPDATE.format(when=""),
+    "DROP TRIGGER books_fts_insert",
+    FTS_INSERT.format(when=""),
+    "DROP TABLE books_fts_paused",
+]
+
+
+def _run_sqlite(statements) -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        for statement in statements:
+            op.execute(statement)
+
+
+def upgrade() -> None:
+    op.add_column("books", sa.Column("isbn", sa.String(13), nullable=True))
+    op.create_index("ix_books_isbn", "books", ["isbn"], unique=True)
+    op.add_column("members", sa.Column("is_admin", sa.Boolean(), nullable=False,
+                                       server_default=sa.false()))
+    _run_sqlite(SQLITE_UPGRADE)
+
+
+def downgrade() -> None:
+    _run_sqlite(SQLITE_DOWNGRADE)
+    op.drop_index("ix_books_isbn", table_name="books")
+    # In-place DROP COLUMN needs SQLite 3.35+
+    op.drop_column("members", "is_admin")
+    op.drop_column("books", "isbn")
@@ -0,0 +1,45 @@
+"""Transactional outbox for borrow and return notifications
+
+Revision ID: 0006_outbox
+Revises: 0005_catalog_import
+Create Date: 2026-10-18 00:00:05
+
+- outbox: tasks written in the same transaction as the borrow change and
+  published by the dispatcher (app.tasks.outbox), which deletes them once
+  sent
+- ix_outbox_available on (available_at, id), the dispatcher's claim order
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_outbox"
+down_revision: Union[str, None] = "0005_catalog_import"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("task", sa.String(100), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("available_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.String(500), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_outbox_id", "outbox", ["id"])
+    op.create_index("ix_outbox_available", "outbox", ["available_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_available", table_name="outbox")
+    op.drop_index("ix_outbox_id", table_name="outbox")
+    op.drop_table("outbox")
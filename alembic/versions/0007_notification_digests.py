@@ -0,0 +1,36 @@
+"""Per-member coalescing of outbox notifications
+
+Revision ID: 0007_notification_digests
+Revises: 0006_outbox
+Create Date: 2026-10-18 00:00:06
+
+- outbox.member_id, the coalescing key: the dispatcher sends all pending
+  notifications of a member as one digest email
+- ix_outbox_member, used to gather a member's pending rows once one of
+  them is due
+
+Rows written before this revision have no member and are published one
+by one, as before.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_notification_digests"
+down_revision: Union[str, None] = "0006_outbox"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("outbox", sa.Column("member_id", sa.Integer(), nullable=True))
+    op.create_index("ix_outbox_member", "outbox", ["member_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_member", table_name="outbox")
+    # In-place DROP COLUMN needs SQLite 3.35+
+    op.drop_column("outbox", "member_id")
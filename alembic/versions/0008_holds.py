@@ -0,0 +1,56 @@
+"""Holds: per-book waitlists for titles with no copies left
+
+Revision ID: 0008_holds
+Revises: 0007_notification_digests
+Create Date: 2026-10-18 00:00:07
+
+- holds, served in id order; returns check the copy out to the oldest
+  waiting hold in the same transaction
+- ix_holds_queue on (book_id, id, status) for waiting holds only: the
+  next-in-line lookup and the position count read it without touching
+  hold rows
+- ix_holds_member_waiting, unique: one waiting hold per member and book
+- ix_holds_member for a member's holds
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_holds"
+down_revision: Union[str, None] = "0007_notification_digests"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+WAITING = sa.text("status = 'waiting'")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "holds",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id"), nullable=False),
+        sa.Column("member_id", sa.Integer(), sa.ForeignKey("members.id"), nullable=False),
+        sa.Column("status", sa.String(10), nullable=False),
+        sa.Column("borrow_id", sa.Integer(), sa.ForeignKey("borrows.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_holds_id", "holds", ["id"])
+    op.create_index("ix_holds_queue", "holds", ["book_id", "id", "status"],
+                    sqlite_where=WAITING, postgresql_where=WAITING)
+    op.create_index("ix_holds_member_waiting", "holds", ["book_id", "member_id"], unique=True,
+                    sqlite_where=WAITING, postgresql_where=WAITING)
+    op.create_index("ix_holds_member", "holds", ["member_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_holds_member", table_name="holds")
+    op.drop_index("ix_holds_member_waiting", table_name="holds")
+    op.drop_index("ix_holds_queue", table_name="holds")
+    op.drop_index("ix_holds_id", table_name="holds")
+    op.drop_table("holds")
@@ -0,0 +1,63 @@
+"""Per-copy inventory
+
+Revision ID: 0009_book_copies
+Revises: 0008_holds
+Create Date: 2026-10-18 00:00:08
+
+- book_copies, one row per physical copy with its barcode and condition;
+  only used with INVENTORY_MODEL=copies
+- ix_book_copies_free on (book_id, id, status) for available copies only:
+  borrows claim a copy from it and available_copies is counted from it
+- borrows.copy_id, the copy a borrow checked out
+
+Existing books get their copies from `python -m app.services.inventory
+sync`, which also attaches the open borrows to them.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009_book_copies"
+down_revision: Union[str, None] = "0008_holds"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+AVAILABLE = sa.text("status = 'available'")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "book_copies",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id"), nullable=False),
+        sa.Column("barcode", sa.String(32), nullable=True),
+        sa.Column("condition", sa.String(20), nullable=True),
+        sa.Column("status", sa.String(10), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_book_copies_id", "book_copies", ["id"])
+    op.create_index("ix_book_copies_free", "book_copies", ["book_id", "id", "status"],
+                    sqlite_where=AVAILABLE, postgresql_where=AVAILABLE)
+    op.create_index("ix_book_copies_book", "book_copies", ["book_id"])
+    op.create_index("ix_book_copies_barcode", "book_copies", ["barcode"], unique=True)
+    # SQLite cannot add a foreign key in place; batch mode copies the table
+    with op.batch_alter_table("borrows") as batch_op:
+        batch_op.add_column(sa.Column("copy_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key("fk_borrows_copy_id", "book_copies", ["copy_id"], ["id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("borrows") as batch_op:
+        batch_op.drop_constraint("fk_borrows_copy_id", type_="foreignkey")
+        batch_op.drop_column("copy_id")
+    op.drop_index("ix_book_copies_barcode", table_name="book_copies")
+    op.drop_index("ix_book_copies_book", table_name="book_copies")
+    op.drop_index("ix_book_copies_free", table_name="book_copies")
+    op.drop_index("ix_book_copies_id", table_name="book_copies")
+    op.drop_table("book_copies")
@@ -0,0 +1,49 @@
+"""Overdue reminders tracked apart from notification_sent
+
+Revision ID: 0010_overdue_notified
+Revises: 0009_book_copies
+Create Date: 2026-10-18 00:00:09
+
+- borrows.overdue_notified_at, when the overdue scan reminded the member;
+  notification_sent goes back to meaning the return was notified
+- ix_borrows_overdue_pending on (created_at, id, member_id) for open
+  borrows not reminded yet: the overdue scan reads only those. It
+  replaces ix_borrows_open_created, which also held every open borrow
+  already reminded
+
+Open borrows the scan had flagged through notification_sent are carried
+over to overdue_notified_at so they are not reminded a second time.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010_overdue_notified"
+down_revision: Union[str, None] = "0009_book_copies"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPEN = sa.text("return_date IS NULL")
+PENDING = sa.text("return_date IS NULL AND overdue_notified_at IS NULL")
+
+
+def upgrade() -> None:
+    op.add_column("borrows", sa.Column("overdue_notified_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE borrows SET overdue_notified_at = CURRENT_TIMESTAMP, notification_sent = false "
+               "WHERE return_date IS NULL AND notification_sent = true")
+    op.create_index("ix_borrows_overdue_pending", "borrows", ["created_at", "id", "member_id"],
+                    sqlite_where=PENDING, postgresql_where=PENDING)
+    op.drop_index("ix_borrows_open_created", table_name="borrows")
+
+
+def downgrade() -> None:
+    op.create_index("ix_borrows_open_created", "borrows", ["created_at"],
+                    sqlite_where=OPEN, postgresql_where=OPEN)
+    op.drop_index("ix_borrows_overdue_pending", table_name="borrows")
+    op.execute("UPDATE borrows SET notification_sent = true "
+               "WHERE return_date IS NULL AND overdue_notified_at IS NOT NULL")
+    with op.batch_alter_table("borrows") as batch_op:
+        batch_op.drop_column("overdue_notified_at")
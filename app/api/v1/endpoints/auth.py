@@ -1,7 +1,7 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.models.base import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.base import get_async_db
 from app.models.member import Member
 from app.schemas.auth import LoginRequest, TokenResponse
 from app.schemas.member import MemberCreate, MemberResponse
@@ -15,7 +15,7 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(login_request: LoginRequest, db: Session = Depends(get_db)):
+async def login(login_request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     try:
         return await login_member(login_request, db)
     except HTTPException as e:
@@ -27,5 +27,5 @@ async def login(login_request: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/register", response_model=MemberResponse)
-async def register(member: MemberCreate, db: Session = Depends(get_db)):
+async def register(member: MemberCreate, db: AsyncSession = Depends(get_async_db)):
     return await register_member(member, db)
@@ -0,0 +1,72 @@
+from typing import List
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.base import get_async_db
+from app.schemas.book import BookImportReport, BookResponse, BookSearchResponse, BookSuggestion
+from app.core.http_cache import is_not_modified, make_etag, not_modified_response, set_validators
+from app.core.responses import json_response
+from app.core.security import get_current_admin_user
+from app.models.member import Member
+from app.services.book_service import autocomplete_books, get_book, get_book_version, search_books
+from app.services.catalog_import import import_books, parse_records
+
+router = APIRouter()
+
+
+@router.get("/search", response_model=BookSearchResponse)
+async def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200, description="Words from the title or author"),
+    available: bool = Query(False, description="Only books with a copy on the shelf"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Search the catalog by title and author, best matches first."""
+    books, next_offset = await search_books(db, q, available_only=available, limit=limit, offset=offset)
+    return json_response(BookSearchResponse, {"items": books, "next_offset": next_offset})
+
+
+@router.get("/autocomplete", response_model=List[BookSuggestion])
+async def autocomplete_catalog(
+    q: str = Query(..., min_length=1, max_length=100),
+    available: bool = Query(False),
+    limit: int = Query(10, ge=1, le=25),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Suggest books while the user is typing; every word is a prefix."""
+    books = await autocomplete_books(db, q, limit=limit, available_only=available)
+    return json_response(List[BookSuggestion], books)
+
+
+@router.get("/{book_id}", response_model=BookResponse)
+async def get_book_endpoint(
+    book_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get one book, with ETag/Last-Modified for conditional requests."""
+    updated_at = await get_book_version(db, book_id)
+    etag = make_etag("book", book_id, updated_at)
+    if is_not_modified(request, etag, updated_at):
+        return not_modified_response(etag, updated_at)
+    response = json_response(BookResponse, await get_book(db, book_id, version=updated_at))
+    set_validators(response, etag, updated_at)
+    return response
+
+
+@router.post("/import", response_model=BookImportReport)
+async def import_catalog(
+    request: Request,
+    fmt: str = Query(..., alias="format", pattern="^(csv|ndjson|marc)$",
+                     description="Body format: csv (with header), ndjson or marc (ISO 2709)"),
+    on_conflict: str = Query("update", pattern="^(update|skip)$",
+                             description="Update or keep books whose ISBN already exists"),
+    db: AsyncSession = Depends(get_async_db),
+    current_member: Member = Depends(get_current_admin_user)
+):
+    """Bulk-load books from a streamed request body (admin only).
+
+    The body is parsed as it arrives and written in committed chunks; the
+    report counts written and rejected records.
+    """
+    return await import_books(db, parse_records(fmt, request.stream()), on_conflict=on_conflict)
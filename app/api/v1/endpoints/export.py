@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi.responses import StreamingResponse
+from app.core.security import get_current_admin_user
+from app.models.base import get_async_session_factory
+from app.models.member import Member
+from app.services.catalog_export import MEDIA_TYPES, encode_export, export_filename, export_query, \
+    export_rows, parquet_available
+
+router = APIRouter()
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str = Path(..., pattern="^(books|members|borrows)$"),
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    since: Optional[datetime] = Query(None, description="Created on or after (borrow date for borrows)"),
+    until: Optional[datetime] = Query(None, description="Created before"),
+    member_id: Optional[int] = Query(None, description="Only this member (borrows, members)"),
+    gzip: bool = Query(False, description="Gzip the csv or ndjson stream"),
+    session_factory=Depends(get_async_session_factory),
+    current_member: Member = Depends(get_current_admin_user)
+):
+    """Stream books, members (without password hashes) or borrows (admin only).
+
+    Rows are read through a server-side cursor and encoded chunk by chunk,
+    so exports of any size run in flat memory.
+    """
+    if fmt == "parquet" and not parquet_available():
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                            detail="Parquet export needs pyarrow installed")
+    try:
+        query = export_query(dataset, since=since, until=until, member_id=member_id)
+        chunks = encode_export(dataset, fmt, export_rows(session_factory, query), gzip=gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    filename = export_filename(dataset, fmt, gzip)
+    return StreamingResponse(chunks, media_type="application/gzip" if gzip else MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.models.base import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.base import get_async_db
 from app.schemas.book import BookCreate, BookResponse
 from app.services.book_service import create_book
 
@@ -9,6 +9,6 @@ router = APIRouter()
 
 @router.post("/", response_model=BookResponse)
 async def create_book_endpoint(book_data: BookCreate,
-                               db: Session = Depends(get_db)):
+                               db: AsyncSession = Depends(get_async_db)):
     """Register a new book in the library."""
     return await create_book(db, book_data)
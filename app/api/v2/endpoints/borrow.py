@@ -1,47 +1,150 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.models.base import get_db
-from app.schemas.borrow import BorrowRequest, BorrowResponse
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.base import get_async_db, get_async_session_factory
+from app.schemas.borrow import BatchResponse, BorrowBatchRequest, BorrowCreate, \
+    BorrowRequest, BorrowResponse, HoldRequest, HoldResponse, ReturnBatchRequest
 from app.services.borrow_service import borrow_book, \
-    return_book, get_member_borrows
-from app.tasks.email_tasks import send_borrow_email, send_return_email
-from app.core.security import get_current_member
+    return_book, get_member_borrows, borrow_books, return_books, \
+    stream_member_borrows, encode_borrow_cursor, get_member_borrows_version
+from app.services.hold_service import cancel_hold, get_hold, place_hold
+from app.core.http_cache import is_not_modified, make_etag, not_modified_response, \
+    set_validators
+from app.core.responses import dump_json, json_response
+from app.core.security import get_current_user
 from app.models.member import Member
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
 
+def _batch_response(results) -> BatchResponse:
+    succeeded = sum(1 for result in results if result.ok)
+    return BatchResponse(succeeded=succeeded, failed=len(results) - succeeded,
+                         results=results)
+
+
 @router.post("/", response_model=BorrowResponse)
 async def borrow_book_endpoint(
     request: BorrowRequest,
-    db: Session = Depends(get_db),
-    current_member: Member = Depends(get_current_member)
+    db: AsyncSession = Depends(get_async_db),
+    current_member: Member = Depends(get_current_user)
 ):
     """Borrow a book (v2, with email notification)."""
-    borrow = borrow_book(db, request.book_id,
-                         current_member.id, api_version="v2")
-    send_borrow_email.delay(current_member.id, request.book_id)
+    borrow = await borrow_book(BorrowCreate(book_id=request.book_id,
+                                            member_id=current_member.id), db)
     return borrow
 
 
+@router.post("/batch", response_model=BatchResponse)
+async def borrow_books_endpoint(
+    request: BorrowBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_member: Member = Depends(get_current_user)
+):
+    """Borrow several books in one transaction (v2, one grouped notification)."""
+    results = await borrow_books([BorrowCreate(book_id=item.book_id,
+                                               member_id=current_member.id)
+                                  for item in request.items], db)
+    return _batch_response(results)
+
+
+@router.post("/return/batch", response_model=BatchResponse)
+async def return_books_endpoint(
+    request: ReturnBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_member: Member = Depends(get_current_user)
+):
+    """Return several books in one transaction (v2, one grouped notification)."""
+    results = await return_books([item.borrow_id for item in request.items], db)
+    return _batch_response(results)
+
+
 @router.post("/{borrow_id}/return", response_model=BorrowResponse)
 async def return_book_endpoint(
     borrow_id: int,
-    db: Session = Depends(get_db),
-    current_member: Member = Depends(get_current_member)
+    db: AsyncSession = Depends(get_async_db),
+    current_member: Member = Depends(get_current_user)
 ):
     """Return a book (v2, with email notification)."""
-    borrow = return_book(db, borrow_id, api_version="v2")
-    send_return_email.delay(borrow.member_id, borrow.book_id)
+    borrow = await return_book(borrow_id, db)
     return borrow
 
 
+@router.post("/holds", response_model=HoldResponse)
+async def place_hold_endpoint(
+    request: HoldRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_member: Member = Depends(get_current_user)
+):
+    """Join the waitlist of a book with no copies left (v2).
+
+    The next returned copy is checked out to the oldest hold and its
+    member notified, so there is no need to retry the borrow.
+    """
+    return await place_hold(request.book_id, current_member.id, db)
+
+
+@router.get("/holds/{hold_id}", response_model=HoldResponse)
+async def get_hold_endpoint(
+    hold_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_member: Member = Depends(get_current_user)
+):
+    """Get a hold with its current position in the waitlist (v2).
+
+    Members see their own holds only; admins see any.
+    """
+    return await get_hold(hold_id, db, None if current_member.is_admin else current_member.id)
+
+
+@router.delete("/holds/{hold_id}", response_model=HoldResponse)
+async def cancel_hold_endpoint(
+    hold_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_member: Member = Depends(get_current_user)
+):
+    """Leave the waitlist (v2). Members cancel their own holds only; admins any."""
+    return await cancel_hold(hold_id, db, None if current_member.is_admin else current_member.id)
+
+
 @router.get("/member/{member_id}", response_model=List[BorrowResponse])
-def get_member_borrows_endpoint(
+async def get_member_borrows_endpoint(
     member_id: int,
-    db: Session = Depends(get_db),
-    current_member: Member = Depends(get_current_member)
+    request: Request,
+    state: Optional[str] = Query(None, alias="status", pattern="^(open|returned)$",
+                                 description="Only open or only returned borrows"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=500),
+    stream: bool = Query(False, description="Stream the whole history as NDJSON"),
+    db: AsyncSession = Depends(get_async_db),
+    session_factory=Depends(get_async_session_factory),
+    current_member: Member = Depends(get_current_user)
 ):
-    """Get all borrowed books for a member."""
-    return get_member_borrows(db, member_id)
+    """Get a member's borrows, newest first, keyset-paginated or streamed.
+
+    Responses carry ETag and Last-Modified; conditional requests are
+    answered with 304 from a count/max(updated_at) probe alone.
+    """
+    version = await get_member_borrows_version(member_id, db)
+    etag = make_etag("borrows", member_id, state, cursor, limit, stream, *version)
+    last_modified = version[1]
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    if stream:
+        async def ndjson():
+            async for borrow in stream_member_borrows(member_id, session_factory,
+                                                      state=state, cursor=cursor):
+                yield dump_json(BorrowResponse, borrow) + b"\n"
+        streaming = StreamingResponse(ndjson(), media_type="application/x-ndjson")
+        set_validators(streaming, etag, last_modified)
+        return streaming
+    borrows = await get_member_borrows(member_id, db, state=state,
+                                       cursor=cursor, limit=limit + 1, version=version)
+    headers = {}
+    if len(borrows) > limit:
+        borrows = borrows[:limit]
+        headers["X-Next-Cursor"] = encode_borrow_cursor(borrows[-1])
+    response = json_response(List[BorrowResponse], borrows, headers=headers)
+    set_validators(response, etag, last_modified)
+    return response
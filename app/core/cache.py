@@ -0,0 +1,451 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU mapping whose entries expire after ttl seconds.
+
+    Counters (hits, misses, evictions, expirations) are kept for the health
+    endpoints; stats() returns them together with the current size.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] <= now:
+                del self._data[key]
+                self._counters["expirations"] += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self._counters["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters, size=len(self._data), maxsize=self.maxsize, ttl=self.ttl)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+
+
+class RedisTier:
+    """Optional shared JSON cache in Redis, used behind a TTLCache.
+
+    redis.asyncio clients are tied to the event loop that created them, so
+    one client is kept per loop. Redis errors are logged and counted and
+    treated as misses: the shared tier must never fail a request. After an
+    error the tier is skipped for `retry_after` seconds so an unreachable
+    Redis costs one timeout, not one per request.
+
+    Every tag also has a generation counter that invalidate_tags() bumps,
+    so a process can tell whether a tag was invalidated anywhere while it
+    was loading a value (see set_if_current).
+    """
+
+    # Generation counters outlive any load by far; they only expire so
+    # tags of deleted rows do not pile up
+    generation_ttl = 86400
+
+    def __init__(self, url: str, prefix: str, ttl: float, retry_after: float = 5):
+        self.url = url
+        self.prefix = prefix
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self.counters = {"hits": 0, "misses": 0, "errors": 0}
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            import redis.asyncio as redis_asyncio
+            client = self._clients[loop] = redis_asyncio.from_url(
+                self.url, socket_timeout=0.5, socket_connect_timeout=0.5
+            )
+        return client
+
+    def _key(self, key) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    def _generation_key(self, tag: str) -> str:
+        return f"{self.prefix}:gen:{tag}"
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, action: str, e: Exception):
+        self.counters["errors"] += 1
+        self._down_until = time.monotonic() + self.retry_after
+        logger.warning(f"Redis cache {action} failed, skipping Redis for {self.retry_after}s: {e}")
+
+    async def get(self, key):
+        if not self.available:
+            return None
+        try:
+            raw = await self._client().get(self._key(key))
+        except Exception as e:
+            self._failed(f"read of {self._key(key)}", e)
+            return None
+        if raw is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return json.loads(raw)
+
+    async def set(self, key, value, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        """Store a value and register it under each tag for invalidate_tags()."""
+        if not self.available:
+            return
+        ttl = int(ttl or self.ttl)
+        try:
+            pipe = self._client().pipeline(transaction=False)
+            self._queue_set(pipe, key, value, ttl, tags)
+            await pipe.execute()
+        except Exception as e:
+            self._failed(f"write of {self._key(key)}", e)
+
+    def _queue_set(self, pipe, key, value, ttl: int, tags: Iterable[str]):
+        pipe.set(self._key(key), json.dumps(value, default=str), ex=ttl)
+        for tag in tags:
+            pipe.sadd(self._tag_key(tag), self._key(key))
+            pipe.expire(self._tag_key(tag), ttl)
+
+    async def generations(self, tags: Iterable[str]) -> Optional[list]:
+        """Current generation of each tag, or None when Redis cannot be read."""
+        tags = tuple(tags)
+        if not tags:
+            return []
+        if not self.available:
+            return None
+        try:
+            return await self._client().mget(*(self._generation_key(tag) for tag in tags))
+        except Exception as e:
+            self._failed("generation read", e)
+            return None
+
+    async def set_if_current(self, key, value, generations: list, ttl: Optional[float] = None,
+                             tags: Iterable[str] = ()) -> bool:
+        """Store a value unless one of its tags was invalidated since generations().
+
+        The generation keys are WATCHed from the check to the write, so an
+        invalidation by any process in between aborts the write as well.
+        Returns False only for such a stale value; Redis errors are logged
+        as in set().
+        """
+        from redis.exceptions import WatchError
+
+        tags = tuple(tags)
+        if not tags:
+            await self.set(key, value, ttl=ttl)
+            return True
+        if not self.available:
+            return True
+        ttl = int(ttl or self.ttl)
+        generation_keys = [self._generation_key(tag) for tag in tags]
+        try:
+            async with self._client().pipeline(transaction=True) as pipe:
+                await pipe.watch(*generation_keys)
+                if await pipe.mget(*generation_keys) != generations:
+                    return False
+                pipe.multi()
+                self._queue_set(pipe, key, value, ttl, tags)
+                await pipe.execute()
+        except WatchError:
+            return False
+        except Exception as e:
+            self._failed(f"write of {self._key(key)}", e)
+        return True
+
+    async def delete(self, *keys):
+        if not keys or not self.available:
+            return
+        try:
+            await self._client().delete(*(self._key(key) for key in keys))
+        except Exception as e:
+            self._failed("delete", e)
+
+    async def invalidate_tags(self, *tags: str):
+        """Bump the tags' generations, then delete every key registered under them, and the tags.
+
+        Bumping first means a load racing this call either registered its
+        key in time to be deleted here or fails set_if_current().
+        """
+        if not tags or not self.available:
+            return
+        try:
+            client = self._client()
+            pipe = client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(self._generation_key(tag))
+                pipe.expire(self._generation_key(tag), self.generation_ttl)
+            await pipe.execute()
+            tag_keys = [self._tag_key(tag) for tag in tags]
+            keys = set()
+            for tag_key in tag_keys:
+                keys.update(await client.smembers(tag_key))
+            await client.delete(*keys, *tag_keys)
+        except Exception as e:
+            self._failed("tag invalidation", e)
+
+
+class ReadThroughCache:
+    """Two-tier read-through cache with tag invalidation.
+
+    Lookups go to the in-process TTLCache, then Redis (when configured),
+    then the loader. Concurrent misses for one key share a single load
+    (no stampede on a hot entry), and TTLs get a little jitter so entries
+    written together do not expire together. Entries carry tags such as
+    "book:7"; invalidate_tags() drops them from both tiers. A load that
+    overlaps an invalidation of one of its tags is returned but not stored:
+    within the process through _loading, and in Redis through the tag
+    generations read before the load (RedisTier.set_if_current), which
+    also catches invalidations made by other processes. Those cannot reach
+    this process's local tier, though, so it may serve a value for up to
+    its short TTL after another process invalidated it.
+    """
+
+    def __init__(self, local: TTLCache, redis: Optional[RedisTier] = None,
+                 ttl: float = 300, jitter: float = 0.1):
+        self.local = local
+        self.redis = redis
+        self.ttl = ttl
+        self.jitter = jitter
+        self._tag_keys: dict[str, set] = {}
+        # Tags with a load in flight -> [loads, invalidated during the load]
+        self._loading: dict[str, list] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {"loads": 0, "coalesced": 0, "stale_loads": 0, "invalidations": 0}
+
+    def _jittered(self, ttl: float) -> float:
+        return ttl * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _index(self, key: str, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                keys = self._tag_keys.setdefault(tag, set())
+                keys.add(key)
+                if len(keys) > 64:
+                    # Forget keys the LRU has already evicted
+                    keys.intersection_update({k for k in keys if k in self.local})
+
+    def _begin_load(self, tags: tuple):
+        with self._lock:
+            for tag in tags:
+                self._loading.setdefault(tag, [0, False])[0] += 1
+
+    def _end_load(self, tags: tuple) -> bool:
+        """Finish a load; True when one of its tags was invalidated meanwhile."""
+        invalidated = False
+        with self._lock:
+            for tag in tags:
+                state = self._loading[tag]
+                invalidated = invalidated or state[1]
+                state[0] -= 1
+                if state[0] == 0:
+                    del self._loading[tag]
+        return invalidated
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                          tags: Iterable[str] = (), ttl: Optional[float] = None):
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        tags = tuple(tags)
+        if self.redis is not None:
+            value = await self.redis.get(key)
+            if value is not None:
+                self.local.set(key, value)
+                self._index(key, tags)
+                return value
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight.get_loop() is asyncio.get_running_loop():
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._begin_load(tags)
+        generations = None
+        try:
+            if self.redis is not None:
+                generations = await self.redis.generations(tags)
+            self.counters["loads"] += 1
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark it retrieved for the no-waiter case
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            invalidated = self._end_load(tags)
+        if invalidated:
+            self.counters["stale_loads"] += 1
+            return value
+        ttl = self._jittered(ttl or self.ttl)
+        self.local.set(key, value, ttl=min(ttl, self.local.ttl))
+        self._index(key, tags)
+        # Without generations (Redis was down) the value stays out of Redis
+        if generations is None:
+            return value
+        if not await self.redis.set_if_current(key, value, generations, ttl=ttl, tags=tags):
+            # Another process invalidated a tag while this one was loading
+            self.local.pop(key)
+            self.counters["stale_loads"] += 1
+        return value
+
+    async def invalidate_tags(self, *tags: str):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                if tag in self._loading:
+                    self._loading[tag][1] = True
+                keys.update(self._tag_keys.pop(tag, ()))
+        for key in keys:
+            self.local.pop(key)
+        self.counters["invalidations"] += len(tags)
+        if self.redis is not None:
+            await self.redis.invalidate_tags(*tags)
+
+    def clear(self):
+        self.local.clear()
+        with self._lock:
+            self._tag_keys.clear()
+
+    def stats(self) -> dict:
+        local = self.local.stats()
+        redis = dict(self.redis.counters) if self.redis is not None else None
+        hits = local["hits"] + (redis["hits"] if redis else 0)
+        lookups = local["hits"] + local["misses"]
+        return {
+            "local": local,
+            "redis": redis,
+            **self.counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache: Optional[ReadThroughCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[ReadThroughCache]:
+    """Process-wide service cache configured by CACHE_BACKEND, or None when off."""
+    global _cache
+    if _cache is None:
+        from app.core.config import settings
+        if settings.CACHE_BACKEND == "none":
+            return None
+        with _cache_lock:
+            if _cache is None:
+                redis = RedisTier(settings.REDIS_URL, "cache", settings.CACHE_TTL) \
+                    if settings.CACHE_BACKEND == "tiered" else None
+                _cache = ReadThroughCache(
+                    TTLCache(maxsize=settings.CACHE_LOCAL_SIZE, ttl=settings.CACHE_LOCAL_TTL),
+                    redis, ttl=settings.CACHE_TTL,
+                )
+    return _cache
+
+
+def set_cache(cache: Optional[ReadThroughCache]):
+    """Replace the process-wide cache (tests, custom backends)."""
+    global _cache
+    _cache = cache
+
+
+async def invalidate_tags(*tags: str):
+    cache = get_cache()
+    if cache is not None:
+        await cache.invalidate_tags(*tags)
+
+
+def cached(key: Callable[[dict], str], tags: Callable[[dict], Iterable[str]] = lambda args: (),
+           encode: Callable[[Any], Any] = lambda value: value,
+           decode: Callable[[Any], Any] = lambda value: value,
+           ttl: Optional[float] = None):
+    """Wrap an async service function in the read-through cache.
+
+    key and tags receive the call's arguments by name (defaults applied).
+    encode turns the result into JSON-safe data for storage; decode turns
+    stored data back into what the function returns, on hits and misses
+    alike, so callers always get the same type. The undecorated function
+    stays available as `.uncached`.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return decode(encode(await func(*args, **kwargs)))
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+
+            async def load():
+                return encode(await func(*args, **kwargs))
+            return decode(await cache.get_or_load(key(arguments), load, tags(arguments), ttl))
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
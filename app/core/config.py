@@ -1,6 +1,11 @@
+import logging
+from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings
 from pydantic import ValidationError
 
+logger = logging.getLogger(__name__)
+
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
@@ -12,6 +17,46 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str
     JWT_SECRET_KEY: str
     JWT_EXPIRE_MINUTES: int = 30
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: int = 30
+    OVERDUE_DAYS: int = 14
+    OVERDUE_CHUNK_SIZE: int = 1000
+    SMTP_USE_TLS: bool = True
+    SMTP_TIMEOUT: int = 30
+    SMTP_POOL_SIZE: int = 4
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    MEMBER_CACHE_SIZE: int = 10000
+    MEMBER_CACHE_TTL: int = 60
+    MEMBER_CACHE_REDIS_URL: Optional[str] = None
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    AUTOCOMPLETE_RANK_WINDOW: int = 200
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL: int = 300
+    CACHE_LOCAL_TTL: int = 30
+    CACHE_LOCAL_SIZE: int = 10000
+    IMPORT_CHUNK_SIZE: int = 5000
+    IMPORT_MAX_REJECTS_REPORTED: int = 100
+    EXPORT_CHUNK_SIZE: int = 10000
+    WORKER_METRICS_PORT: int = 9808
+    QUERY_DEBUG_HEADERS: bool = False
+    QUERY_REPEAT_THRESHOLD: int = 20
+    QUERY_REPEAT_ACTION: str = "log"
+    SCHEMA_STARTUP: str = "check"
+    OUTBOX_DISPATCH_MODE: str = "celery"
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_SECONDS: float = 1.0
+    OUTBOX_RETRY_SECONDS: int = 30
+    OUTBOX_DEDUP_REDIS_URL: Optional[str] = None
+    OUTBOX_DEDUP_TTL: int = 86400
+    NOTIFICATION_DIGEST_WINDOW: int = 60
+    INVENTORY_MODEL: str = "counter"
 
     class Config:
         env_file = ".env"
@@ -19,18 +64,18 @@ class Settings(BaseSettings):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        print(f"Loaded DATABASE_URL: {self.DATABASE_URL}")
         if "library_db" not in self.DATABASE_URL:
             raise ValueError(f"""Invalid DATABASE_URL: {self.DATABASE_URL},
                               expected 'library_db'""")
 
 
+@lru_cache(maxsize=None)
 def get_settings() -> Settings:
-    """Lazily instantiate Settings to avoid import-time errors."""
+    """Settings from the environment and .env, read once per process."""
     try:
         return Settings()
     except ValidationError as e:
-        print(f"Settings validation error: {e}")
+        logger.error(f"Settings validation error: {e}")
         raise
 
 
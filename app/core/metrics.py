@@ -0,0 +1,200 @@
+"""Prometheus metrics for the API and the Celery worker.
+
+Every label has a small, fixed set of values: route templates rather than
+paths, status classes rather than codes, engine kind, task name and send
+outcome. The API serves them at /metrics; the worker starts its own
+exporter on WORKER_METRICS_PORT. With the prefork pool, set
+PROMETHEUS_MULTIPROC_DIR so the children's samples are aggregated.
+"""
+import logging
+import os
+import time
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, \
+    Histogram, generate_latest, multiprocess, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from starlette.responses import Response
+
+from app.core.config import settings
+from app.core.queries import track_queries
+
+logger = logging.getLogger(__name__)
+
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"])
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being served", ["method"],
+    multiprocess_mode="livesum")
+HTTP_REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request",
+    ["method", "route"], buckets=QUERY_BUCKETS)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_seconds", "Time to obtain a pooled database connection",
+    ["engine"], buckets=CHECKOUT_BUCKETS)
+
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds", "Celery task runtime", ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+CELERY_TASK_QUERIES = Histogram(
+    "celery_task_db_queries", "SQL statements executed per Celery task", ["task"],
+    buckets=QUERY_BUCKETS)
+CELERY_TASK_RETRIES = Counter("celery_task_retries", "Celery task retries", ["task"])
+CELERY_TASK_FAILURES = Counter("celery_task_failures", "Celery tasks that raised", ["task"])
+SMTP_SEND_DURATION = Histogram(
+    "smtp_send_duration_seconds", "SMTP delivery latency per message, reconnects included",
+    ["outcome"])
+
+
+def observe_checkout(engine: str, seconds: float):
+    DB_POOL_CHECKOUT_DURATION.labels(engine).observe(seconds)
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests and queries per route.
+
+    Each request is one track_queries() unit of work. Unmatched paths share
+    one "unmatched" route label, so scans of random URLs cannot grow the
+    series count. With debug_headers (QUERY_DEBUG_HEADERS), responses carry
+    X-DB-Query-Count and a Server-Timing db entry; for streamed responses
+    these cover the statements run before the body started.
+    """
+
+    def __init__(self, app, debug_headers: Optional[bool] = None):
+        self.app = app
+        self.debug_headers = settings.QUERY_DEBUG_HEADERS if debug_headers is None else debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"] if scope["method"] in HTTP_METHODS else "other"
+        status = 500
+
+        with track_queries(f"{method} {scope['path']}") as queries:
+            async def send_with_status(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if self.debug_headers:
+                        message["headers"] = list(message.get("headers", [])) + [
+                            (b"x-db-query-count", str(queries.count).encode()),
+                            (b"server-timing", f"db;dur={queries.seconds * 1000:.1f}".encode()),
+                        ]
+                await send(message)
+
+            in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+            in_progress.inc()
+            started = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                elapsed = time.perf_counter() - started
+                in_progress.dec()
+                route = _route_template(scope)
+                HTTP_REQUEST_DURATION.labels(method, route, f"{status // 100}xx").observe(elapsed)
+                HTTP_REQUEST_QUERIES.labels(method, route).observe(queries.count)
+
+
+class PoolCollector:
+    """Pool occupancy and saturation of the shared engines, read at scrape time."""
+
+    GAUGES = (
+        ("size", "Configured pool size"),
+        ("checked_out", "Connections currently checked out"),
+        ("overflow", "Connections opened beyond the pool size"),
+        ("capacity", "Pool size plus max overflow"),
+        ("saturation", "Checked-out connections as a fraction of capacity"),
+    )
+
+    def _families(self) -> dict:
+        return {name: GaugeMetricFamily(f"db_pool_{name}", help_text, labels=["engine"])
+                for name, help_text in self.GAUGES}
+
+    def describe(self):
+        # Lets the registry learn the names without importing the engines
+        return list(self._families().values())
+
+    def collect(self):
+        from app.models.base import get_pool_stats
+
+        gauges = self._families()
+        for kind, stats in get_pool_stats().items():
+            if "checkedout" not in stats:
+                continue
+            gauges["checked_out"].add_metric([kind], stats["checkedout"])
+            for name in ("size", "overflow", "capacity"):
+                if name in stats:
+                    gauges[name].add_metric([kind], stats[name])
+            if stats.get("capacity"):
+                gauges["saturation"].add_metric([kind], stats["checkedout"] / stats["capacity"])
+        yield from gauges.values()
+
+
+class QueueDepthCollector:
+    """Length of the Celery queues in a Redis broker, read at scrape time."""
+
+    def __init__(self, redis_url: str, queues):
+        self.redis_url = redis_url
+        self.queues = list(queues)
+        self._client = None
+
+    def describe(self):
+        return [GaugeMetricFamily("celery_queue_depth", "Messages waiting in the broker queue",
+                                  labels=["queue"])]
+
+    def collect(self):
+        import redis
+
+        gauge = GaugeMetricFamily("celery_queue_depth", "Messages waiting in the broker queue",
+                                  labels=["queue"])
+        try:
+            if self._client is None:
+                self._client = redis.Redis.from_url(self.redis_url, socket_timeout=1)
+            for queue in self.queues:
+                gauge.add_metric([queue], self._client.llen(queue))
+        except redis.RedisError as e:
+            logger.warning(f"Queue depth unavailable: {e}")
+        yield gauge
+
+
+REGISTRY.register(PoolCollector())
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+_worker_server = None
+
+
+def start_worker_metrics_server(port: int, redis_url: Optional[str] = None, queues=()):
+    """Serve the worker's metrics on port, once per process; 0 disables the exporter."""
+    global _worker_server
+    if not port or _worker_server is not None:
+        return _worker_server
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    if redis_url and redis_url.startswith(("redis://", "rediss://")):
+        registry.register(QueueDepthCollector(redis_url, queues))
+    _worker_server, _ = start_http_server(port, registry=registry)
+    logger.info(f"Worker metrics exporter listening on :{port}")
+    return _worker_server
+
+
+def mark_worker_process_dead(pid: int):
+    """Drop a finished prefork child's live gauges in multiprocess mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_password_context(rounds: int = None) -> "CryptContext":
+    """bcrypt context pinned to one cost factor.
+
+    min_rounds == max_rounds makes needs_update() flag any hash made with a
+    different cost, in either direction, so logins rehash transparently.
+    passlib is imported here, on the first hash, not at startup.
+    """
+    from passlib.context import CryptContext
+
+    rounds = rounds or settings.BCRYPT_ROUNDS
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def _hash(password: str, rounds: int) -> str:
+    return get_password_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> tuple[bool, Optional[str]]:
+    return get_password_context(rounds).verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded worker pool instead of the event loop.
+
+    At most `workers` hashes run at a time; up to `max_queue` more wait for a
+    worker and anything beyond that is rejected with 503 so a login storm
+    cannot build an unbounded backlog. The bcrypt backend releases the GIL,
+    so threads are the default; "process" suits backends that do not.
+    """
+
+    def __init__(self, workers: int, max_queue: int, rounds: int, executor: str = "thread"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.executor_kind = executor
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._counters = {"submitted": 0, "completed": 0, "rejected": 0, "rehashed": 0,
+                          "queued": 0, "running": 0, "max_queued": 0,
+                          "wait_ms_total": 0.0, "wait_ms_max": 0.0, "run_ms_total": 0.0}
+
+    def _get_executors(self) -> tuple[ThreadPoolExecutor, Optional[Executor]]:
+        # The thread pool is the concurrency gate and the timing point; in
+        # process mode each thread hands its hash to a worker process.
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.workers,
+                                                   thread_name_prefix="password-hash")
+                if self.executor_kind == "process":
+                    self._processes = ProcessPoolExecutor(max_workers=self.workers)
+            return self._threads, self._processes
+
+    def _timed(self, submitted_at: float, func, *args):
+        started = time.perf_counter()
+        with self._lock:
+            wait_ms = (started - submitted_at) * 1000
+            self._counters["queued"] -= 1
+            self._counters["running"] += 1
+            self._counters["wait_ms_total"] += wait_ms
+            self._counters["wait_ms_max"] = max(self._counters["wait_ms_max"], wait_ms)
+        try:
+            if self._processes is not None:
+                return self._processes.submit(func, *args).result()
+            return func(*args)
+        finally:
+            with self._lock:
+                self._counters["running"] -= 1
+                self._counters["completed"] += 1
+                self._counters["run_ms_total"] += (time.perf_counter() - started) * 1000
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._counters["queued"] + self._counters["running"] >= self.workers + self.max_queue:
+                self._counters["rejected"] += 1
+                logger.warning("Password hashing queue full, rejecting request")
+                raise HTTPException(status_code=503, detail="Server busy, please retry")
+            self._counters["submitted"] += 1
+            self._counters["queued"] += 1
+            self._counters["max_queued"] = max(self._counters["max_queued"], self._counters["queued"])
+        threads, _ = self._get_executors()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(threads, self._timed, time.perf_counter(), func, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, Optional[str]]:
+        """Check a password; the second item is a new hash when the cost changed."""
+        valid, new_hash = await self._run(_verify_and_update, password, hashed, self.rounds)
+        if new_hash is not None:
+            with self._lock:
+                self._counters["rehashed"] += 1
+        return valid, new_hash
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        done = stats["completed"] or 1
+        stats.update(
+            workers=self.workers, max_queue=self.max_queue, rounds=self.rounds,
+            executor=self.executor_kind,
+            wait_ms_avg=round(stats.pop("wait_ms_total") / done, 2),
+            run_ms_avg=round(stats.pop("run_ms_total") / done, 2),
+            wait_ms_max=round(stats["wait_ms_max"], 2),
+        )
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            executors = (self._threads, self._processes)
+            self._threads = self._processes = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    rounds=settings.BCRYPT_ROUNDS,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+)
+
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+
+async def verify_password(password: str, hashed: str) -> tuple[bool, Optional[str]]:
+    return await password_hasher.verify(password, hashed)
+
+
+def get_password_hashing_stats() -> dict:
+    return password_hasher.stats()
@@ -0,0 +1,121 @@
+"""Per unit of work SQL statement counting and repeated-query detection.
+
+A unit of work (an HTTP request, a Celery task, a test block) runs inside
+track_queries(). Engine events count its statements and their database
+time, and group statements by shape: the SQL text with whitespace, bound
+parameter lists and number literals normalized. When one shape runs more
+than QUERY_REPEAT_THRESHOLD times, the usual sign of an N+1 loop, the
+detector logs it or raises RepeatedQueryError (QUERY_REPEAT_ACTION).
+"""
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REPEAT_ACTIONS = ("log", "raise")
+
+_PARAMETER = r"(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)"
+_PARAMETER_LIST = re.compile(rf"\(\s*{_PARAMETER}(?:\s*,\s*{_PARAMETER})+\s*\)")
+_NUMBER = re.compile(r"(?<![\w$])\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class RepeatedQueryError(RuntimeError):
+    """One statement shape ran more often than allowed in a unit of work."""
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """SQL text with literals and IN-list lengths folded away."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _PARAMETER_LIST.sub("(?, ...)", shape)
+    return _NUMBER.sub("N", shape)
+
+
+class QueryStats:
+    """Statements, database time and statement shapes of one unit of work."""
+
+    def __init__(self, name: str = "", threshold: int = 0, action: str = "log",
+                 parent: Optional["QueryStats"] = None):
+        if action not in REPEAT_ACTIONS:
+            raise ValueError(f"Unknown repeated-query action {action!r}, expected one of {', '.join(REPEAT_ACTIONS)}")
+        self.name = name
+        self.parent = parent
+        self.threshold = threshold
+        self.action = action
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: dict[str, int] = {}
+
+    def record(self, statement: str):
+        self.count += 1
+        if not self.threshold:
+            return
+        shape = statement_shape(statement)
+        seen = self.shapes[shape] = self.shapes.get(shape, 0) + 1
+        if seen == self.threshold + 1:
+            message = f"Repeated query in {self.name or 'unit of work'}: more than {self.threshold} runs of {shape[:300]}"
+            if self.action == "raise":
+                raise RepeatedQueryError(message)
+            logger.warning(message)
+
+    def most_repeated(self, limit: int = 5) -> list[tuple[str, int]]:
+        return sorted(self.shapes.items(), key=lambda item: -item[1])[:limit]
+
+    def summary(self) -> str:
+        lines = [f"{self.count} statements, {self.seconds * 1000:.1f} ms"]
+        lines += [f"  {count} x {shape[:200]}" for shape, count in self.most_repeated()]
+        return "\n".join(lines)
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_queries() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def track_queries(name: str = "", threshold: Optional[int] = None,
+                  action: Optional[str] = None) -> Iterator[QueryStats]:
+    """Count the statements run inside the block.
+
+    A nested block (a task applied inside a test, say) counts its own
+    statements and still reports them to the enclosing ones.
+    """
+    stats = QueryStats(name, settings.QUERY_REPEAT_THRESHOLD if threshold is None else threshold,
+                       action or settings.QUERY_REPEAT_ACTION, parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    if context is not None:
+        context._query_started = time.perf_counter()
+    while stats is not None:
+        stats.record(statement)
+        stats = stats.parent
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    while stats is not None:
+        stats.seconds += elapsed
+        stats = stats.parent
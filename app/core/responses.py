@@ -0,0 +1,57 @@
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+import pydantic_core
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # optional; pydantic-core's encoder is the fallback
+    orjson = None
+
+
+@lru_cache(maxsize=None)
+def get_adapter(type_: Any) -> TypeAdapter:
+    """TypeAdapter for a response type, built once per type.
+
+    Building an adapter compiles its validator and serializer, which costs
+    far more than using one, so adapters are shared across requests.
+    """
+    return TypeAdapter(type_)
+
+
+def dump_json(type_: Any, value: Any) -> bytes:
+    """Validate value as type_ once (reading ORM attributes) and encode it.
+
+    Instances that already are the target model pass validation untouched,
+    and the bytes come straight from pydantic-core's serializer.
+    """
+    adapter = get_adapter(type_)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def json_response(type_: Any, value: Any, status_code: int = 200,
+                  headers: Optional[Mapping[str, str]] = None) -> Response:
+    """Response for value serialized as type_, bypassing FastAPI's encoder.
+
+    Keep response_model on the route for the OpenAPI schema; returning a
+    Response skips FastAPI's dump-revalidate-jsonable_encoder pass. Headers
+    set on an injected `response: Response` are not merged into it, so
+    pass them here or set them on the returned object.
+    """
+    return Response(dump_json(type_, value), status_code=status_code,
+                    headers=headers, media_type="application/json")
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: orjson when installed, else pydantic-core.
+
+    Both encode datetimes, UUIDs and dataclasses natively, which is what
+    FastAPI's jsonable_encoder output contains.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return pydantic_core.to_json(content)
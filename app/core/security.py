@@ -1,16 +1,110 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.core.cache import RedisTier, TTLCache
 from app.models.member import Member
-from app.models.base import get_db
+from app.models.base import get_async_db
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 
+# Column values kept for an authenticated member; the password hash is
+# deliberately left out so it never reaches the shared tier.
+_CACHED_COLUMNS = ("id", "name", "email", "is_admin", "created_at", "updated_at")
+_DATETIME_COLUMNS = ("created_at", "updated_at")
+
+member_cache = TTLCache(maxsize=settings.MEMBER_CACHE_SIZE, ttl=settings.MEMBER_CACHE_TTL)
+_member_redis = RedisTier(settings.MEMBER_CACHE_REDIS_URL, "auth:member", settings.MEMBER_CACHE_TTL) \
+    if settings.MEMBER_CACHE_REDIS_URL else None
+_pending_invalidations: set = set()
+
+
+def _snapshot(member: Member) -> dict:
+    data = {column: getattr(member, column) for column in _CACHED_COLUMNS}
+    for column in _DATETIME_COLUMNS:
+        if data[column] is not None:
+            data[column] = data[column].isoformat()
+    return data
+
+
+def _restore(data: dict) -> Member:
+    """Rebuild a detached Member from a cache snapshot without touching the database."""
+    values = dict(data)
+    for column in _DATETIME_COLUMNS:
+        if values.get(column) is not None:
+            values[column] = datetime.fromisoformat(values[column])
+    member = Member(**values)
+    make_transient_to_detached(member)
+    return member
+
+
+async def _cached_member(email: str) -> Optional[dict]:
+    data = member_cache.get(email)
+    if data is None and _member_redis is not None:
+        data = await _member_redis.get(email)
+        if data is not None:
+            member_cache.set(email, data)
+    return data
+
+
+async def _remember_member(member: Member):
+    data = _snapshot(member)
+    member_cache.set(member.email, data)
+    if _member_redis is not None:
+        await _member_redis.set(member.email, data)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get current user from JWT token."""
+
+async def invalidate_member(*emails: str):
+    """Drop cached members from both tiers, e.g. after an account change."""
+    for email in emails:
+        member_cache.pop(email)
+    if _member_redis is not None:
+        await _member_redis.delete(*emails)
+
+
+@event.listens_for(Member, "after_update")
+@event.listens_for(Member, "after_delete")
+def _forget_changed_member(mapper, connection, target):
+    # Also forget the previous address when the email itself changed
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    for email in emails:
+        member_cache.pop(email)
+    if _member_redis is None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Sync session outside the app (tasks, scripts): the Redis entry
+        # expires after MEMBER_CACHE_TTL
+        return
+    task = loop.create_task(_member_redis.delete(*emails))
+    _pending_invalidations.add(task)
+    task.add_done_callback(_pending_invalidations.discard)
+
+
+def get_member_cache_stats() -> dict:
+    """Hit/miss counters of the authenticated-member cache tiers."""
+    return {
+        "local": member_cache.stats(),
+        "redis": dict(_member_redis.counters) if _member_redis is not None else None,
+    }
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Get current user from JWT token.
+
+    Resolved members are cached by token subject, so repeat requests are
+    authenticated without a database round trip.
+    """
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=["HS256"])
         email: str = payload.get("sub")
@@ -18,8 +112,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    member = db.query(Member).filter(Member.email == email).first()
+    data = await _cached_member(email)
+    if data is not None:
+        # load=False attaches the snapshot to this session without a SELECT
+        return await db.merge(_restore(data), load=False)
+    result = await db.execute(select(Member).where(Member.email == email))
+    member = result.scalar_one_or_none()
     if member is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    await _remember_member(member)
     return member
 
+
+async def get_current_admin_user(current_user: Member = Depends(get_current_user)) -> Member:
+    """get_current_user, restricted to members flagged is_admin."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
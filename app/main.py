@@ -1,9 +1,20 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.models.base import get_engine, Base
+from app.models.base import init_async_engine, dispose_async_engine, \
+    dispose_engine, get_pool_stats, prepare_schema
 from app.api.v1.endpoints.borrow import router as borrow_router
 from app.api.v1.endpoints.auth import router as auth_router
+from app.api.v2.endpoints.borrow import router as borrow_router_v2
+from app.api.v1.endpoints.catalog import router as catalog_router
+from app.api.v1.endpoints.export import router as export_router
+from app.core.cache import get_cache
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, metrics_response
+from app.core.responses import FastJSONResponse
+from app.core.passwords import get_password_hashing_stats, password_hasher
+from app.core.security import get_member_cache_stats
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -14,33 +25,44 @@ async def lifespan(app: FastAPI):
     engine = None
     try:
         logger.info("Starting application")
-        engine = get_engine()
-        # Verify database connection
-        with engine.connect() as conn:
-            logger.info(f"Database connection established: {conn.engine.url}")
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
+        started = time.perf_counter()
+        engine = init_async_engine()
+        # One connection, which also warms the pool; the schema itself is
+        # managed by Alembic outside the boot path (SCHEMA_STARTUP)
+        revision = await prepare_schema(engine, settings.SCHEMA_STARTUP)
+        logger.info(f"Database ready in {(time.perf_counter() - started) * 1000:.0f} ms: "
+                    f"{engine.url!r}, schema {revision or settings.SCHEMA_STARTUP}")
         # Log router inclusion
-        logger.info("Included API routers: auth, borrow")
+        logger.info("Included API routers: auth, borrow, catalog, export")
         yield
     except Exception as e:
         logger.error(f"Application startup error: {e}")
         raise
     finally:
         if engine:
-            engine.dispose()
-            logger.info("Database engine disposed")
+            await dispose_async_engine()
+            dispose_engine()
+            logger.info("Database engines disposed")
+        password_hasher.shutdown()
         logger.info("Application shutdown complete")
 
 app = FastAPI(
     title="Library Management System",
     description="API for managing library members, books, and borrows",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
-app.include_router(borrow_router, prefix="/api/v1")
+app.add_middleware(MetricsMiddleware)
+
+app.include_router(borrow_router, prefix="/api/v1/borrow")
+app.include_router(borrow_router_v2, prefix="/api/v2/borrow")
 app.include_router(auth_router, prefix="/api/v1")
+app.include_router(catalog_router, prefix="/api/v1/books", tags=["books"])
+app.include_router(catalog_router, prefix="/api/v2/books", tags=["books"])
+app.include_router(export_router, prefix="/api/v1/export", tags=["export"])
+app.include_router(export_router, prefix="/api/v2/export", tags=["export"])
 
 
 @app.get("/", summary="Root endpoint")
@@ -48,3 +70,34 @@ async def root():
     """Return a welcome message for the Library Management System."""
     logger.info("Root endpoint accessed")
     return {"message": "Library Management System"}
+
+
+@app.get("/health/db-pool", summary="Database pool statistics")
+async def db_pool_stats():
+    """Return checkout/checkin counters and occupancy of the shared pool."""
+    return get_pool_stats()
+
+
+@app.get("/health/auth-cache", summary="Authenticated-member cache statistics")
+async def auth_cache_stats():
+    """Return hit/miss counters of the member cache used by get_current_user."""
+    return get_member_cache_stats()
+
+
+@app.get("/health/password-hashing", summary="Password hashing pool statistics")
+async def password_hashing_stats():
+    """Return queue depth, wait times and rehash counts of the bcrypt pool."""
+    return get_password_hashing_stats()
+
+
+@app.get("/health/cache", summary="Service read cache statistics")
+async def service_cache_stats():
+    """Return hit ratio, loads and coalesced misses of the read-through cache."""
+    cache = get_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+@app.get("/metrics", summary="Prometheus metrics", include_in_schema=False)
+async def metrics():
+    """Expose request, database pool and query metrics in Prometheus text format."""
+    return metrics_response()
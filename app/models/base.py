@@ -1,8 +1,16 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import get_settings
+from app.core.metrics import observe_checkout
+from app.core.queries import after_cursor_execute, before_cursor_execute
 from datetime import datetime
 from sqlalchemy import Column, Integer, DateTime
 import urllib.parse
@@ -12,37 +20,267 @@ logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+# Alembic head the models describe; bump it with every migration
+SCHEMA_REVISION = "0010_overdue_notified"
+
+_engine = None
+_SessionLocal = None
+_async_engine = None
+_AsyncSessionLocal = None
+_engine_lock = threading.Lock()
+_pool_counters = {
+    kind: {"connects": 0, "checkouts": 0, "checkins": 0, "invalidated": 0}
+    for kind in ("sync", "async")
+}
+_pool_counters_lock = threading.Lock()
+
+# Statements are counted per unit of work on every engine, the ones built
+# outside this module (scripts, tests) included
+event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def _bump(kind: str, counter: str):
+    with _pool_counters_lock:
+        _pool_counters[kind][counter] += 1
+
+
+def _track_pool(engine, kind: str = "sync"):
+    """Count pool connects, checkouts and checkins for get_pool_stats().
+
+    Also times every checkout (queueing for a free connection included)
+    for /metrics.
+    """
+    event.listen(engine, "connect", lambda *args: _bump(kind, "connects"))
+    event.listen(engine, "checkout", lambda *args: _bump(kind, "checkouts"))
+    event.listen(engine, "checkin", lambda *args: _bump(kind, "checkins"))
+    event.listen(engine, "invalidate", lambda *args: _bump(kind, "invalidated"))
+    _time_checkouts(engine.pool, kind)
+
+
+def _time_checkouts(pool, kind: str):
+    # The pool has no "checkout requested" event; Engine.raw_connection()
+    # goes through pool.connect(), so time that call.
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            observe_checkout(kind, time.perf_counter() - started)
+    pool.connect = timed_connect
+
+
+def get_database_url() -> str:
+    settings = get_settings()
+    return os.getenv("TEST_DATABASE_URL", settings.DATABASE_URL)
+
+
+def get_async_database_url(database_url: str = None) -> str:
+    """Map a sync DATABASE_URL onto its asyncio driver (asyncpg/aiosqlite)."""
+    url = make_url(database_url or get_database_url())
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def _engine_options(database_url: str, **overrides) -> dict:
+    """Engine keyword arguments shared by the sync and async engines.
+
+    SQLite keeps SQLAlchemy's default pool for its URL type; the sizing
+    options only apply to server databases.
+    """
+    settings = get_settings()
+    parsed_url = urllib.parse.urlparse(database_url)
+    logger.info(f"Creating engine: scheme={parsed_url.scheme}, host={parsed_url.hostname}, port={parsed_url.port}, path={parsed_url.path}")
+    if parsed_url.scheme.startswith("postgresql") and parsed_url.path != "/library_db":
+        raise ValueError(f"Invalid database name in DATABASE_URL: {parsed_url.path}, expected '/library_db'")
+    options = {"echo": settings.DB_ECHO, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if parsed_url.scheme.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    else:
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+        options.update(overrides)
+    return options
+
+
+def create_db_engine(database_url: str = None, **overrides):
+    """Build a sync engine with the pool settings from Settings.
+
+    Keyword overrides (pool_size, max_overflow, ...) replace the configured
+    pool options for server databases.
+    """
+    database_url = database_url or get_database_url()
+    engine = create_engine(database_url, **_engine_options(database_url, **overrides))
+    _track_pool(engine, "sync")
+    return engine
+
+
+def create_async_db_engine(database_url: str = None):
+    """Build an asyncio engine with the pool settings from Settings."""
+    database_url = get_async_database_url(database_url)
+    engine = create_async_engine(database_url, **_engine_options(database_url))
+    _track_pool(engine.sync_engine, "async")
+    return engine
+
+
+def init_engine(**overrides):
+    """Create the process-wide engine and session factory once.
+
+    Pool overrides only apply to the call that actually builds the engine.
+    """
+    global _engine, _SessionLocal
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_db_engine(**overrides)
+                _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                _engine = engine
+    return _engine
+
+
+def init_async_engine():
+    """Create the process-wide asyncio engine and session factory once."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                engine = create_async_db_engine()
+                _AsyncSessionLocal = async_sessionmaker(
+                    bind=engine, autoflush=False, expire_on_commit=False
+                )
+                _async_engine = engine
+    return _async_engine
+
+
+def dispose_engine(close: bool = True):
+    """Close pooled connections and forget the process-wide engine.
+
+    close=False only drops the pool's references, which is what a forked
+    child must do with connections it inherited from its parent.
+    """
+    global _engine, _SessionLocal
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose(close=close)
+        _engine = None
+        _SessionLocal = None
+
+
+async def dispose_async_engine():
+    """Close the asyncio pool and forget the process-wide async engine."""
+    global _async_engine, _AsyncSessionLocal
+    engine = _async_engine
+    _async_engine = None
+    _AsyncSessionLocal = None
+    if engine is not None:
+        await engine.dispose()
+
 
 def get_engine():
-    try:
-        settings = get_settings()
-        database_url = os.getenv("TEST_DATABASE_URL", settings.DATABASE_URL)
-        logger.info(f"Attempting to connect to DATABASE_URL: {database_url}")
-        parsed_url = urllib.parse.urlparse(database_url)
-        logger.info(f"Parsed DATABASE_URL: scheme={parsed_url.scheme}, host={parsed_url.hostname}, port={parsed_url.port}, path={parsed_url.path}")
-        if parsed_url.scheme == "postgresql" and parsed_url.path != "/library_db":
-            raise ValueError(f"Invalid database name in DATABASE_URL: {parsed_url.path}, expected '/library_db'")
-        connect_args = {"check_same_thread": False} if parsed_url.scheme == "sqlite" else {}
-        engine = create_engine(database_url, echo=True, connect_args=connect_args)
-        conn = engine.connect()
-        logger.info(f"Successfully connected to database: {conn}")
-        conn.close()
-        return engine
-    except Exception as e:
-        logger.error(f"Error creating engine: {e}")
-        raise
+    return init_engine()
+
+
+def get_async_engine():
+    return init_async_engine()
+
+
+def get_session_factory():
+    init_engine()
+    return _SessionLocal
+
+
+def get_async_session_factory():
+    init_async_engine()
+    return _AsyncSessionLocal
+
+
+def _describe_pool(engine, kind: str) -> dict:
+    stats = {"initialized": engine is not None}
+    with _pool_counters_lock:
+        stats.update(_pool_counters[kind])
+    if engine is None:
+        return stats
+    pool = engine.pool
+    stats["pool"] = type(pool).__name__
+    stats["status"] = pool.status()
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        attr = getattr(pool, name, None)
+        if callable(attr):
+            stats[name] = attr()
+    max_overflow = getattr(pool, "_max_overflow", None)
+    if max_overflow is not None and max_overflow >= 0 and "size" in stats:
+        # QueuePool only: -1 means unbounded overflow, which never runs out
+        stats["capacity"] = stats["size"] + max_overflow
+        stats["exhausted"] = stats["checkedout"] >= stats["capacity"]
+    return stats
+
+
+def get_pool_stats() -> dict:
+    """Return pool occupancy and lifetime counters for the shared engines."""
+    return {
+        "sync": _describe_pool(_engine, "sync"),
+        "async": _describe_pool(
+            _async_engine.sync_engine if _async_engine is not None else None, "async"
+        ),
+    }
+
+
+async def prepare_schema(engine, mode: str = "check") -> Optional[str]:
+    """Make sure the schema matches the models before serving requests.
+
+    check: a single SELECT on alembic_version; a missing or different
+    revision raises RuntimeError (run `alembic upgrade head`).
+    create: Base.metadata.create_all, for throwaway databases.
+    skip: nothing.
+    Returns the revision found by check.
+    """
+    if mode == "skip":
+        return None
+    if mode == "create":
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return None
+    if mode != "check":
+        raise ValueError(f"Unknown SCHEMA_STARTUP {mode!r}, expected check, create or skip")
+    async with engine.connect() as conn:
+        try:
+            revision = await conn.scalar(text("SELECT version_num FROM alembic_version"))
+        except DBAPIError:
+            revision = None
+    if revision != SCHEMA_REVISION:
+        raise RuntimeError(f"Database schema is at {revision or 'no revision'}, expected {SCHEMA_REVISION}; "
+                           f"run `alembic upgrade head`")
+    return revision
 
 
 def get_db():
-    engine = get_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    db = SessionLocal()
+    """Sync session dependency, kept for Celery tasks and scripts."""
+    db = get_session_factory()()
     try:
         yield db
     finally:
         db.close()
 
 
+async def get_async_db():
+    """AsyncSession dependency used by the API endpoints."""
+    async with get_async_session_factory()() as db:
+        yield db
+
+
 class AbstractBase(Base):
     __abstract__ = True
     id = Column(Integer, primary_key=True, index=True)
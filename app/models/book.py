@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, DDL, Index, Integer, String, event
 from app.models.base import AbstractBase
 from sqlalchemy.orm import relationship
 
@@ -9,7 +9,63 @@ class Book(AbstractBase):
     author = Column(String(255), nullable=False)
     total_copies = Column(Integer, nullable=False)
     available_copies = Column(Integer, nullable=False)
+    # Natural key for bulk imports; NULLs do not collide
+    isbn = Column(String(13), nullable=True)
     borrows = relationship("Borrow", back_populates="book")
 
+    # Kept in step with alembic/versions/0005_catalog_import.py
+    __table_args__ = (
+        Index("ix_books_isbn", "isbn", unique=True),
+    )
+
     class Config:
         from_attributes = True
+
+
+# Full-text index over title and author, maintained by the database itself:
+# an external-content FTS5 table plus triggers on SQLite, a generated
+# tsvector column with a GIN index on Postgres. Availability is not
+# indexed; searches join back to books for it, so borrows and returns never
+# rewrite the text index. A row in books_fts_paused switches the insert
+# trigger off inside a bulk-import transaction, which then indexes its new
+# rows with one INSERT ... SELECT (see app.services.catalog_import).
+SEARCH_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE books_fts USING fts5("
+        "title, author, content='books', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TABLE books_fts_paused (paused INTEGER NOT NULL)",
+        "CREATE TRIGGER books_fts_insert AFTER INSERT ON books "
+        "WHEN NOT EXISTS (SELECT 1 FROM books_fts_paused) BEGIN "
+        "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END",
+        "CREATE TRIGGER books_fts_delete AFTER DELETE ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author) "
+        "VALUES ('delete', old.id, old.title, old.author); END",
+        "CREATE TRIGGER books_fts_update AFTER UPDATE OF title, author ON books "
+        "WHEN old.title IS NOT new.title OR old.author IS NOT new.author BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author) "
+        "VALUES ('delete', old.id, old.title, old.author); "
+        "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END",
+    ],
+    "postgresql": [
+        "ALTER TABLE books ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(author, '')), 'B')) STORED",
+        "CREATE INDEX ix_books_search_vector ON books USING GIN (search_vector)",
+    ],
+}
+
+for _dialect, _statements in SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Book.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+
+
+def is_search_index_object(name: str, type_: str) -> bool:
+    """True for the search objects created outside the model metadata.
+
+    Used by Alembic autogenerate (and the schema test) so the FTS5 shadow
+    tables and the tsvector column/index are not reported as drift.
+    """
+    if type_ == "table":
+        return name.startswith("books_fts")
+    return name in ("search_vector", "ix_books_search_vector")
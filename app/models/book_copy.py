@@ -0,0 +1,32 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, text
+from app.models.base import AbstractBase
+
+COPY_AVAILABLE = "available"
+COPY_ON_LOAN = "on_loan"
+# Taken out of circulation when total_copies drops; kept for borrow history
+COPY_RETIRED = "retired"
+
+
+class BookCopy(AbstractBase):
+    """One physical copy of a book, used when INVENTORY_MODEL=copies.
+
+    A borrow claims a specific available copy (see
+    app.services.inventory.claim_copies) and records it in Borrow.copy_id;
+    books.available_copies is then the number of available copies.
+    """
+    __tablename__ = "book_copies"
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
+    barcode = Column(String(32), nullable=True)
+    condition = Column(String(20), nullable=True)
+    status = Column(String(10), nullable=False, default=COPY_AVAILABLE)
+
+    # Kept in step with alembic/versions/0009_book_copies.py. The free
+    # index holds available copies only: claiming one and counting them
+    # for available_copies never read copy rows.
+    __table_args__ = (
+        Index("ix_book_copies_free", "book_id", "id", "status",
+              sqlite_where=text("status = 'available'"),
+              postgresql_where=text("status = 'available'")),
+        Index("ix_book_copies_book", "book_id"),
+        Index("ix_book_copies_barcode", "barcode", unique=True),
+    )
@@ -1,6 +1,7 @@
-from sqlalchemy import Boolean, Column, Integer, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, Integer, DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import relationship, synonym
 from app.models.base import AbstractBase
+from app.models.book_copy import BookCopy
 
 
 class Borrow(AbstractBase):
@@ -8,6 +9,25 @@ class Borrow(AbstractBase):
     book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
     member_id = Column(Integer, ForeignKey("members.id"), nullable=False)
     notification_sent = Column(Boolean, default=False)
+    # Set by the overdue scan once the member has been reminded
+    overdue_notified_at = Column(DateTime, nullable=True)
     return_date = Column(DateTime, nullable=True)
+    # The copy lent out, with INVENTORY_MODEL=copies
+    copy_id = Column(Integer, ForeignKey(BookCopy.id, name="fk_borrows_copy_id"), nullable=True)
+    borrow_date = synonym("created_at")
     book = relationship("Book", back_populates="borrows")
     member = relationship("Member", back_populates="borrows")
+
+    # Kept in step with alembic/versions/0002_circulation_indexes.py and
+    # 0004_borrow_versions.py; copy_id comes from 0009_book_copies.py and
+    # the overdue columns from 0010_overdue_notified.py
+    __table_args__ = (
+        Index("ix_borrows_member_created", "member_id", "created_at", "id", "updated_at"),
+        Index("ix_borrows_member_open", "member_id", "created_at",
+              sqlite_where=text("return_date IS NULL"),
+              postgresql_where=text("return_date IS NULL")),
+        Index("ix_borrows_overdue_pending", "created_at", "id", "member_id",
+              sqlite_where=text("return_date IS NULL AND overdue_notified_at IS NULL"),
+              postgresql_where=text("return_date IS NULL AND overdue_notified_at IS NULL")),
+        Index("ix_borrows_book_id", "book_id"),
+    )
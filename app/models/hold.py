@@ -0,0 +1,32 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, text
+from app.models.base import AbstractBase
+
+HOLD_WAITING = "waiting"
+HOLD_FULFILLED = "fulfilled"
+HOLD_CANCELLED = "cancelled"
+
+
+class Hold(AbstractBase):
+    """A member's place in the waitlist of a book with no copies left.
+
+    Waiting holds are served in id order: each returned copy is checked
+    out to the oldest one (see app.services.hold_service.assign_holds).
+    """
+    __tablename__ = "holds"
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
+    member_id = Column(Integer, ForeignKey("members.id"), nullable=False)
+    status = Column(String(10), nullable=False, default=HOLD_WAITING)
+    borrow_id = Column(Integer, ForeignKey("borrows.id"), nullable=True)
+
+    # Kept in step with alembic/versions/0008_holds.py. The queue index
+    # answers both "next in line" and "how many ahead of me" from waiting
+    # entries alone; the unique one allows one waiting hold per member.
+    __table_args__ = (
+        Index("ix_holds_queue", "book_id", "id", "status",
+              sqlite_where=text("status = 'waiting'"),
+              postgresql_where=text("status = 'waiting'")),
+        Index("ix_holds_member_waiting", "book_id", "member_id", unique=True,
+              sqlite_where=text("status = 'waiting'"),
+              postgresql_where=text("status = 'waiting'")),
+        Index("ix_holds_member", "member_id"),
+    )
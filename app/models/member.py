@@ -1,9 +1,7 @@
-from sqlalchemy import Column, String
+from sqlalchemy import Boolean, Column, String, false
 from sqlalchemy.orm import relationship
 from app.models.base import AbstractBase
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.passwords import get_password_context
 
 
 class Member(AbstractBase):
@@ -11,13 +9,16 @@ class Member(AbstractBase):
     name = Column(String(100), nullable=False)
     email = Column(String(255), nullable=False, unique=True)
     hashed_password = Column(String(255), nullable=False)
+    is_admin = Column(Boolean, nullable=False, default=False, server_default=false())
     borrows = relationship("Borrow", back_populates="member")
 
+    # Blocking helpers for scripts and tests; request handlers use the
+    # pooled app.core.passwords.hash_password / verify_password instead.
     def set_password(self, password: str):
-        self.hashed_password = pwd_context.hash(password)
+        self.hashed_password = get_password_context().hash(password)
 
     def verify_password(self, password: str) -> bool:
-        return pwd_context.verify(password, self.hashed_password)
+        return get_password_context().verify(password, self.hashed_password)
 
     class Config:
         from_attributes = True
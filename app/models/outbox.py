@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String
+from app.models.base import AbstractBase
+
+
+class OutboxMessage(AbstractBase):
+    """A task to publish, written in the transaction that made it necessary.
+
+    The dispatcher (app.tasks.outbox) publishes pending rows in id order
+    and deletes them in the transaction that claimed them; failures push
+    available_at back. Rows of a member's notifications carry member_id
+    and are sent together as one digest.
+    """
+    __tablename__ = "outbox"
+    task = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    available_at = Column(DateTime, nullable=False, default=datetime.now)
+    last_error = Column(String(500), nullable=True)
+    member_id = Column(Integer, nullable=True)
+
+    # Kept in step with alembic/versions/0006_outbox.py and 0007_notification_digests.py
+    __table_args__ = (
+        Index("ix_outbox_available", "available_at", "id"),
+        Index("ix_outbox_member", "member_id"),
+    )
@@ -1,17 +1,33 @@
+import re
+from typing import List, Optional
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
+_ISBN = re.compile(r"\d{9}[\dX]|\d{13}")
+
 
 class BookBase(BaseModel):
     """Base schema for book-related operations."""
     title: str = Field(..., description="Title of the book", max_length=255)
     author: str = Field(..., description="Author of the book", max_length=100)
     total_copies: int = Field(..., description="Total number of copies", ge=1)
+    isbn: Optional[str] = Field(None, description="ISBN-10 or ISBN-13, hyphens allowed")
 
     @field_validator("total_copies")
     def validate_copies(cls, value):
         if value < 1:
             raise ValueError("Total copies must be at least 1")
         return value
+
+    @field_validator("isbn")
+    def normalize_isbn(cls, value):
+        if value is None:
+            return None
+        value = value.replace("-", "").replace(" ", "").upper()
+        if not value:
+            return None
+        if not _ISBN.fullmatch(value):
+            raise ValueError("ISBN must have 10 or 13 digits")
+        return value
     model_config = ConfigDict(
         from_attributes=True  # Enable ORM mode for SQLAlchemy integration
     )
@@ -32,3 +48,36 @@ class BookResponse(BookBase):
     model_config = ConfigDict(
         from_attributes=True  # Enable ORM mode for SQLAlchemy integration
     )
+
+
+class BookSearchResponse(BaseModel):
+    """One page of ranked search results."""
+    items: List[BookResponse]
+    next_offset: Optional[int] = Field(None, description="Offset of the next page, if any")
+
+
+class BookSuggestion(BaseModel):
+    """Autocomplete entry."""
+    id: int
+    title: str
+    author: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BookImportReject(BaseModel):
+    """A record that was not imported."""
+    position: int = Field(..., description="Line (CSV, NDJSON) or record number (MARC)")
+    error: str
+
+
+class BookImportReport(BaseModel):
+    """Outcome of a bulk catalog import."""
+    received: int = Field(..., description="Records read from the input")
+    written: int = Field(..., description="Records sent to the database after de-duplication")
+    rejected: int = Field(..., description="Records that failed parsing or validation")
+    duplicates: int = Field(0, description="Repeated ISBNs within a chunk; the last one wins")
+    chunks: int = Field(..., description="Committed insert batches")
+    seconds: float
+    rejects: List[BookImportReject] = Field(default_factory=list,
+                                            description="The first rejected records")
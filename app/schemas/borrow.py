@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class BorrowRequest(BaseModel):
@@ -26,6 +26,7 @@ class BorrowResponse(BaseModel):
                                               description='''Whether
                                               email notification
                                               was sent (v2 only)''')
+    copy_id: Optional[int] = Field(None, description="Copy lent out, with INVENTORY_MODEL=copies")
     model_config = ConfigDict(
         from_attributes=True  # Enable ORM mode for SQLAlchemy integration
     )
@@ -41,3 +42,55 @@ class BorrowCreate(BaseModel):
     model_config = ConfigDict(
         from_attributes=True  # Enable ORM mode for SQLAlchemy integration
     )
+
+
+class BorrowBatchRequest(BaseModel):
+    """Schema for borrowing several books in one transaction."""
+    items: List[BorrowRequest] = Field(..., min_length=1, max_length=100,
+                                       description="Books to borrow")
+
+
+class ReturnBatchItem(BaseModel):
+    """Schema for one borrow to close in a batch return."""
+    borrow_id: int = Field(..., description="ID of the borrow to return")
+
+
+class ReturnBatchRequest(BaseModel):
+    """Schema for returning several books in one transaction."""
+    items: List[ReturnBatchItem] = Field(..., min_length=1, max_length=100,
+                                         description="Borrows to return")
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of a single item of a batch borrow or return."""
+    index: int = Field(..., description="Position of the item in the request")
+    ok: bool
+    status_code: int
+    detail: Optional[str] = None
+    borrow: Optional[BorrowResponse] = None
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BatchResponse(BaseModel):
+    """Schema for the per-item report of a batch borrow or return."""
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+
+
+class HoldRequest(BaseModel):
+    """Schema for joining the waitlist of a book with no copies left."""
+    book_id: int = Field(..., description="ID of the book to hold")
+    member_id: int = Field(..., description="ID of the waiting member")
+
+
+class HoldResponse(BaseModel):
+    """Schema for a hold and its place in the waitlist."""
+    id: int
+    book_id: int
+    member_id: int
+    status: str = Field(..., description="waiting, fulfilled or cancelled")
+    position: Optional[int] = Field(None, description="1 for next in line; only set while waiting")
+    borrow_id: Optional[int] = Field(None, description="Borrow the hold was fulfilled with")
+    created_at: datetime
+    model_config = ConfigDict(from_attributes=True)
@@ -1,10 +1,12 @@
 import logging
 from fastapi import Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.member import Member
 from app.schemas.auth import LoginRequest, TokenResponse
 from jose import jwt
 from app.core.config import settings
+from app.core.passwords import hash_password, verify_password
 from datetime import datetime, timedelta
 
 from app.schemas.member import MemberCreate
@@ -13,12 +15,29 @@ from app.schemas.member import MemberCreate
 logger = logging.getLogger(__name__)
 
 
-async def authenticate_member(db: Session, email: str,
+async def get_member_by_email(db: AsyncSession, email: str) -> Member:
+    """Fetch a member by email, or None."""
+    result = await db.execute(select(Member).where(Member.email == email))
+    return result.scalar_one_or_none()
+
+
+async def authenticate_member(db: AsyncSession, email: str,
                               password: str) -> Member:
-    """Authenticate a member by email and password."""
-    member = db.query(Member).filter(Member.email == email).first()
-    if not member or not member.verify_password(password):
+    """Authenticate a member by email and password.
+
+    bcrypt runs off the event loop; a hash made with an outdated cost
+    factor is replaced with one at the configured BCRYPT_ROUNDS.
+    """
+    member = await get_member_by_email(db, email)
+    if not member:
+        return None
+    valid, new_hash = await verify_password(password, member.hashed_password)
+    if not valid:
         return None
+    if new_hash is not None:
+        member.hashed_password = new_hash
+        await db.commit()
+        logger.info(f"Rehashed password for {email} at the configured cost")
     return member
 
 
@@ -31,7 +50,7 @@ def create_access_token(data: dict) -> str:
     return encoded_jwt
 
 
-async def login_member(login_request: LoginRequest, db: Session = Depends()) -> TokenResponse:
+async def login_member(login_request: LoginRequest, db: AsyncSession = Depends()) -> TokenResponse:
     """Log in a member and return a JWT token."""
     member = await authenticate_member(db, login_request.email, login_request.password)
     if not member:
@@ -41,20 +60,21 @@ async def login_member(login_request: LoginRequest, db: Session = Depends()) ->
 
 
 async def register_member(member: MemberCreate,
-                          db: Session = Depends()) -> Member:
+                          db: AsyncSession = Depends()) -> Member:
     try:
-        existing_member = db.query(Member)\
-            .filter(Member.email == member.email).first()
+        existing_member = await get_member_by_email(db, member.email)
         if existing_member:
             raise HTTPException(status_code=400,
                                 detail="Email already registered")
-        db_member = Member(name=member.name, email=member.email)
-        db_member.set_password(member.password)
+        db_member = Member(name=member.name, email=member.email,
+                           hashed_password=await hash_password(member.password))
         db.add(db_member)
-        db.commit()
-        db.refresh(db_member)
+        await db.commit()
+        await db.refresh(db_member)
         logger.info(f"Registered member: {member.email}")
         return db_member
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Register endpoint error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,26 +1,137 @@
-from sqlalchemy.orm import Session
+import re
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import column, func, insert, literal_column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import cached
+from app.core.config import settings
 from app.models.book import Book
+from app.models.book_copy import BookCopy
 from app.schemas.book import BookCreate, BookResponse
+from app.services.inventory import copies_enabled
 from fastapi import HTTPException, status
 
+MAX_SEARCH_TERMS = 8
 
-async def create_book(db: Session, book_data: BookCreate) -> BookResponse:
-    """Create a new book in the library."""
+_books_fts = table("books_fts", column("rowid"))
+_search_vector = literal_column("books.search_vector")
+
+
+async def create_book(db: AsyncSession, book_data: BookCreate) -> BookResponse:
+    """Create a new book in the library, with its copies under INVENTORY_MODEL=copies."""
     book = Book(
         title=book_data.title,
         author=book_data.author,
         total_copies=book_data.total_copies,
-        available_copies=book_data.available_copies
+        available_copies=book_data.total_copies,
+        isbn=book_data.isbn
     )
     db.add(book)
-    db.commit()
-    db.refresh(book)
+    if copies_enabled():
+        await db.flush()
+        await db.execute(insert(BookCopy), [{"book_id": book.id}] * book_data.total_copies)
+    await db.commit()
+    await db.refresh(book)
     return BookResponse.model_validate(book)
 
 
-async def get_book(db: Session, book_id: int) -> BookResponse:
-    """Retrieve a book by ID."""
-    book = await db.query(Book).filter(Book.id == book_id).first()
+async def get_book_version(db: AsyncSession, book_id: int) -> Optional[datetime]:
+    """updated_at of a book, by primary key; raises 404 for unknown books."""
+    row = (await db.execute(select(Book.id, Book.updated_at).where(Book.id == book_id))).first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
+    return row.updated_at
+
+
+@cached(key=lambda args: f"book:{args['book_id']}:{args['version']}",
+        tags=lambda args: [f"book:{args['book_id']}"],
+        encode=lambda book: book.model_dump(mode="json"),
+        decode=BookResponse.model_validate)
+async def get_book(db: AsyncSession, book_id: int, version=None) -> BookResponse:
+    """Retrieve a book by ID (read-through cached, tagged book:<id>).
+
+    version, when given (see get_book_version), becomes part of the cache
+    key so the result matches the validators computed from it.
+    """
+    # A cache miss must see committed counters, not a stale identity-map copy
+    book = await db.get(Book, book_id, populate_existing=True)
     if not book:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
-    return await BookResponse.model_validate(book)
+    return BookResponse.model_validate(book)
+
+
+def _search_terms(q: str) -> list[str]:
+    """Split a user query into word tokens; no query syntax is passed through."""
+    return re.findall(r"\w+", q.lower())[:MAX_SEARCH_TERMS]
+
+
+def _search_query(dialect: str, terms: list[str], prefix_all: bool, available_only: bool,
+                  window: Optional[int] = None):
+    """Ranked SELECT of books matching every term.
+
+    The last term is always a prefix so results follow the user's typing;
+    prefix_all extends that to every term for autocomplete. Every match is
+    ranked unless window is given, which bounds ranking to the newest
+    `window` matches: autocomplete runs on every keystroke, and a one-letter
+    prefix can match most of the catalog.
+    """
+    prefixed = [prefix_all or i == len(terms) - 1 for i in range(len(terms))]
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery(
+            "simple", " & ".join(f"{term}:*" if p else term for term, p in zip(terms, prefixed))
+        )
+        matches = _search_vector.op("@@")(tsquery)
+        query = select(Book).where(matches)\
+            .order_by(func.ts_rank_cd(_search_vector, tsquery).desc(), Book.id)
+        if window is not None:
+            oldest = select(Book.id).where(matches)\
+                .order_by(Book.id.desc()).limit(1).offset(window - 1).scalar_subquery()
+            query = query.where(Book.id >= func.coalesce(oldest, 0))
+    elif dialect == "sqlite":
+        match = " ".join(f'"{term}"*' if p else f'"{term}"' for term, p in zip(terms, prefixed))
+        matches = text("books_fts MATCH :match").bindparams(match=match)
+        query = select(Book).join(_books_fts, _books_fts.c.rowid == Book.id).where(matches)\
+            .order_by(text("bm25(books_fts, 10.0, 5.0)"), Book.id)
+        if window is not None:
+            oldest = select(_books_fts.c.rowid).where(matches)\
+                .order_by(_books_fts.c.rowid.desc()).limit(1).offset(window - 1).scalar_subquery()
+            query = query.where(_books_fts.c.rowid >= func.coalesce(oldest, 0))
+    else:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                            detail=f"Search is not supported on {dialect}")
+    if available_only:
+        query = query.where(Book.available_copies > 0)
+    return query
+
+
+async def search_books(db: AsyncSession, q: str, available_only: bool = False,
+                       limit: int = 20, offset: int = 0) -> tuple[list[Book], Optional[int]]:
+    """Full-text search over titles and authors, best matches first.
+
+    Titles weigh more than authors. Every match is ranked and pages are
+    cut from that one order (ORDER BY rank, id LIMIT/OFFSET), so the best
+    matches come first whatever their age and pages never overlap. Returns
+    one page of books and the offset of the next page, or None when this is
+    the last one.
+    """
+    terms = _search_terms(q)
+    if not terms:
+        return [], None
+    query = _search_query(db.get_bind().dialect.name, terms, False, available_only)
+    result = await db.execute(query.limit(limit + 1).offset(offset))
+    books = list(result.scalars().all())
+    if len(books) > limit:
+        return books[:limit], offset + limit
+    return books, None
+
+
+async def autocomplete_books(db: AsyncSession, q: str, limit: int = 10,
+                             available_only: bool = False) -> list[Book]:
+    """Suggest books whose title or author words start with every typed term."""
+    terms = _search_terms(q)
+    if not terms:
+        return []
+    query = _search_query(db.get_bind().dialect.name, terms, True, available_only,
+                          settings.AUTOCOMPLETE_RANK_WINDOW)
+    result = await db.execute(query.limit(limit))
+    return list(result.scalars().all())
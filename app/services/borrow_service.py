@@ -1,47 +1,434 @@
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+import base64
+from collections import Counter
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import Integer, and_, case, false, func, insert, literal, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import cached, invalidate_tags
+from app.core.responses import get_adapter
 from app.models.book import Book
 from app.models.borrow import Borrow
 from app.models.member import Member
-from app.schemas.borrow import BorrowCreate
-from app.tasks.email_tasks import send_borrow_email, send_return_email
+from app.schemas.borrow import BatchItemResult, BorrowCreate, BorrowResponse
 from datetime import datetime
+from app.services.hold_service import assign_holds, hold_notifications, lock_books, waitlisted
+from app.services.inventory import claim_copies, copies_enabled, deltas_after_commit, release_copies
+from app.services.outbox import enqueue, outbox_row
 
 
-async def borrow_book(borrow_data: BorrowCreate, db: Session) -> Borrow:
-    """Borrow a book."""
-    book = db.query(Book).filter(Book.id == borrow_data.book_id).first()
-    member = db.query(Member).filter(Member.id == borrow_data.member_id).first()
-    if not book or not member:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book or member not found")
-    if book.available_copies <= 0:
+WAITLISTED = "Members are waiting for this book, place a hold instead"
+
+
+async def borrow_book(borrow_data: BorrowCreate, db: AsyncSession) -> Borrow:
+    """Borrow a book.
+
+    The copy is claimed with a conditional UPDATE, so concurrent borrows can
+    never take available_copies below zero, and the Borrow row is inserted
+    from a SELECT on members in the same transaction; a missing member
+    inserts nothing and rolls the claim back. The notification is written
+    to the outbox in the same transaction. While members wait for the book
+    its copies go to them, so the claim also requires an empty waitlist
+    and a borrow past it is refused with 409.
+
+    With INVENTORY_MODEL=copies the claim takes one available copy instead
+    (see app.services.inventory) and available_copies follows it.
+    """
+    now = datetime.now()
+    copy_id = None
+    if copies_enabled():
+        copy_id = next(iter(await claim_copies(db, borrow_data.book_id, 1, now,
+                                               guard=~waitlisted(borrow_data.book_id))), None)
+        claimed = copy_id is not None
+    else:
+        claimed = (await db.execute(
+            update(Book)
+            .where(Book.id == borrow_data.book_id, Book.available_copies > 0, ~waitlisted(Book.id))
+            .values(available_copies=Book.available_copies - 1, updated_at=now)
+            .returning(Book.id)
+            .execution_options(synchronize_session=False)
+        )).scalar_one_or_none() is not None
+    if not claimed:
+        await db.rollback()
+        book = (await db.execute(
+            select(Book.id, waitlisted(Book.id).label("waitlisted")).where(Book.id == borrow_data.book_id)
+        )).first()
+        if book is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book or member not found")
+        if book.waitlisted:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=WAITLISTED)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No copies available")
-    borrow = Borrow(book_id=borrow_data.book_id, member_id=borrow_data.member_id, notification_sent=False)
-    book.available_copies -= 1
-    db.add(borrow)
-    db.commit()
-    db.refresh(borrow)
-    send_borrow_email.delay(borrow.id)
+    inserted = await db.execute(
+        insert(Borrow)
+        .from_select(
+            ["book_id", "member_id", "notification_sent", "copy_id", "created_at", "updated_at"],
+            select(literal(borrow_data.book_id), Member.id, false(), literal(copy_id, Integer),
+                   literal(now), literal(now))
+            .where(Member.id == borrow_data.member_id),
+        )
+        .returning(Borrow)
+    )
+    borrow = inserted.scalar_one_or_none()
+    if borrow is None:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book or member not found")
+    await enqueue(db, outbox_row("send_borrow_email", borrow.id, member_id=borrow.member_id))
+    await _commit_copies(db, {borrow.book_id: -1} if copy_id is not None else {}, now)
+    await invalidate_tags(*_circulation_tags([borrow]))
     return borrow
 
 
-async def return_book(borrow_id: int, db: Session) -> Borrow:
-    """Return a book."""
-    borrow = db.query(Borrow).filter(Borrow.id == borrow_id).first()
-    if not borrow:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Borrow not found")
-    if borrow.return_date:
+async def return_book(borrow_id: int, db: AsyncSession) -> Borrow:
+    """Return a book.
+
+    Closing the borrow and restoring the copy are two conditional UPDATEs in
+    one transaction; only the request that actually closes the borrow gets
+    to increment available_copies. When the book has a waitlist, the copy
+    is checked out to the oldest waiting hold instead (assign_holds), with
+    the book locked so no hold can join the queue behind its back. The
+    notifications are written to the outbox before the commit. A borrow
+    of a specific copy puts that copy back on the shelf, or hands it to
+    the holder.
+    """
+    now = datetime.now()
+    closed = await db.execute(
+        update(Borrow)
+        .where(Borrow.id == borrow_id, Borrow.return_date.is_(None))
+        .values(return_date=datetime.utcnow(), notification_sent=True, updated_at=now)
+        .returning(Borrow)
+        .execution_options(populate_existing=True)
+    )
+    borrow = closed.scalar_one_or_none()
+    if borrow is None:
+        await db.rollback()
+        exists = await db.scalar(select(Borrow.id).where(Borrow.id == borrow_id))
+        if exists is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Borrow not found")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Book already returned")
-    book = db.query(Book).filter(Book.id == borrow.book_id).first()
-    book.available_copies += 1
-    borrow.return_date = datetime.utcnow()
-    borrow.notification_sent = True
-    db.commit()
-    db.refresh(borrow)
-    send_return_email.delay(borrow.id)
+    copies = copies_enabled()
+    await lock_books(db, [borrow.book_id])
+    assigned, shelved = await assign_holds(db, Counter({borrow.book_id: 1}), now,
+                                           copies={borrow.book_id: [borrow.copy_id]} if borrow.copy_id else None)
+    if shelved and copies:
+        await release_copies(db, [borrow.copy_id] if borrow.copy_id else [], now)
+    elif shelved:
+        await db.execute(
+            update(Book)
+            .where(Book.id == borrow.book_id, Book.available_copies < Book.total_copies)
+            .values(available_copies=Book.available_copies + 1, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    await enqueue(db, outbox_row("send_return_email", borrow.id, member_id=borrow.member_id),
+                  *hold_notifications(assigned))
+    await _commit_copies(db, {borrow.book_id: 1} if shelved and copies and borrow.copy_id else {}, now)
+    await invalidate_tags(*_circulation_tags([borrow, *assigned]))
     return borrow
 
 
-async def get_member_borrows(member_id: int, db: Session) -> list[Borrow]:
-    """Retrieve a member's borrows."""
-    return db.query(Borrow).filter(Borrow.member_id == member_id).all()
+def _circulation_tags(borrows, book_ids=()) -> set[str]:
+    """Cache tags made stale by borrowing or returning these borrows."""
+    tags = {f"book:{book_id}" for book_id in book_ids}
+    for borrow in borrows:
+        tags.update((f"book:{borrow.book_id}", f"member:{borrow.member_id}"))
+    return tags
+
+
+def _notifications(task: str, borrows) -> list[dict]:
+    """One outbox row per member for a batch of borrows."""
+    by_member = {}
+    for borrow in borrows:
+        by_member.setdefault(borrow.member_id, []).append(borrow.id)
+    return [outbox_row(task, ids, member_id=member_id) for member_id, ids in by_member.items()]
+
+
+def encode_borrow_cursor(borrow) -> str:
+    """Opaque keyset cursor pointing just after the given borrow."""
+    raw = f"{borrow.borrow_date.isoformat()}|{borrow.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_borrow_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, borrow_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(borrow_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _member_borrows_query(member_id: int, state: Optional[str] = None,
+                          cursor: Optional[str] = None):
+    """Newest-first borrows of a member, keyset-paginated on (created_at, id)."""
+    query = select(Borrow).where(Borrow.member_id == member_id)
+    if state == "open":
+        query = query.where(Borrow.return_date.is_(None))
+    elif state == "returned":
+        query = query.where(Borrow.return_date.is_not(None))
+    if cursor:
+        created_at, borrow_id = decode_borrow_cursor(cursor)
+        query = query.where(or_(Borrow.created_at < created_at,
+                                and_(Borrow.created_at == created_at, Borrow.id < borrow_id)))
+    return query.order_by(Borrow.created_at.desc(), Borrow.id.desc())
+
+
+async def get_member_borrows_version(member_id: int, db: AsyncSession) -> tuple[int, Optional[datetime]]:
+    """(count, max(updated_at)) of a member's borrows.
+
+    Every borrow, return or deletion changes one of the two, so they serve
+    as the version of any page of the history. Answered from
+    ix_borrows_member_created, which carries updated_at, without touching
+    borrow rows.
+    """
+    result = await db.execute(
+        select(func.count(), func.max(Borrow.updated_at)).where(Borrow.member_id == member_id)
+    )
+    count, last_modified = result.one()
+    return count, last_modified
+
+
+@cached(key=lambda args: f"borrows:{args['member_id']}:{args['state']}:{args['cursor']}:{args['limit']}"
+                         f":{args['version']}",
+        tags=lambda args: [f"member:{args['member_id']}"],
+        encode=lambda borrows: get_adapter(List[BorrowResponse]).dump_python(borrows, mode="json"),
+        decode=lambda rows: get_adapter(List[BorrowResponse]).validate_python(rows))
+async def get_member_borrows(member_id: int, db: AsyncSession, state: Optional[str] = None,
+                             cursor: Optional[str] = None, limit: Optional[int] = None,
+                             version=None) -> list[BorrowResponse]:
+    """Retrieve a page of a member's borrows, newest first.
+
+    Pages are read-through cached under the member:<id> tag, which
+    borrowing and returning invalidate. Callers that hold a version from
+    get_member_borrows_version pass it along so the cached page can never
+    be older than the validators sent with it.
+    """
+    query = _member_borrows_query(member_id, state, cursor)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return get_adapter(List[BorrowResponse]).validate_python(result.scalars().all(), from_attributes=True)
+
+
+async def stream_member_borrows(member_id: int, session_factory, state: Optional[str] = None,
+                                cursor: Optional[str] = None,
+                                chunk_size: int = 500) -> AsyncIterator[Borrow]:
+    """Yield a member's whole history through a server-side cursor.
+
+    Rows are fetched chunk_size at a time (yield_per), so memory stays flat
+    however long the history is. The session is opened here rather than
+    taken from the request because it has to outlive the endpoint call.
+    """
+    query = _member_borrows_query(member_id, state, cursor)
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=chunk_size))
+        async for borrow in result.scalars():
+            yield borrow
+            db.expunge(borrow)
+
+
+def _failure(index: int, status_code: int, detail: str) -> BatchItemResult:
+    return BatchItemResult(index=index, ok=False, status_code=status_code, detail=detail)
+
+
+async def _adjust_copies(db: AsyncSession, deltas: dict[int, int], now: datetime):
+    """Add per-book deltas to available_copies with one UPDATE."""
+    if not deltas:
+        return
+    delta = case(deltas, value=Book.id, else_=0)
+    await db.execute(
+        update(Book)
+        .where(Book.id.in_(deltas))
+        .values(available_copies=Book.available_copies + delta, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _commit_copies(db: AsyncSession, deltas: dict[int, int], now: datetime):
+    """Commit, adding the per-copy model's changes to available_copies.
+
+    They go in with the circulation change, or right after it in a
+    transaction of their own where deltas_after_commit says so. Without
+    deltas (the counter model) this is a plain commit.
+    """
+    after = bool(deltas) and deltas_after_commit(db)
+    if not after:
+        await _adjust_copies(db, deltas, now)
+    await db.commit()
+    if after:
+        await _adjust_copies(db, deltas, now)
+        await db.commit()
+
+
+async def _claim_copies(db: AsyncSession, wanted: Counter, now: datetime) -> dict[int, int]:
+    """Claim copies for several books and return how many each one got.
+
+    Books that can satisfy the whole request, and have no waitlist, are
+    decremented with a single guarded UPDATE. Books that cannot (or do not exist) fall back to
+    one-copy conditional decrements, so partial batches still get every
+    copy that is actually free.
+    """
+    granted = {}
+    demand = case(dict(wanted), value=Book.id, else_=0)
+    result = await db.execute(
+        update(Book)
+        .where(Book.id.in_(wanted), Book.available_copies >= demand, ~waitlisted(Book.id))
+        .values(available_copies=Book.available_copies - demand, updated_at=now)
+        .returning(Book.id)
+        .execution_options(synchronize_session=False)
+    )
+    for book_id in result.scalars():
+        granted[book_id] = wanted[book_id]
+    for book_id, count in wanted.items():
+        if book_id in granted:
+            continue
+        granted[book_id] = 0
+        for _ in range(count):
+            claimed = await db.execute(
+                update(Book)
+                .where(Book.id == book_id, Book.available_copies > 0, ~waitlisted(Book.id))
+                .values(available_copies=Book.available_copies - 1, updated_at=now)
+                .returning(Book.id)
+                .execution_options(synchronize_session=False)
+            )
+            if claimed.scalar_one_or_none() is None:
+                break
+            granted[book_id] += 1
+    return granted
+
+
+async def borrow_books(items: list[BorrowCreate], db: AsyncSession) -> list[BatchItemResult]:
+    """Borrow several books in one transaction.
+
+    Counters are claimed set-based (see _claim_copies), unknown members get
+    their copies handed back, the Borrow rows go in with one bulk INSERT and
+    one grouped notification per member goes into the outbox with them.
+    With INVENTORY_MODEL=copies each book's copies are claimed with one
+    UPDATE instead. Books with a waitlist are refused with 409, as in
+    borrow_book.
+    """
+    now = datetime.now()
+    results: list[BatchItemResult] = [None] * len(items)
+    wanted = Counter(item.book_id for item in items)
+    copies = copies_enabled()
+    if copies:
+        claimed = {book_id: await claim_copies(db, book_id, count, now, guard=~waitlisted(book_id))
+                   for book_id, count in wanted.items()}
+        granted = {book_id: len(copy_ids) for book_id, copy_ids in claimed.items()}
+    else:
+        granted = await _claim_copies(db, wanted, now)
+
+    member_ids = {item.member_id for item in items}
+    known_members = set((await db.scalars(select(Member.id).where(Member.id.in_(member_ids)))).all())
+    known_books = {book_id for book_id, count in granted.items() if count > 0}
+    unclaimed = [book_id for book_id, count in granted.items() if count == 0]
+    held = set()
+    if unclaimed:
+        for book in (await db.execute(
+            select(Book.id, waitlisted(Book.id).label("waitlisted")).where(Book.id.in_(unclaimed))
+        )).all():
+            known_books.add(book.id)
+            if book.waitlisted:
+                held.add(book.id)
+
+    rows, row_indexes, released, released_copies = [], [], Counter(), []
+    for index, item in enumerate(items):
+        if granted[item.book_id] == 0:
+            if item.book_id in held:
+                results[index] = _failure(index, status.HTTP_409_CONFLICT, WAITLISTED)
+            elif item.book_id in known_books:
+                results[index] = _failure(index, status.HTTP_400_BAD_REQUEST, "No copies available")
+            else:
+                results[index] = _failure(index, status.HTTP_404_NOT_FOUND, "Book or member not found")
+            continue
+        granted[item.book_id] -= 1
+        copy_id = claimed[item.book_id].pop(0) if copies else None
+        if item.member_id not in known_members:
+            released[item.book_id] += 1
+            released_copies.append(copy_id)
+            results[index] = _failure(index, status.HTTP_404_NOT_FOUND, "Book or member not found")
+            continue
+        rows.append({"book_id": item.book_id, "member_id": item.member_id, "notification_sent": False,
+                     "copy_id": copy_id, "created_at": now, "updated_at": now})
+        row_indexes.append(index)
+    if copies:
+        await release_copies(db, released_copies, now)
+    else:
+        await _adjust_copies(db, dict(released), now)
+
+    borrows = []
+    if rows:
+        borrows = list((await db.scalars(
+            insert(Borrow).returning(Borrow, sort_by_parameter_order=True), rows
+        )).all())
+        await enqueue(db, *_notifications("send_borrow_emails", borrows))
+    lent = Counter(row["book_id"] for row in rows) if copies else {}
+    await _commit_copies(db, {book_id: -count for book_id, count in lent.items()}, now)
+    # Released copies changed counters too, so every requested book is stale
+    await invalidate_tags(*_circulation_tags(borrows, granted))
+    for index, borrow in zip(row_indexes, borrows):
+        results[index] = BatchItemResult(index=index, ok=True, status_code=status.HTTP_200_OK,
+                                         borrow=BorrowResponse.model_validate(borrow))
+    return results
+
+
+async def return_books(borrow_ids: list[int], db: AsyncSession) -> list[BatchItemResult]:
+    """Return several borrows in one transaction.
+
+    All open borrows are closed by one UPDATE ... RETURNING, their books
+    are locked (lock_books), copies of books with a waitlist go to the
+    oldest holds (assign_holds), the rest
+    get back on the shelf through one CASE-based UPDATE (or one UPDATE of
+    their book_copies rows), and one grouped notification per member goes
+    into the outbox in the same transaction.
+    """
+    now = datetime.now()
+    results: list[BatchItemResult] = [None] * len(borrow_ids)
+    closed = (await db.scalars(
+        update(Borrow)
+        .where(Borrow.id.in_(set(borrow_ids)), Borrow.return_date.is_(None))
+        .values(return_date=datetime.utcnow(), notification_sent=True, updated_at=now)
+        .returning(Borrow)
+        .execution_options(populate_existing=True)
+    )).all()
+    closed_by_id = {borrow.id: borrow for borrow in closed}
+
+    copies = copies_enabled()
+    returned_copies = {}
+    for borrow in closed:
+        if borrow.copy_id is not None:
+            returned_copies.setdefault(borrow.book_id, []).append(borrow.copy_id)
+    await lock_books(db, [borrow.book_id for borrow in closed])
+    assigned, restored = await assign_holds(db, Counter(borrow.book_id for borrow in closed), now,
+                                            copies=returned_copies) if closed else ([], Counter())
+    shelved_copies = Counter()
+    if copies:
+        handed_over = {borrow.copy_id for borrow in assigned}
+        shelved = [(book_id, copy_id) for book_id, copy_ids in returned_copies.items() for copy_id in copy_ids
+                   if copy_id not in handed_over]
+        await release_copies(db, [copy_id for _, copy_id in shelved], now)
+        shelved_copies.update(book_id for book_id, _ in shelved)
+    elif restored:
+        restored_copies = Book.available_copies + case(dict(restored), value=Book.id, else_=0)
+        await db.execute(
+            update(Book)
+            .where(Book.id.in_(restored))
+            .values(available_copies=case((restored_copies > Book.total_copies, Book.total_copies),
+                                          else_=restored_copies),
+                    updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    unmatched = set(borrow_ids) - set(closed_by_id)
+    existing = set((await db.scalars(select(Borrow.id).where(Borrow.id.in_(unmatched)))).all()) \
+        if unmatched else set()
+    if closed:
+        await enqueue(db, *_notifications("send_return_emails", closed), *hold_notifications(assigned))
+    await _commit_copies(db, dict(shelved_copies), now)
+    await invalidate_tags(*_circulation_tags([*closed, *assigned]))
+
+    for index, borrow_id in enumerate(borrow_ids):
+        borrow = closed_by_id.pop(borrow_id, None)
+        if borrow is not None:
+            results[index] = BatchItemResult(index=index, ok=True, status_code=status.HTTP_200_OK,
+                                             borrow=BorrowResponse.model_validate(borrow))
+        elif borrow_id in existing or borrow_id not in unmatched:
+            results[index] = _failure(index, status.HTTP_400_BAD_REQUEST, "Book already returned")
+        else:
+            results[index] = _failure(index, status.HTTP_404_NOT_FOUND, "Borrow not found")
+    return results
@@ -0,0 +1,251 @@
+"""Streaming export of books, members and borrows as CSV, NDJSON or Parquet.
+
+Rows come from a server-side cursor EXPORT_CHUNK_SIZE at a time and are
+encoded (and optionally gzipped) chunk by chunk, so memory stays flat
+whatever the table size. Parquet needs the optional pyarrow package.
+
+Command line (writes to a file, or stdout without -o):
+
+    python -m app.services.catalog_export borrows --format parquet --since 2024-01-01 -o borrows.parquet
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import Boolean, DateTime, Integer, select
+
+from app.core.config import settings
+from app.models.book import Book
+from app.models.borrow import Borrow
+from app.models.member import Member
+
+FORMATS = ("csv", "ndjson", "parquet")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+# Exported columns per dataset; members never include password hashes
+DATASETS = {
+    "books": (Book, [Book.id, Book.title, Book.author, Book.isbn, Book.total_copies,
+                     Book.available_copies, Book.created_at, Book.updated_at]),
+    "members": (Member, [Member.id, Member.name, Member.email, Member.is_admin,
+                         Member.created_at, Member.updated_at]),
+    "borrows": (Borrow, [Borrow.id, Borrow.book_id, Borrow.member_id,
+                         Borrow.created_at.label("borrow_date"), Borrow.return_date,
+                         Borrow.notification_sent, Borrow.updated_at]),
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_query(dataset: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 member_id: Optional[int] = None):
+    """SELECT for a dataset in primary-key order.
+
+    since/until bound created_at (the borrow date for borrows) as a
+    half-open range; member_id applies to borrows and members.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset {dataset!r}, expected one of {', '.join(DATASETS)}")
+    model, columns = DATASETS[dataset]
+    query = select(*columns).order_by(model.id)
+    if since is not None:
+        query = query.where(model.created_at >= since)
+    if until is not None:
+        query = query.where(model.created_at < until)
+    if member_id is not None:
+        if dataset == "books":
+            raise ValueError("member_id does not apply to books")
+        query = query.where((Borrow.member_id if dataset == "borrows" else Member.id) == member_id)
+    return query
+
+
+def column_names(dataset: str) -> list[str]:
+    return [column.key for column in DATASETS[dataset][1]]
+
+
+async def export_rows(session_factory, query, chunk_size: Optional[int] = None) -> AsyncIterator[list]:
+    """Yield lists of row tuples from a server-side cursor.
+
+    The session is opened here, like stream_member_borrows, because a
+    streaming response outlives the endpoint call.
+    """
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=chunk_size or settings.EXPORT_CHUNK_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def _encode_csv(names: list[str], partitions) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(names)
+    async for rows in partitions:
+        writer.writerows([_text(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def _encode_ndjson(names: list[str], partitions) -> AsyncIterator[bytes]:
+    async for rows in partitions:
+        yield "".join(json.dumps(dict(zip(names, row)), default=_json_default) + "\n" for row in rows).encode()
+
+
+class _ParquetSink:
+    """Write-only file object that hands written bytes back on drain()."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(dataset: str):
+    import pyarrow as pa
+    fields = []
+    for column in DATASETS[dataset][1]:
+        if isinstance(column.type, Boolean):
+            type_ = pa.bool_()
+        elif isinstance(column.type, Integer):
+            type_ = pa.int64()
+        elif isinstance(column.type, DateTime):
+            type_ = pa.timestamp("us")
+        else:
+            type_ = pa.string()
+        fields.append(pa.field(column.key, type_))
+    return pa.schema(fields)
+
+
+async def _encode_parquet(dataset: str, partitions) -> AsyncIterator[bytes]:
+    """One row group per chunk; each is sent as soon as it is written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = _arrow_schema(dataset)
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    try:
+        async for rows in partitions:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+async def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encode_export(dataset: str, fmt: str, partitions, gzip: bool = False) -> AsyncIterator[bytes]:
+    """Encode row partitions of a dataset as a stream of bytes."""
+    if fmt == "csv":
+        chunks = _encode_csv(column_names(dataset), partitions)
+    elif fmt == "ndjson":
+        chunks = _encode_ndjson(column_names(dataset), partitions)
+    elif fmt == "parquet":
+        if gzip:
+            raise ValueError("Parquet is compressed internally; gzip applies to csv and ndjson")
+        if not parquet_available():
+            raise ValueError("Parquet export needs pyarrow installed")
+        chunks = _encode_parquet(dataset, partitions)
+    else:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    return _gzip(chunks) if gzip else chunks
+
+
+def export_filename(dataset: str, fmt: str, gzip: bool = False) -> str:
+    return f"{dataset}.{fmt}" + (".gz" if gzip else "")
+
+
+async def _run_cli(args):
+    from app.models.base import dispose_async_engine, get_async_session_factory
+
+    query = export_query(args.dataset, since=args.since, until=args.until, member_id=args.member_id)
+    chunks = encode_export(args.dataset, args.format,
+                           export_rows(get_async_session_factory(), query, args.chunk_size), gzip=args.gzip)
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        async for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+        await dispose_async_engine()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export books, members or borrows.")
+    parser.add_argument("dataset", choices=list(DATASETS))
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="created on or after (ISO date)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="created before (ISO date)")
+    parser.add_argument("--member-id", type=int)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_run_cli(args))
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
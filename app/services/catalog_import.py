@@ -0,0 +1,403 @@
+"""Streaming bulk import of books from CSV, NDJSON or MARC (ISO 2709).
+
+Input is read as an async stream of byte chunks and parsed record by
+record; validated rows are written in chunks of IMPORT_CHUNK_SIZE with one
+executemany INSERT ... ON CONFLICT (isbn) and one commit per chunk, so
+memory stays bounded by the chunk size whatever the input size.
+
+Command line (reads a file, prints the report as JSON):
+
+    python -m app.services.catalog_import acquisitions.csv --rejects rejects.ndjson
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import time
+from datetime import datetime
+from typing import AsyncIterator, Callable, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import case, func, insert, or_, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import invalidate_tags
+from app.core.config import settings
+from app.models.book import Book
+from app.schemas.book import BookCreate, BookImportReject, BookImportReport
+from app.services import inventory
+from app.services.hold_service import hold_notifications, serve_waitlists
+from app.services.outbox import enqueue
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson", "marc")
+ON_CONFLICT = ("update", "skip")
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".mrc": "marc", ".marc": "marc"}
+
+# (position, record, error): exactly one of record and error is set
+ParsedRecord = tuple[int, Optional[dict], Optional[str]]
+
+MARC_RECORD_END = b"\x1d"
+MARC_FIELD_END = b"\x1e"
+MARC_SUBFIELD = b"\x1f"
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream incrementally into lines (BOM and CR dropped)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.removesuffix("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.removesuffix("\r")
+
+
+async def parse_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRecord]:
+    """CSV with a header row naming title, author, total_copies and isbn.
+
+    Quoted fields may span lines; a record is complete once its quotes
+    balance. Positions are the line the record starts on.
+    """
+    header = None
+    pending: list[str] = []
+    quotes = 0
+    line_no = start = 0
+    async for line in _lines(chunks):
+        line_no += 1
+        if not pending:
+            start = line_no
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        text = "\n".join(pending)
+        pending, quotes = [], 0
+        if not text.strip():
+            continue
+        row = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in row]
+            continue
+        if len(row) != len(header):
+            yield start, None, f"expected {len(header)} fields, got {len(row)}"
+            continue
+        yield start, dict(zip(header, row)), None
+    if pending:
+        yield start, None, "unterminated quoted field"
+
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRecord]:
+    """One JSON object per line; blank lines are skipped."""
+    line_no = 0
+    async for line in _lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "expected a JSON object"
+            continue
+        yield line_no, record, None
+
+
+def _subfields(data: bytes, encoding: str) -> dict[str, str]:
+    values: dict[str, str] = {}
+    for part in data.split(MARC_SUBFIELD)[1:]:
+        if part:
+            values.setdefault(part[:1].decode("ascii", "replace"), part[1:].decode(encoding, "replace"))
+    return values
+
+
+def _clean(value: str, trailing: str) -> str:
+    return " ".join(value.split()).rstrip(trailing).strip()
+
+
+def marc_to_record(raw: bytes) -> dict:
+    """Map one MARC 21 bibliographic record onto BookCreate fields.
+
+    245 $a/$b is the title, 100 $a (else 110 or 700) the author and the
+    first 020 $a the ISBN. Each 852 holdings field counts as one copy, with
+    one copy when there are none. Records not flagged UTF-8 in the leader
+    are MARC-8, read here as Latin-1, which only differs for diacritics.
+    """
+    leader = raw[:24]
+    if len(leader) < 24:
+        raise ValueError("record shorter than its leader")
+    encoding = "utf-8" if leader[9:10] == b"a" else "latin-1"
+    base = int(leader[12:17])
+    directory = raw[24:base - 1]
+    fields: dict[str, list[bytes]] = {}
+    for offset in range(0, len(directory) - 11, 12):
+        entry = directory[offset:offset + 12]
+        tag = entry[:3].decode("ascii")
+        length, start = int(entry[3:7]), int(entry[7:12])
+        fields.setdefault(tag, []).append(raw[base + start:base + start + length].rstrip(MARC_FIELD_END))
+
+    def first(tags, code="a") -> Optional[str]:
+        for tag in tags:
+            for data in fields.get(tag, []):
+                value = _subfields(data, encoding).get(code)
+                if value:
+                    return value
+        return None
+
+    title = " ".join(filter(None, (first(["245"], "a"), first(["245"], "b"))))
+    isbn = first(["020"])
+    return {
+        "title": _clean(title, " /:;,."),
+        "author": _clean(first(["100", "110", "700"]) or "", " ,"),
+        "isbn": isbn.split()[0] if isbn else None,
+        "total_copies": len(fields.get("852", [])) or 1,
+    }
+
+
+async def parse_marc(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRecord]:
+    """MARC 21 transmission format; positions are 1-based record numbers."""
+    buffer = b""
+    number = 0
+
+    def parse(raw: bytes) -> ParsedRecord:
+        try:
+            return number, marc_to_record(raw), None
+        except (ValueError, IndexError, UnicodeDecodeError) as e:
+            return number, None, f"malformed MARC record: {e}"
+
+    async for chunk in chunks:
+        buffer += chunk
+        *records, buffer = buffer.split(MARC_RECORD_END)
+        for raw in records:
+            if raw.strip():
+                number += 1
+                yield parse(raw.lstrip())
+    if buffer.strip():
+        number += 1
+        yield parse(buffer.lstrip())
+
+
+PARSERS = {"csv": parse_csv, "ndjson": parse_ndjson, "marc": parse_marc}
+
+
+def parse_records(fmt: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRecord]:
+    if fmt not in PARSERS:
+        raise ValueError(f"Unknown import format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    return PARSERS[fmt](chunks)
+
+
+def _book_insert(dialect: str, on_conflict: str):
+    """INSERT for one chunk, upserting on the ISBN where the dialect can."""
+    # Core table, not the entity: the ORM bulk-insert path costs more than
+    # the database does at these batch sizes
+    books = Book.__table__
+    if dialect == "postgresql":
+        stmt = postgresql.insert(books)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(books)
+    else:
+        logger.warning(f"No upsert support for {dialect}; importing with plain INSERT")
+        return insert(books)
+    if on_conflict == "skip":
+        return stmt.on_conflict_do_nothing(index_elements=[books.c.isbn])
+    excluded = stmt.excluded
+    # Keep copies on loan out of the shelf count when the total changes
+    available = books.c.available_copies + excluded.total_copies - books.c.total_copies
+    return stmt.on_conflict_do_update(
+        index_elements=[books.c.isbn],
+        # Unchanged books are left alone, so re-imports write nothing
+        where=or_(books.c.title != excluded.title, books.c.author != excluded.author,
+                  books.c.total_copies != excluded.total_copies),
+        set_={
+            "title": excluded.title,
+            "author": excluded.author,
+            "total_copies": excluded.total_copies,
+            "available_copies": case((available < 0, 0), else_=available),
+            "updated_at": excluded.updated_at,
+        },
+    )
+
+
+async def _write_sqlite(conn, stmt, rows: list[dict]):
+    """Insert a chunk with the per-row FTS trigger paused, then index it at once.
+
+    The pause row is only visible to this transaction. Rows the upsert
+    updates still go through the FTS update trigger; rows it inserts get
+    ids above the previous maximum and are indexed by one INSERT ... SELECT,
+    several times faster than the trigger firing row by row.
+    """
+    await conn.execute(text("INSERT INTO books_fts_paused (paused) VALUES (1)"))
+    last_id = (await conn.execute(select(func.max(Book.id)))).scalar() or 0
+    result = await conn.execute(stmt, rows)
+    await conn.execute(text("INSERT INTO books_fts(rowid, title, author) "
+                            "SELECT id, title, author FROM books WHERE id > :last_id"), {"last_id": last_id})
+    await conn.execute(text("DELETE FROM books_fts_paused"))
+    return result
+
+
+async def import_books(db: AsyncSession, records: AsyncIterator[ParsedRecord], on_conflict: str = "update",
+                       chunk_size: Optional[int] = None,
+                       on_reject: Optional[Callable[[BookImportReject], None]] = None) -> BookImportReport:
+    """Validate parsed records with BookCreate and write them in chunks.
+
+    Books are upserted by ISBN: "update" overwrites title, author and
+    copies of an existing book, "skip" leaves it alone. Books without an
+    ISBN are always inserted. Each chunk is committed on its own, so an
+    error stops the import after the last committed chunk. Under
+    INVENTORY_MODEL=copies the books a chunk inserts or changes get their
+    copies created or retired in the same transaction. Copies a book gains
+    go to its waiting holds first (serve_waitlists). The report
+    lists the first IMPORT_MAX_REJECTS_REPORTED rejects; on_reject sees
+    every one.
+    """
+    if on_conflict not in ON_CONFLICT:
+        raise ValueError(f"on_conflict must be one of {', '.join(ON_CONFLICT)}")
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    dialect = db.bind.dialect.name
+    stmt = _book_insert(dialect, on_conflict)
+    copies = inventory.copies_enabled()
+    # Only rows actually inserted or updated come back, so unchanged books
+    # are not synced or served again
+    stmt = stmt.returning(Book.__table__.c.id)
+    started = time.perf_counter()
+    report = BookImportReport(received=0, written=0, rejected=0, chunks=0, seconds=0)
+    keyed: dict[str, dict] = {}
+    unkeyed: list[dict] = []
+
+    def reject(position: int, error: str):
+        report.rejected += 1
+        entry = BookImportReject(position=position, error=error)
+        if len(report.rejects) < settings.IMPORT_MAX_REJECTS_REPORTED:
+            report.rejects.append(entry)
+        if on_reject is not None:
+            on_reject(entry)
+
+    async def write(rows: list[dict]):
+        conn = await db.connection()
+        if dialect == "sqlite":
+            result = await _write_sqlite(conn, stmt, rows)
+        else:
+            result = await conn.execute(stmt, rows)
+        book_ids = result.scalars().all()
+        now = datetime.now()
+        if copies:
+            await inventory.sync_book_copies(db, book_ids, now)
+        assigned = await serve_waitlists(db, book_ids, now)
+        if assigned:
+            await enqueue(db, *hold_notifications(assigned))
+        await db.commit()
+        if assigned:
+            await invalidate_tags(*{tag for borrow in assigned
+                                    for tag in (f"book:{borrow.book_id}", f"member:{borrow.member_id}")})
+        report.written += len(rows)
+        report.chunks += 1
+
+    writing: Optional[asyncio.Task] = None
+
+    async def flush():
+        # The previous chunk is written while this one is parsed; at most
+        # one write is in flight, so the session is never used concurrently
+        nonlocal writing, keyed, unkeyed
+        rows = [*unkeyed, *keyed.values()]
+        keyed, unkeyed = {}, []
+        if writing is not None:
+            await writing
+        writing = asyncio.ensure_future(write(rows)) if rows else None
+
+    try:
+        async for position, record, error in records:
+            report.received += 1
+            if error is not None:
+                reject(position, error)
+                continue
+            try:
+                book = BookCreate.model_validate(record)
+            except ValidationError as e:
+                reject(position, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                                           for err in e.errors()))
+                continue
+            now = datetime.now()
+            row = {"title": book.title, "author": book.author, "isbn": book.isbn,
+                   "total_copies": book.total_copies, "available_copies": book.total_copies,
+                   "created_at": now, "updated_at": now}
+            if book.isbn is None:
+                unkeyed.append(row)
+            else:
+                # One statement may not touch a conflict key twice on Postgres
+                if book.isbn in keyed:
+                    report.duplicates += 1
+                keyed[book.isbn] = row
+            if len(keyed) + len(unkeyed) >= chunk_size:
+                await flush()
+        await flush()
+        if writing is not None:
+            await writing
+    except BaseException:
+        if writing is not None and not writing.done():
+            # Let the in-flight chunk settle before the caller closes the session
+            await asyncio.gather(writing, return_exceptions=True)
+        raise
+    report.seconds = round(time.perf_counter() - started, 3)
+    logger.info(f"Catalog import: {report.written} written, {report.rejected} rejected "
+                f"in {report.chunks} chunks, {report.seconds}s")
+    return report
+
+
+async def _read_file(path: str, chunk_size: int = 1 << 20) -> AsyncIterator[bytes]:
+    with open(path, "rb") as source:
+        while chunk := source.read(chunk_size):
+            yield chunk
+
+
+async def _run_cli(args) -> BookImportReport:
+    from app.models.base import dispose_async_engine, get_async_session_factory
+    import app.models.borrow  # noqa: F401
+    import app.models.member  # noqa: F401
+
+    rejects = open(args.rejects, "w") if args.rejects else None
+
+    def write_reject(entry: BookImportReject):
+        rejects.write(entry.model_dump_json() + "\n")
+
+    try:
+        async with get_async_session_factory()() as db:
+            return await import_books(db, parse_records(args.format, _read_file(args.path)),
+                                      on_conflict=args.on_conflict, chunk_size=args.chunk_size,
+                                      on_reject=write_reject if rejects else None)
+    finally:
+        if rejects:
+            rejects.close()
+        await dispose_async_engine()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import books into the catalog.")
+    parser.add_argument("path", help="CSV, NDJSON or MARC file")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="input format (default: from the file extension)")
+    parser.add_argument("--on-conflict", choices=ON_CONFLICT, default="update",
+                        help="what to do with books whose ISBN already exists")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--rejects", help="write every rejected record to this NDJSON file")
+    args = parser.parse_args(argv)
+    if args.format is None:
+        extension = args.path[args.path.rfind("."):].lower()
+        if extension not in EXTENSIONS:
+            parser.error("cannot infer the format from the extension; pass --format")
+        args.format = EXTENSIONS[extension]
+    report = asyncio.run(_run_cli(args))
+    print(report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,14 @@
 from celery import Celery
 from app.core.config import settings
-import aiosmtplib
-from email.message import EmailMessage
+from app.services.smtp_pool import build_message, get_smtp_pool, run_sync
 
 app = Celery("tasks", broker=settings.REDIS_URL)
 
 
 async def send_email(to_email: str, subject: str, body: str):
-    """Send an email asynchronously."""
-    message = EmailMessage()
-    message.set_content(body)
-    message["Subject"] = subject
-    message["From"] = settings.SMTP_USER
-    message["To"] = to_email
-
-    await aiosmtplib.send(
-        message,
-        hostname=settings.SMTP_HOST,
-        port=settings.SMTP_PORT,
-        username=settings.SMTP_USER,
-        password=settings.SMTP_PASSWORD,
-        use_tls=True,
-    )
+    """Send an email asynchronously over the pooled SMTP connections."""
+    message = build_message(to_email, subject, body, settings.SMTP_USER)
+    return await get_smtp_pool().send(message)
 
 
 @app.task
@@ -31,8 +18,7 @@ def send_borrow_email(member_id: int, book_id: int):
     subject = "Book Borrowed"
     body = f"You have borrowed book ID {book_id}."
     to_email = "user@example.com"  # Placeholder; fetch from DB
-    import asyncio
-    asyncio.run(send_email(to_email, subject, body))
+    run_sync(send_email(to_email, subject, body))
 
 
 @app.task
@@ -41,5 +27,4 @@ def send_return_email(member_id: int, book_id: int):
     subject = "Book Returned"
     body = f"You have returned book ID {book_id}."
     to_email = "user@example.com"  # Placeholder; fetch from DB
-    import asyncio
-    asyncio.run(send_email(to_email, subject, body))
+    run_sync(send_email(to_email, subject, body))
@@ -0,0 +1,246 @@
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import case, exists, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.book import Book
+from app.models.book_copy import COPY_AVAILABLE, BookCopy
+from app.models.borrow import Borrow
+from app.models.hold import HOLD_CANCELLED, HOLD_FULFILLED, HOLD_WAITING, Hold
+from app.models.member import Member
+from app.schemas.borrow import HoldResponse
+from app.services.inventory import claim_copies, copies_enabled, refresh_available_copies, release_copies
+from app.services.outbox import outbox_row
+
+
+def waitlisted(book_id):
+    """Whether the book has members waiting for it; book_id may be a column."""
+    return exists().where(Hold.book_id == book_id, Hold.status == HOLD_WAITING)
+
+
+async def lock_books(db: AsyncSession, book_ids):
+    """Lock book rows, in id order, for the rest of the transaction.
+
+    Returns take it before serving the waitlist and place_hold before
+    joining it, so a hold can never slip in between a return looking at the
+    queue and its copy reaching the shelf. SQLite needs no lock: its single
+    writer already keeps those transactions apart.
+    """
+    book_ids = sorted(set(book_ids))
+    if not book_ids or db.get_bind().dialect.name == "sqlite":
+        return
+    await db.execute(select(Book.id).where(Book.id.in_(book_ids)).order_by(Book.id).with_for_update())
+
+
+async def hold_position(hold: Hold, db: AsyncSession) -> Optional[int]:
+    """Place of a waiting hold in its book's queue, 1 being next in line.
+
+    Counts the waiting entries ahead of it in ix_holds_queue, without
+    reading hold rows.
+    """
+    if hold.status != HOLD_WAITING:
+        return None
+    ahead = await db.scalar(
+        select(func.count()).select_from(Hold)
+        .where(Hold.book_id == hold.book_id, Hold.status == HOLD_WAITING, Hold.id < hold.id)
+    )
+    return ahead + 1
+
+
+async def _response(hold: Hold, db: AsyncSession) -> HoldResponse:
+    response = HoldResponse.model_validate(hold)
+    response.position = await hold_position(hold, db)
+    return response
+
+
+async def place_hold(book_id: int, member_id: int, db: AsyncSession) -> HoldResponse:
+    """Join the waitlist of a book that has no copies available.
+
+    Books with a copy on the shelf are refused with 409, so the queue only
+    ever holds members who could not borrow; a member waits at most once
+    per book (ix_holds_member_waiting). The shelf check is part of the
+    INSERT itself and runs under the book's lock_books(), so a return
+    cannot shelve its copy past a new hold. With INVENTORY_MODEL=copies it
+    looks for a free copy rather than at available_copies, which may still
+    be waiting for a delta.
+    """
+    now = datetime.now()
+    if copies_enabled():
+        shelf_empty = ~exists().where(BookCopy.book_id == Book.id, BookCopy.status == COPY_AVAILABLE)
+    else:
+        shelf_empty = Book.available_copies == 0
+    await lock_books(db, [book_id])
+    try:
+        inserted = await db.execute(
+            insert(Hold)
+            .from_select(["book_id", "member_id", "status", "created_at", "updated_at"],
+                         select(Book.id, Member.id, literal(HOLD_WAITING), literal(now), literal(now))
+                         .join(Member, Member.id == member_id)
+                         .where(Book.id == book_id, shelf_empty))
+            .returning(Hold)
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Already waiting for this book")
+    hold = inserted.scalar_one_or_none()
+    if hold is None:
+        await db.rollback()
+        if await db.scalar(select(Book.id).where(Book.id == book_id)) is None or await db.scalar(select(Member.id).where(Member.id == member_id)) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book or member not found")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Copies available, borrow the book instead")
+    await db.commit()
+    return await _response(hold, db)
+
+
+def _owned(hold_id: int, member_id: Optional[int]):
+    """Match a hold, restricted to one member's unless member_id is None."""
+    clauses = [Hold.id == hold_id]
+    if member_id is not None:
+        clauses.append(Hold.member_id == member_id)
+    return clauses
+
+
+async def get_hold(hold_id: int, db: AsyncSession, member_id: Optional[int] = None) -> HoldResponse:
+    """Get a hold; with member_id, only that member's hold is found."""
+    hold = await db.scalar(select(Hold).where(*_owned(hold_id, member_id)))
+    if hold is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hold not found")
+    return await _response(hold, db)
+
+
+async def cancel_hold(hold_id: int, db: AsyncSession, member_id: Optional[int] = None) -> HoldResponse:
+    """Leave the waitlist; everyone behind moves up one place.
+
+    With member_id, another member's hold is reported as not found.
+    """
+    cancelled = await db.execute(
+        update(Hold)
+        .where(*_owned(hold_id, member_id), Hold.status == HOLD_WAITING)
+        .values(status=HOLD_CANCELLED, updated_at=datetime.now())
+        .returning(Hold)
+        .execution_options(populate_existing=True)
+    )
+    hold = cancelled.scalar_one_or_none()
+    if hold is None:
+        await db.rollback()
+        if await db.scalar(select(Hold.id).where(*_owned(hold_id, member_id))) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hold not found")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Hold is no longer waiting")
+    await db.commit()
+    return HoldResponse.model_validate(hold)
+
+
+def _next_in_line(book_id: int):
+    """Id of the oldest waiting hold, skipping ones another return is serving."""
+    return (
+        select(Hold.id)
+        .where(Hold.book_id == book_id, Hold.status == HOLD_WAITING)
+        .order_by(Hold.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+
+
+async def assign_holds(db: AsyncSession, returned: Counter, now: datetime,
+                       copies: Optional[dict[int, list[int]]] = None) -> tuple[list[Borrow], Counter]:
+    """Check returned copies out to the oldest waiting holds of their books.
+
+    Runs in the caller's transaction. returned maps book ids to copies
+    coming back; each copy claims the next waiting hold with one
+    conditional UPDATE and the holders' borrows go in with one INSERT.
+    copies optionally lists the returned book_copies ids per book, which
+    the holders' borrows take over in order. Returns those borrows and
+    the copies left over for the shelf; the caller writes
+    hold_notifications() along with its own outbox rows.
+    """
+    book_ids = list(returned)
+    if len(book_ids) > 1:
+        book_ids = list((await db.scalars(
+            select(Hold.book_id).where(Hold.book_id.in_(book_ids), Hold.status == HOLD_WAITING).distinct()
+        )).all())
+    shelved = Counter(returned)
+    claimed = []
+    for book_id in book_ids:
+        while shelved[book_id]:
+            hold = (await db.execute(
+                update(Hold)
+                .where(Hold.id == _next_in_line(book_id), Hold.status == HOLD_WAITING)
+                .values(status=HOLD_FULFILLED, updated_at=now)
+                .returning(Hold.id, Hold.member_id)
+                .execution_options(synchronize_session=False)
+            )).first()
+            if hold is None:
+                break
+            shelved[book_id] -= 1
+            claimed.append((hold.id, hold.member_id, book_id))
+    if not claimed:
+        return [], shelved
+    handed_over = {book_id: iter(copy_ids) for book_id, copy_ids in (copies or {}).items()}
+    borrows = list((await db.scalars(
+        insert(Borrow).returning(Borrow, sort_by_parameter_order=True),
+        [{"book_id": book_id, "member_id": member_id, "notification_sent": False,
+          "copy_id": next(handed_over.get(book_id, iter(())), None),
+          "created_at": now, "updated_at": now} for _, member_id, book_id in claimed]
+    )).all())
+    await db.execute(
+        update(Hold)
+        .where(Hold.id.in_([hold_id for hold_id, _, _ in claimed]))
+        .values(borrow_id=case({hold_id: borrow.id for (hold_id, _, _), borrow in zip(claimed, borrows)},
+                               value=Hold.id))
+        .execution_options(synchronize_session=False)
+    )
+    return borrows, +shelved
+
+
+def hold_notifications(borrows: list[Borrow]) -> list[dict]:
+    """Outbox rows telling holders their book has been checked out to them."""
+    return [outbox_row("send_hold_email", borrow.id, member_id=borrow.member_id) for borrow in borrows]
+
+
+async def serve_waitlists(db: AsyncSession, book_ids, now: datetime) -> list[Borrow]:
+    """Check copies on the shelf out to the waiting holds of these books.
+
+    Returns serve the waitlist first and borrows are refused while it is
+    not empty, so copies only sit on the shelf past waiting holds when a
+    book gains copies (the catalog import). Runs in the caller's
+    transaction; the caller enqueues hold_notifications() of the borrows.
+    """
+    waiting = dict((await db.execute(
+        select(Hold.book_id, func.count(Hold.id))
+        .where(Hold.book_id.in_(set(book_ids)), Hold.status == HOLD_WAITING)
+        .group_by(Hold.book_id)
+    )).all())
+    if not waiting:
+        return []
+    await lock_books(db, waiting)
+    if copies_enabled():
+        copies = {book_id: await claim_copies(db, book_id, count, now) for book_id, count in waiting.items()}
+        taken = Counter({book_id: len(copy_ids) for book_id, copy_ids in copies.items()})
+    else:
+        copies = None
+        available = dict((await db.execute(
+            select(Book.id, Book.available_copies).where(Book.id.in_(waiting), Book.available_copies > 0)
+        )).all())
+        taken = Counter({book_id: min(count, available.get(book_id, 0)) for book_id, count in waiting.items()})
+    taken = +taken
+    if not taken:
+        return []
+    borrows, left = await assign_holds(db, taken, now, copies=copies)
+    if copies is not None:
+        handed_over = {borrow.copy_id for borrow in borrows}
+        await release_copies(db, [copy_id for copy_ids in copies.values() for copy_id in copy_ids
+                                  if copy_id not in handed_over], now)
+        await refresh_available_copies(db, taken, now)
+    elif taken - left:
+        lent = taken - left
+        await db.execute(
+            update(Book)
+            .where(Book.id.in_(lent))
+            .values(available_copies=Book.available_copies - case(dict(lent), value=Book.id, else_=0),
+                    updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    return borrows
@@ -0,0 +1,246 @@
+"""Per-copy inventory: borrows check out individual book_copies rows.
+
+With INVENTORY_MODEL=counter (the default) availability is the
+books.available_copies counter, which every borrow and return of a title
+updates in place, so they all queue on that one row. With copies, a
+borrow claims one available copy of the title instead (FOR UPDATE SKIP
+LOCKED on Postgres, so concurrent borrows take different copies without
+waiting for each other; SQLite runs the claim as a single guarded UPDATE
+under its one writer) and records it in Borrow.copy_id.
+
+available_copies is then an aggregate of the available copies: borrows
+and returns add their change to it, on Postgres in a short transaction
+of their own once the circulation one has committed (see
+deltas_after_commit), so they never queue on the book row while they hold
+their copy. sync_copies() recounts it from scratch; the catalog import
+runs the same sync for the books each chunk writes.
+
+Switching an existing database over (idempotent, chunked):
+
+    python -m app.services.inventory sync
+"""
+import argparse
+import asyncio
+import json
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.book import Book
+from app.models.book_copy import COPY_AVAILABLE, COPY_ON_LOAN, COPY_RETIRED, BookCopy
+from app.models.borrow import Borrow
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_MODELS = ("counter", "copies")
+
+
+def deltas_after_commit(db: AsyncSession) -> bool:
+    """Whether available_copies deltas are applied after the circulation commit.
+
+    True on Postgres, where the book row lock then only lasts for the
+    UPDATE itself. A crash between the two commits leaves the aggregate
+    off until the next sync_copies(). SQLite serializes writers anyway and
+    applies them in the same transaction.
+    """
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def copies_enabled() -> bool:
+    """True when borrows claim individual copies (INVENTORY_MODEL=copies)."""
+    model = settings.INVENTORY_MODEL
+    if model not in INVENTORY_MODELS:
+        raise ValueError(f"Unknown INVENTORY_MODEL {model!r}, expected one of {', '.join(INVENTORY_MODELS)}")
+    return model == "copies"
+
+
+async def claim_copies(db: AsyncSession, book_id: int, count: int, now: datetime, guard=None) -> list[int]:
+    """Put up to count available copies of a book on loan and return their ids.
+
+    The copies are picked from ix_book_copies_free, skipping the ones other
+    transactions are claiming; the status check in the UPDATE keeps a copy
+    from being lent twice whatever the isolation level. guard is an extra
+    condition the UPDATE must meet, such as the book having no waitlist.
+    """
+    free = (
+        select(BookCopy.id)
+        .where(BookCopy.book_id == book_id, BookCopy.status == COPY_AVAILABLE)
+        .order_by(BookCopy.id)
+        .limit(count)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = await db.scalars(
+        update(BookCopy)
+        .where(BookCopy.id.in_(free), BookCopy.status == COPY_AVAILABLE, *(() if guard is None else (guard,)))
+        .values(status=COPY_ON_LOAN, updated_at=now)
+        .returning(BookCopy.id)
+        .execution_options(synchronize_session=False)
+    )
+    return sorted(claimed.all())
+
+
+async def release_copies(db: AsyncSession, copy_ids: Iterable[int], now: datetime):
+    """Put copies back on the shelf."""
+    copy_ids = list(copy_ids)
+    if not copy_ids:
+        return
+    await db.execute(
+        update(BookCopy)
+        .where(BookCopy.id.in_(copy_ids))
+        .values(status=COPY_AVAILABLE, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _available_count():
+    return (
+        select(func.count(BookCopy.id))
+        .where(BookCopy.book_id == Book.id, BookCopy.status == COPY_AVAILABLE)
+        .scalar_subquery()
+    )
+
+
+async def refresh_available_copies(db: AsyncSession, book_ids: Iterable[int], now: datetime):
+    """Recount available_copies of these books from their available copies."""
+    available = _available_count()
+    await db.execute(
+        update(Book)
+        .where(Book.id.in_(list(book_ids)), Book.available_copies != available)
+        .values(available_copies=available, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+
+SYNC_REPORT = ("copies_created", "copies_retired", "borrows_attached", "borrows_without_copy")
+
+
+async def _sync_chunk(db: AsyncSession, books: list, now: datetime) -> dict:
+    book_ids = [book.id for book in books]
+    existing = dict((await db.execute(
+        select(BookCopy.book_id, func.count(BookCopy.id))
+        .where(BookCopy.book_id.in_(book_ids), BookCopy.status != COPY_RETIRED)
+        .group_by(BookCopy.book_id)
+    )).all())
+    missing = [{"book_id": book.id, "status": COPY_AVAILABLE, "created_at": now, "updated_at": now}
+               for book in books for _ in range(book.total_copies - existing.get(book.id, 0))]
+    if missing:
+        await db.execute(insert(BookCopy), missing)
+
+    # Copies on loan are only retired by a later sync, once they are back
+    excess = {book.id: existing[book.id] - book.total_copies
+              for book in books if existing.get(book.id, 0) > book.total_copies}
+    retired = []
+    if excess:
+        for copy_id, book_id in (await db.execute(
+            select(BookCopy.id, BookCopy.book_id)
+            .where(BookCopy.book_id.in_(excess), BookCopy.status == COPY_AVAILABLE)
+            .order_by(BookCopy.id.desc())
+        )).all():
+            if excess[book_id]:
+                excess[book_id] -= 1
+                retired.append(copy_id)
+    if retired:
+        await db.execute(
+            update(BookCopy)
+            .where(BookCopy.id.in_(retired))
+            .values(status=COPY_RETIRED, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+    open_borrows = (await db.execute(
+        select(Borrow.id, Borrow.book_id)
+        .where(Borrow.book_id.in_(book_ids), Borrow.return_date.is_(None), Borrow.copy_id.is_(None))
+        .order_by(Borrow.id)
+    )).all()
+    attached = {}
+    if open_borrows:
+        free = {}
+        for copy_id, book_id in (await db.execute(
+            select(BookCopy.id, BookCopy.book_id)
+            .where(BookCopy.book_id.in_({borrow.book_id for borrow in open_borrows}),
+                   BookCopy.status == COPY_AVAILABLE)
+            .order_by(BookCopy.id)
+        )).all():
+            free.setdefault(book_id, []).append(copy_id)
+        for borrow in open_borrows:
+            if free.get(borrow.book_id):
+                attached[borrow.id] = free[borrow.book_id].pop(0)
+    if attached:
+        await db.execute(
+            update(BookCopy)
+            .where(BookCopy.id.in_(attached.values()))
+            .values(status=COPY_ON_LOAN, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            update(Borrow)
+            .where(Borrow.id.in_(attached))
+            .values(copy_id=case(attached, value=Borrow.id))
+            .execution_options(synchronize_session=False)
+        )
+    await refresh_available_copies(db, book_ids, now)
+    return {"copies_created": len(missing), "copies_retired": len(retired), "borrows_attached": len(attached),
+            "borrows_without_copy": len(open_borrows) - len(attached)}
+
+
+async def sync_book_copies(db: AsyncSession, book_ids: list[int], now: datetime) -> dict:
+    """Sync the copies of these books in the caller's transaction, without committing."""
+    books = (await db.execute(select(Book.id, Book.total_copies).where(Book.id.in_(book_ids)))).all()
+    return await _sync_chunk(db, books, now) if books else dict.fromkeys(SYNC_REPORT, 0)
+
+
+async def sync_copies(db: AsyncSession, book_ids: Optional[list[int]] = None, chunk_size: int = 1000) -> dict:
+    """Give books the copies their total_copies says they have.
+
+    Creates the missing book_copies rows, retires available ones beyond
+    total_copies, puts one on loan for each open borrow that has none yet
+    and refreshes available_copies, one chunk of books per transaction. Safe to run again. Run it before switching to
+    INVENTORY_MODEL=copies, while nothing is being borrowed or returned:
+    its recount does not mix with the deltas of concurrent circulation.
+    """
+    report = Counter()
+    last_id = 0
+    while True:
+        query = select(Book.id, Book.total_copies).where(Book.id > last_id).order_by(Book.id).limit(chunk_size)
+        if book_ids is not None:
+            query = query.where(Book.id.in_(book_ids))
+        books = (await db.execute(query)).all()
+        if not books:
+            break
+        report.update(await _sync_chunk(db, books, datetime.now()))
+        await db.commit()
+        last_id = books[-1].id
+    if report["borrows_without_copy"]:
+        logger.warning(f"Inventory sync: {report['borrows_without_copy']} open borrows have no copy left "
+                       f"to attach; their books have more loans than total_copies")
+    return {key: report[key] for key in SYNC_REPORT}
+
+
+async def _run_cli(args) -> dict:
+    from app.models.base import dispose_async_engine, get_async_session_factory
+    import app.models.member  # noqa: F401
+
+    try:
+        async with get_async_session_factory()() as db:
+            return await sync_copies(db, args.book_id, chunk_size=args.chunk_size)
+    finally:
+        await dispose_async_engine()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the per-copy inventory.")
+    parser.add_argument("command", choices=("sync",),
+                        help="sync: create or retire copies to match total_copies and attach open borrows")
+    parser.add_argument("--book-id", type=int, action="append", help="only these books (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(_run_cli(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
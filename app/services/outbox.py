@@ -0,0 +1,144 @@
+"""Transactional outbox for the notification tasks.
+
+Services call enqueue() before committing, so a task row exists exactly
+when the borrow change it announces does, and no broker is touched on the
+request path. dispatch_outbox() is the dispatcher's side: it claims a
+batch of due rows (FOR UPDATE SKIP LOCKED on Postgres, so several
+dispatchers never take the same row), publishes them and deletes the
+published ones in the same transaction. A row is published again only if
+that commit fails after the publish succeeded, so delivery is
+at-least-once; every publish of a row uses the task id outbox-<id>, which
+the tasks use to skip repeats when OUTBOX_DEDUP_REDIS_URL is set. A task
+that fails in direct mode keeps its row for the next round.
+
+A member's notifications are coalesced: their rows carry member_id and
+become due NOTIFICATION_DIGEST_WINDOW seconds after they were written.
+Once one of them is due, the dispatcher takes all of that member's
+pending rows and publishes a single send_notification_digest task, so a
+burst of borrows, returns and overdue reminders becomes one email that
+waited at most the window plus a poll interval. A window of 0 turns
+coalescing off.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.outbox import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+# Tasks of app.tasks.email_tasks that may go through the outbox, and the
+# digest section their borrows are listed under
+DIGEST_SECTIONS = {
+    "send_borrow_email": "borrowed",
+    "send_borrow_emails": "borrowed",
+    "send_return_email": "returned",
+    "send_return_emails": "returned",
+    "send_overdue_emails": "overdue",
+    "send_hold_email": "held",
+}
+OUTBOX_TASKS = tuple(DIGEST_SECTIONS)
+DIGEST_TASK = "send_notification_digest"
+
+
+def outbox_row(task: str, *args, member_id: Optional[int] = None) -> dict:
+    """Values of one outbox row; a member's notifications wait for the digest window."""
+    if task not in OUTBOX_TASKS:
+        raise ValueError(f"Unknown outbox task {task!r}")
+    window = settings.NOTIFICATION_DIGEST_WINDOW
+    if not window:
+        member_id = None
+    delay = window if member_id is not None else 0
+    return {"task": task, "payload": list(args), "member_id": member_id,
+            "available_at": datetime.now() + timedelta(seconds=delay)}
+
+
+async def enqueue(db: AsyncSession, *rows: dict):
+    """Add outbox rows (see outbox_row) in the caller's transaction, with one INSERT."""
+    await db.execute(insert(OutboxMessage), list(rows))
+
+
+def borrow_ids(row: OutboxMessage) -> list[int]:
+    """Borrows a notification row is about; batch tasks take them as one list."""
+    first = row.payload[0]
+    return list(first) if isinstance(first, list) else [first]
+
+
+def claim_batch(session: Session, batch_size: int) -> list[OutboxMessage]:
+    """Due rows in id order, plus the other pending rows of their members.
+
+    Everything returned is locked against other dispatchers until commit.
+    """
+    rows = list(session.scalars(
+        select(OutboxMessage)
+        .where(OutboxMessage.available_at <= datetime.now())
+        .order_by(OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all())
+    members = {row.member_id for row in rows if row.member_id is not None}
+    if members:
+        claimed = {row.id for row in rows}
+        rows += [row for row in session.scalars(
+            select(OutboxMessage)
+            .where(OutboxMessage.member_id.in_(members))
+            .order_by(OutboxMessage.id)
+            .with_for_update(skip_locked=True)
+        ) if row.id not in claimed]
+    return rows
+
+
+def coalesce(rows: list[OutboxMessage]) -> list[tuple[str, list, list[OutboxMessage]]]:
+    """(task, args, rows) to publish: one digest per member, other rows as they are."""
+    messages, digests = [], {}
+    for row in sorted(rows, key=lambda row: row.id):
+        if row.member_id is None:
+            messages.append((row.task, row.payload, [row]))
+        else:
+            digests.setdefault(row.member_id, []).append(row)
+    for member_id, member_rows in digests.items():
+        sections = {}
+        for row in member_rows:
+            sections.setdefault(DIGEST_SECTIONS[row.task], []).extend(borrow_ids(row))
+        messages.append((DIGEST_TASK, [member_id, sections], member_rows))
+    return sorted(messages, key=lambda message: message[2][0].id)
+
+
+def dispatch_outbox(session: Session, publish: Callable[[str, list, str], None],
+                    batch_size: int = 100, retry_seconds: int = 30) -> dict:
+    """Publish one batch of due outbox rows and delete the published ones.
+
+    publish(task, args, task_id) sends one task. The batch stops at the
+    first failure, which usually means the broker is down: that message's
+    rows are pushed back by retry_seconds times their attempts and the
+    rest stay due for the next round.
+    """
+    rows = claim_batch(session, batch_size)
+    published = []
+    tasks = failed = 0
+    try:
+        for task, args, message_rows in coalesce(rows):
+            try:
+                publish(task, args, f"outbox-{message_rows[0].id}")
+            except Exception as e:
+                failed = 1
+                for row in message_rows:
+                    row.attempts += 1
+                    row.available_at = datetime.now() + timedelta(seconds=retry_seconds * row.attempts)
+                    row.last_error = str(e)[:500]
+                logger.error(f"Outbox message {message_rows[0].id} ({task}) failed, "
+                             f"attempt {message_rows[0].attempts}: {e}")
+                break
+            published.extend(row.id for row in message_rows)
+            tasks += 1
+        if published:
+            session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(published))
+                            .execution_options(synchronize_session=False))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return {"claimed": len(rows), "published": len(published), "tasks": tasks, "failed": failed}
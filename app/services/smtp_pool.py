@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from email.message import EmailMessage
+from typing import Optional
+
+import aiosmtplib
+
+from app.core.config import get_settings
+from app.core.metrics import SMTP_SEND_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Errors after which a connection cannot be trusted any more; the message
+# is retried once on a fresh connection.
+CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+    OSError,
+)
+
+
+def build_message(to_email: str, subject: str, body: str, sender: str) -> EmailMessage:
+    message = EmailMessage()
+    message.set_content(body)
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = to_email
+    return message
+
+
+class SMTPPool:
+    """Pool of authenticated SMTP connections reused across messages.
+
+    At most max_connections sessions are open at once. A connection is
+    recycled with QUIT after max_messages_per_connection messages, and a
+    message that fails because its connection dropped is retried once on a
+    new connection. The pool belongs to the event loop it is first used on.
+    """
+
+    def __init__(self, hostname: str, port: int, username: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = True,
+                 max_connections: int = 4, max_messages_per_connection: int = 100,
+                 timeout: float = 30):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_connections = max_connections
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+        self._idle: list[tuple[aiosmtplib.SMTP, int]] = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self.stats = {"connects": 0, "reconnects": 0, "sent": 0, "failed": 0}
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(hostname=self.hostname, port=self.port,
+                                 username=self.username, password=self.password,
+                                 use_tls=self.use_tls, timeout=self.timeout)
+        await client.connect()
+        self.stats["connects"] += 1
+        return client
+
+    async def _acquire(self) -> tuple[aiosmtplib.SMTP, int]:
+        while self._idle:
+            client, used = self._idle.pop()
+            if client.is_connected:
+                return client, used
+        return await self._connect(), 0
+
+    async def _release(self, client: aiosmtplib.SMTP, used: int):
+        if client.is_connected and used < self.max_messages_per_connection:
+            self._idle.append((client, used))
+        else:
+            await self._discard(client, graceful=True)
+
+    async def _discard(self, client: aiosmtplib.SMTP, graceful: bool = False):
+        try:
+            if graceful and client.is_connected:
+                await client.quit()
+            else:
+                client.close()
+        except Exception as e:
+            logger.debug(f"Ignoring SMTP close error: {e}")
+            client.close()
+
+    async def send(self, message: EmailMessage) -> dict:
+        """Send one message on a pooled connection."""
+        async with self._slots:
+            return await self._send_in_slot(message)
+
+    async def _send_in_slot(self, message: EmailMessage) -> dict:
+        started = time.perf_counter()
+        result = await self._deliver(message)
+        SMTP_SEND_DURATION.labels("failed" if "error" in result else "sent").observe(
+            time.perf_counter() - started)
+        return result
+
+    async def _deliver(self, message: EmailMessage) -> dict:
+        for attempt in (1, 2):
+            client = None
+            try:
+                client, used = await self._acquire()
+                await client.send_message(message)
+            except CONNECTION_ERRORS as e:
+                if client is not None:
+                    await self._discard(client)
+                if attempt == 1:
+                    self.stats["reconnects"] += 1
+                    logger.warning(f"SMTP connection lost, reconnecting: {e}")
+                    continue
+                self.stats["failed"] += 1
+                logger.error(f"Email sending error: {e}")
+                return {"error": str(e)}
+            except aiosmtplib.SMTPException as e:
+                # Rejected by the server (e.g. bad recipient or login); an
+                # established session is still usable
+                if client is not None:
+                    await self._release(client, used + 1)
+                self.stats["failed"] += 1
+                logger.error(f"Email sending error: {e}")
+                return {"error": str(e)}
+            await self._release(client, used + 1)
+            self.stats["sent"] += 1
+            return {"status": "Email sent"}
+
+    async def send_many(self, messages: list[EmailMessage]) -> list[dict]:
+        """Send messages over up to max_connections sessions; results keep order."""
+        results: list[dict] = [None] * len(messages)
+        pending = iter(range(len(messages)))
+
+        async def drain():
+            async with self._slots:
+                for index in pending:
+                    results[index] = await self._send_in_slot(messages[index])
+
+        workers = min(self.max_connections, len(messages))
+        await asyncio.gather(*(drain() for _ in range(workers)))
+        return results
+
+    async def close(self):
+        """QUIT every idle connection."""
+        idle, self._idle = self._idle, []
+        for client, _ in idle:
+            await self._discard(client, graceful=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def pool_from_settings() -> SMTPPool:
+    settings = get_settings()
+    return SMTPPool(
+        hostname=settings.SMTP_HOST,
+        port=settings.SMTP_PORT,
+        username=settings.SMTP_USER,
+        password=settings.SMTP_PASSWORD,
+        use_tls=settings.SMTP_USE_TLS,
+        max_connections=settings.SMTP_POOL_SIZE,
+        max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+        timeout=settings.SMTP_TIMEOUT,
+    )
+
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SMTPPool]" = weakref.WeakKeyDictionary()
+_runner_loop: Optional[asyncio.AbstractEventLoop] = None
+_runner_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPPool:
+    """Return the pool bound to the running event loop, creating it once."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = pool_from_settings()
+    return pool
+
+
+def _runner() -> asyncio.AbstractEventLoop:
+    global _runner_loop
+    with _runner_lock:
+        if _runner_loop is None or _runner_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="smtp-pool", daemon=True).start()
+            _runner_loop = loop
+        return _runner_loop
+
+
+def run_sync(coro):
+    """Run a coroutine on the process-wide SMTP loop from synchronous code.
+
+    Celery tasks use this instead of asyncio.run(), whose fresh loop per
+    call would throw the pooled connections away after every task.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _runner()).result()
+
+
+def close_smtp_pool():
+    """Close the sync runner's pool and stop its loop."""
+    global _runner_loop
+    with _runner_lock:
+        loop, _runner_loop = _runner_loop, None
+    if loop is None or loop.is_closed():
+        return
+    pool = _pools.pop(loop, None)
+    if pool is not None:
+        asyncio.run_coroutine_threadsafe(pool.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
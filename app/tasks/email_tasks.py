@@ -1,15 +1,23 @@
 import logging
+import os
+import time
 from celery import Celery
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from celery.signals import task_failure, task_postrun, task_prerun, task_retry, \
+    worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.exc import OperationalError
 from app.core.config import get_settings
+from app.core.metrics import CELERY_TASK_DURATION, CELERY_TASK_FAILURES, CELERY_TASK_QUERIES, \
+    CELERY_TASK_RETRIES, mark_worker_process_dead, start_worker_metrics_server
+from app.core.queries import current_queries, track_queries
+from app.models.base import dispose_engine, get_session_factory, init_engine
 from app.models.borrow import Borrow
 from app.models.member import Member
 from app.models.book import Book
+from app.models.outbox import OutboxMessage
+from app.services.outbox import outbox_row
+from app.services.smtp_pool import build_message, close_smtp_pool, get_smtp_pool, run_sync
 from datetime import datetime, timedelta
-import aiosmtplib
-from email.message import EmailMessage
-import urllib.parse
 
 logger = logging.getLogger(__name__)
 
@@ -23,157 +31,450 @@ def get_celery_app():
 
 app = get_celery_app()
 
+# Pools whose tasks run as threads/greenlets inside one process; prefork
+# children each run one task at a time.
+SHARED_PROCESS_POOLS = ("thread", "threads", "gevent", "eventlet", "solo")
 
-async def send_email(to_email: str, subject: str, body: str):
+
+def _pool_name(worker) -> str:
+    """Pool alias ("prefork", "threads", ...) or module name of its class."""
+    pool_cls = getattr(worker, "pool_cls", None)
+    if isinstance(pool_cls, str):
+        return pool_cls.lower()
+    return getattr(pool_cls, "__module__", "prefork").rsplit(".", 1)[-1].lower()
+
+
+def init_worker_db(concurrency: int = 1):
+    """Build the worker's engine once, sized for the tasks it runs at a time."""
+    concurrency = max(int(concurrency or 1), 1)
+    engine = init_engine(pool_size=concurrency, max_overflow=1)
+    logger.info(f"Worker database pool ready: pool_size={concurrency}")
+    return engine
+
+
+@worker_init.connect
+def _init_worker(sender=None, **kwargs):
+    if _pool_name(sender) in SHARED_PROCESS_POOLS:
+        init_worker_db(getattr(sender, "concurrency", 1))
+
+
+@worker_init.connect
+def _start_worker_metrics(**kwargs):
     settings = get_settings()
-    message = EmailMessage()
-    message.set_content(body)
-    message["Subject"] = subject
-    message["From"] = settings.SMTP_USER
-    message["To"] = to_email
+    start_worker_metrics_server(settings.WORKER_METRICS_PORT, settings.REDIS_URL,
+                                [app.conf.task_default_queue])
+
+
+@worker_process_init.connect
+def _init_worker_process(**kwargs):
+    # Connections inherited through fork belong to the parent; drop them
+    # without closing the sockets, then build this child's own pool.
+    dispose_engine(close=False)
+    init_worker_db(1)
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _shutdown_worker_db(**kwargs):
+    dispose_engine()
+    close_smtp_pool()
+    logger.info("Worker database and SMTP pools disposed")
+
+
+@worker_process_shutdown.connect
+def _forget_worker_process_metrics(pid=None, **kwargs):
+    mark_worker_process_dead(pid or os.getpid())
+
+
+# task_id -> (start time, query tracking context) of the tasks running here
+_running_tasks: dict = {}
+
+
+@task_prerun.connect
+def _start_task_timer(task_id=None, task=None, **kwargs):
+    # Each task is one unit of work for the statement counter and the
+    # repeated-query detector; prerun and postrun run on the task's thread
+    tracking = track_queries(getattr(task, "name", "task"))
+    tracking.__enter__()
+    _running_tasks[task_id] = (time.perf_counter(), tracking)
+
+
+@task_postrun.connect
+def _observe_task(task_id=None, task=None, state=None, **kwargs):
+    running = _running_tasks.pop(task_id, None)
+    if running is None:
+        return
+    started, tracking = running
+    queries = current_queries()
+    tracking.__exit__(None, None, None)
+    if task is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+        if queries is not None:
+            CELERY_TASK_QUERIES.labels(task.name).observe(queries.count)
+            logger.debug(f"Task {task.name}: {queries.summary()}")
+
+
+@task_retry.connect
+def _count_task_retry(sender=None, **kwargs):
+    CELERY_TASK_RETRIES.labels(sender.name).inc()
+
+
+@task_failure.connect
+def _count_task_failure(sender=None, **kwargs):
+    CELERY_TASK_FAILURES.labels(sender.name).inc()
+
+
+async def send_email(to_email: str, subject: str, body: str):
+    """Send one message over the pooled SMTP connections of this event loop."""
+    message = build_message(to_email, subject, body, get_settings().SMTP_USER)
     try:
-        await aiosmtplib.send(
-            message,
-            hostname=settings.SMTP_HOST,
-            port=settings.SMTP_PORT,
-            username=settings.SMTP_USER,
-            password=settings.SMTP_PASSWORD,
-            use_tls=True,
-        )
-        logger.info(f"Email sent to {to_email}")
-        return {"status": "Email sent"}
+        result = await get_smtp_pool().send(message)
     except Exception as e:
         logger.error(f"Email sending error: {e}")
         return {"error": str(e)}
+    if "error" not in result:
+        logger.info(f"Email sent to {to_email}")
+    return result
 
 
-@app.task(name="app.tasks.email_tasks.send_borrow_email",
-          bind=True, max_retries=3)
-def send_borrow_email(self, borrow_id: int):
-    settings = get_settings()
+class EmailDeliveryError(Exception):
+    """An SMTP send failed; raised so the task is retried instead of dropped."""
+
+
+_dedup_client = None
+
+
+def _dedup_redis():
+    """Redis client for delivery markers, or None when OUTBOX_DEDUP_REDIS_URL is unset."""
+    global _dedup_client
+    url = get_settings().OUTBOX_DEDUP_REDIS_URL
+    if not url:
+        return None
+    if _dedup_client is None:
+        import redis
+        _dedup_client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _dedup_client
+
+
+def _delivery_key(task) -> str:
+    return f"outbox:delivered:{task.request.id}"
+
+
+def _claim_delivery(task) -> bool:
+    """False when this outbox task id was already delivered by an earlier copy.
+
+    The dispatcher publishes a row again if it crashes before deleting it;
+    both copies carry the row's outbox-<id> task id. Without
+    OUTBOX_DEDUP_REDIS_URL, or when Redis fails, every copy is sent.
+    """
+    client = _dedup_redis()
+    task_id = task.request.id
+    if client is None or not task_id or not task_id.startswith("outbox-"):
+        return True
     try:
-        logger.info(f"""Attempting to connect to DATABASE_URL:
-                    {settings.DATABASE_URL}""")
-        parsed_url = urllib.parse.urlparse(settings.DATABASE_URL)
-        logger.info(f"""Parsed DATABASE_URL: scheme={parsed_url.scheme},
-                    host={parsed_url.hostname}, port={parsed_url.port},
-                    path={parsed_url.path}""")
-        if parsed_url.path != '/library_db':
-            raise ValueError(f"""Invalid database name in DATABASE_URL:
-                             {parsed_url.path}, expected '/library_db'""")
-        engine = create_engine(settings.DATABASE_URL, echo=True,
-                               connect_args={'dbname': 'library_db'})
-        conn = engine.connect()
-        logger.info(f"Successfully connected to database: {conn}")
-        conn.close()
-        SessionLocal = sessionmaker(autocommit=False,
-                                    autoflush=False, bind=engine)
-        session = SessionLocal()
+        claimed = client.set(_delivery_key(task), 1, nx=True, ex=get_settings().OUTBOX_DEDUP_TTL)
+    except Exception as e:
+        logger.warning(f"Delivery marker for {task_id} not set, sending anyway: {e}")
+        return True
+    if not claimed:
+        logger.info(f"Skipping {task.name} {task_id}: already delivered")
+    return bool(claimed)
+
+
+def _check_delivery(task, results: list[dict]):
+    """Retry the task when any email failed, releasing its delivery marker first."""
+    errors = [result["error"] for result in results if "error" in result]
+    if not errors:
+        return
+    client = _dedup_redis()
+    if client is not None and (task.request.id or "").startswith("outbox-"):
         try:
-            borrow = session.query(Borrow).get(borrow_id)
-            if not borrow:
-                logger.error(f"Borrow record {borrow_id} not found")
-                return {"error": f"Borrow record {borrow_id} not found"}
-            member = session.query(Member).get(borrow.member_id)
-            book = session.query(Book).get(borrow.book_id)
-            if not member or not book:
-                logger.error("Member or book not found")
-                return {"error": "Member or book not found"}
-            subject = f"Book Borrowed: {book.title}"
-            body = f"""Dear {member.name},\n\nYou have borrowed '{book.title}'
-            on {borrow.borrow_date}.Please return it by
-            {borrow.borrow_date + timedelta(days=14)}.\n\nThank you."""
-            send_email.delay(member.email, subject, body)
-            logger.info(f"""Borrow email task triggered
-                        for borrow_id: {borrow_id}""")
-            return {"status": "Borrow email sent"}
+            client.delete(_delivery_key(task))
         except Exception as e:
-            logger.error(f"send_borrow_email error: {e}")
-            return {"error": str(e)}
-        finally:
-            session.close()
-    except Exception as e:
-        logger.error(f"Database connection error in send_borrow_email: {e}")
-        self.retry(countdown=60, exc=e)
+            logger.warning(f"Delivery marker for {task.request.id} not released: {e}")
+    raise task.retry(countdown=60, exc=EmailDeliveryError(
+        f"{len(errors)} of {len(results)} emails failed: {errors[0]}"))
+
+
+def _load_borrow_details(session, borrow_ids: list[int]):
+    """Fetch borrows with their member and book in one joined query."""
+    return session.query(Borrow, Member, Book)\
+        .join(Member, Member.id == Borrow.member_id)\
+        .join(Book, Book.id == Borrow.book_id)\
+        .filter(Borrow.id.in_(borrow_ids))\
+        .all()
+
+
+def _borrow_details(task, borrow_ids: list[int]):
+    """Load borrow details from the worker's shared session factory.
+
+    Database errors retry the task; everything is loaded before the
+    session is closed, so the returned rows stay usable.
+    """
+    session = get_session_factory()()
+    try:
+        return _load_borrow_details(session, borrow_ids)
+    except OperationalError as e:
+        logger.error(f"Database error in {task.name}: {e}")
+        raise task.retry(countdown=60, exc=e)
+    finally:
+        session.close()
+
+
+async def _send_all(messages: list[tuple[str, str, str]]):
+    """Send (to_email, subject, body) messages, spread over the SMTP pool."""
+    sender = get_settings().SMTP_USER
+    return await get_smtp_pool().send_many(
+        [build_message(to_email, subject, body, sender) for to_email, subject, body in messages]
+    )
+
+
+def _borrow_message(borrow, member, book) -> tuple[str, str, str]:
+    subject = f"Book Borrowed: {book.title}"
+    body = f"""Dear {member.name},\n\nYou have borrowed '{book.title}'
+    on {borrow.borrow_date}. Please return it by
+    {borrow.borrow_date + timedelta(days=14)}.\n\nThank you."""
+    return member.email, subject, body
+
+
+def _return_message(borrow, member, book) -> tuple[str, str, str]:
+    subject = f"Book Returned: {book.title}"
+    body = f"Dear {member.name},\n\nYou have returned '{book.title}' on {borrow.return_date}. Thank you for using our library.\n\nBest regards."
+    return member.email, subject, body
+
+
+def _overdue_message(borrow, member, book) -> tuple[str, str, str]:
+    subject = f"Overdue Book Reminder: {book.title}"
+    body = (f"Dear {member.name},\n\nThe book '{book.title}' borrowed on {borrow.borrow_date} "
+            f"is overdue. Please return it.\n\nThank you.")
+    return member.email, subject, body
+
+
+def _hold_message(borrow, member, book) -> tuple[str, str, str]:
+    subject = f"Your hold is ready: {book.title}"
+    body = (f"Dear {member.name},\n\nA copy of '{book.title}' came back and has been checked out to you "
+            f"from your hold on {borrow.borrow_date}. Please return it by "
+            f"{borrow.borrow_date + timedelta(days=14)}.\n\nThank you.")
+    return member.email, subject, body
+
+
+# Digest sections in the order they are listed, with the single-event
+# message used when a digest holds only one notification
+DIGEST_LAYOUT = (
+    ("held", "Checked out to you from your holds", _hold_message),
+    ("borrowed", "Borrowed", _borrow_message),
+    ("returned", "Returned", _return_message),
+    ("overdue", "Overdue, please return", _overdue_message),
+)
+
+
+def _digest_line(kind: str, borrow, book) -> str:
+    if kind in ("held", "borrowed"):
+        return f"- {book.title}, due back by {(borrow.borrow_date + timedelta(days=14)).date()}"
+    if kind == "returned":
+        return f"- {book.title}, returned on {borrow.return_date.date() if borrow.return_date else 'request'}"
+    return f"- {book.title}, borrowed on {borrow.borrow_date.date()}"
+
+
+def _digest_message(member, sections: dict[str, list]) -> tuple[str, str, str]:
+    """One message listing a member's (borrow, book) pairs per section."""
+    lines, counts = [f"Dear {member.name},", ""], []
+    for kind, heading, _ in DIGEST_LAYOUT:
+        entries = sections.get(kind)
+        if not entries:
+            continue
+        counts.append(f"{len(entries)} {kind}")
+        lines += [f"{heading}:", *(_digest_line(kind, borrow, book) for borrow, book in entries), ""]
+    lines.append("Thank you.")
+    return member.email, f"Your library activity: {', '.join(counts)}", "\n".join(lines)
+
+
+@app.task(name="app.tasks.email_tasks.send_borrow_email",
+          bind=True, max_retries=3)
+def send_borrow_email(self, borrow_id: int):
+    rows = _borrow_details(self, [borrow_id])
+    if not rows:
+        logger.error(f"Borrow record {borrow_id} not found")
+        return {"error": f"Borrow record {borrow_id} not found"}
+    if not _claim_delivery(self):
+        return {"status": "Already delivered"}
+    _check_delivery(self, [run_sync(send_email(*_borrow_message(*rows[0])))])
+    logger.info(f"Borrow email sent for borrow_id: {borrow_id}")
+    return {"status": "Borrow email sent"}
 
 
 @app.task(name="app.tasks.email_tasks.send_return_email",
           bind=True, max_retries=3)
 def send_return_email(self, borrow_id: int):
-    settings = get_settings()
-    try:
-        logger.info(f"""Attempting to connect to
-                    DATABASE_URL: {settings.DATABASE_URL}""")
-        parsed_url = urllib.parse.urlparse(settings.DATABASE_URL)
-        logger.info(f"Parsed DATABASE_URL: scheme={parsed_url.scheme}, host={parsed_url.hostname}, port={parsed_url.port}, path={parsed_url.path}")
-        if parsed_url.path != '/library_db':
-            raise ValueError(f"Invalid database name in DATABASE_URL: {parsed_url.path}, expected '/library_db'")
-        engine = create_engine(settings.DATABASE_URL, echo=True, connect_args={'dbname': 'library_db'})
-        conn = engine.connect()
-        logger.info(f"Successfully connected to database: {conn}")
-        conn.close()
-        SessionLocal = sessionmaker(autocommit=False,
-                                    autoflush=False, bind=engine)
-        session = SessionLocal()
-        try:
-            borrow = session.query(Borrow).get(borrow_id)
-            if not borrow:
-                logger.error(f"Borrow record {borrow_id} not found")
-                return {"error": f"Borrow record {borrow_id} not found"}
-            member = session.query(Member).get(borrow.member_id)
-            book = session.query(Book).get(borrow.book_id)
-            if not member or not book:
-                logger.error("Member or book not found")
-                return {"error": "Member or book not found"}
-            subject = f"Book Returned: {book.title}"
-            body = f"Dear {member.name},\n\nYou have returned '{book.title}' on {borrow.return_date}. Thank you for using our library.\n\nBest regards."
-            send_email.delay(member.email, subject, body)
-            logger.info(f"Return email task triggered for borrow_id: {borrow_id}")
-            return {"status": "Return email sent"}
-        except Exception as e:
-            logger.error(f"send_return_email error: {e}")
-            return {"error": str(e)}
-        finally:
-            session.close()
-    except Exception as e:
-        logger.error(f"Database connection error in send_return_email: {e}")
-        self.retry(countdown=60, exc=e)
+    rows = _borrow_details(self, [borrow_id])
+    if not rows:
+        logger.error(f"Borrow record {borrow_id} not found")
+        return {"error": f"Borrow record {borrow_id} not found"}
+    if not _claim_delivery(self):
+        return {"status": "Already delivered"}
+    _check_delivery(self, [run_sync(send_email(*_return_message(*rows[0])))])
+    logger.info(f"Return email sent for borrow_id: {borrow_id}")
+    return {"status": "Return email sent"}
+
+
+@app.task(name="app.tasks.email_tasks.send_hold_email",
+          bind=True, max_retries=3)
+def send_hold_email(self, borrow_id: int):
+    """Tell a member their hold was fulfilled by a returned copy."""
+    rows = _borrow_details(self, [borrow_id])
+    if not rows:
+        logger.error(f"Borrow record {borrow_id} not found")
+        return {"error": f"Borrow record {borrow_id} not found"}
+    if not _claim_delivery(self):
+        return {"status": "Already delivered"}
+    _check_delivery(self, [run_sync(send_email(*_hold_message(*rows[0])))])
+    logger.info(f"Hold email sent for borrow_id: {borrow_id}")
+    return {"status": "Hold email sent"}
+
+
+@app.task(name="app.tasks.email_tasks.send_borrow_emails",
+          bind=True, max_retries=3)
+def send_borrow_emails(self, borrow_ids: list[int]):
+    """Send borrow notifications for a whole batch borrow."""
+    messages = [_borrow_message(*row) for row in _borrow_details(self, borrow_ids)]
+    if not _claim_delivery(self):
+        return {"status": "Already delivered"}
+    _check_delivery(self, run_sync(_send_all(messages)))
+    logger.info(f"Borrow emails sent for {len(messages)} of {len(borrow_ids)} borrows")
+    return {"status": "Borrow emails sent", "count": len(messages)}
+
+
+@app.task(name="app.tasks.email_tasks.send_return_emails",
+          bind=True, max_retries=3)
+def send_return_emails(self, borrow_ids: list[int]):
+    """Send return notifications for a whole batch return."""
+    messages = [_return_message(*row) for row in _borrow_details(self, borrow_ids)]
+    if not _claim_delivery(self):
+        return {"status": "Already delivered"}
+    _check_delivery(self, run_sync(_send_all(messages)))
+    logger.info(f"Return emails sent for {len(messages)} of {len(borrow_ids)} borrows")
+    return {"status": "Return emails sent", "count": len(messages)}
+
+
+@app.task(name="app.tasks.email_tasks.send_overdue_emails",
+          bind=True, max_retries=3)
+def send_overdue_emails(self, borrow_ids: list[int]):
+    """Send overdue reminders for a chunk of the overdue scan, one per borrow."""
+    messages = [_overdue_message(*row) for row in _borrow_details(self, borrow_ids)]
+    if not _claim_delivery(self):
+        return {"status": "Already delivered"}
+    _check_delivery(self, run_sync(_send_all(messages)))
+    logger.info(f"Overdue emails sent for {len(messages)} of {len(borrow_ids)} borrows")
+    return {"status": "Overdue emails sent", "count": len(messages)}
+
+
+@app.task(name="app.tasks.email_tasks.send_notification_digest",
+          bind=True, max_retries=3)
+def send_notification_digest(self, member_id: int, sections: dict[str, list[int]]):
+    """Send one email covering a member's coalesced notifications.
+
+    sections maps held/borrowed/returned/overdue to borrow ids; all of
+    them are loaded with one joined query. A digest of a single
+    notification is sent with that notification's usual message.
+    """
+    details = {borrow.id: (borrow, member, book)
+               for borrow, member, book in _borrow_details(self, [i for ids in sections.values() for i in ids])}
+    found = {kind: [details[i] for i in ids if i in details] for kind, ids in sections.items()}
+    events = [(kind, row) for kind, _, _ in DIGEST_LAYOUT for row in found.get(kind, [])]
+    if not events:
+        logger.error(f"No borrow records found for the digest of member {member_id}")
+        return {"error": f"No borrow records found for member {member_id}"}
+    if len(events) == 1:
+        kind, row = events[0]
+        message = {kind: render for kind, _, render in DIGEST_LAYOUT}[kind](*row)
+    else:
+        member = events[0][1][1]
+        message = _digest_message(member, {kind: [(borrow, book) for borrow, _, book in rows]
+                                           for kind, rows in found.items()})
+    if not _claim_delivery(self):
+        return {"status": "Already delivered"}
+    _check_delivery(self, [run_sync(send_email(*message))])
+    logger.info(f"Digest sent to member {member_id}: {len(events)} notifications")
+    return {"status": "Digest email sent", "count": len(events)}
+
+
+@app.task(name="app.tasks.email_tasks.send_emails",
+          bind=True, max_retries=3)
+def send_emails(self, messages: list[tuple[str, str, str]]):
+    """Send a batch of (to_email, subject, body) messages."""
+    results = run_sync(_send_all([tuple(message) for message in messages]))
+    failed = sum(1 for result in results if "error" in result)
+    logger.info(f"Email batch sent: {len(messages) - failed} ok, {failed} failed")
+    return {"status": "Email batch sent", "sent": len(messages) - failed, "failed": failed}
+
+
+def _overdue_chunk(session, cutoff: datetime, after, chunk_size: int):
+    """One keyset chunk of overdue borrows not reminded yet (ix_borrows_overdue_pending).
+
+    The reminders load their details.
+    """
+    query = session.query(Borrow.id, Borrow.created_at, Borrow.member_id)\
+        .filter(Borrow.return_date.is_(None),
+                Borrow.overdue_notified_at.is_(None),
+                Borrow.created_at < cutoff)
+    if after is not None:
+        query = query.filter(or_(Borrow.created_at > after[0],
+                                 and_(Borrow.created_at == after[0], Borrow.id > after[1])))
+    return query.order_by(Borrow.created_at, Borrow.id).limit(chunk_size).all()
 
 
 @app.task(name="app.tasks.email_tasks.check_overdue_books",
           bind=True, max_retries=3)
 def check_overdue_books(self):
+    """Queue overdue reminders for open borrows past the loan period.
+
+    Borrows are read in keyset chunks of OVERDUE_CHUNK_SIZE. Each chunk gets
+    overdue_notified_at set with a single UPDATE and, in the same transaction,
+    written to the outbox as one row per member, so the reminders join
+    that member's other pending notifications in a single digest.
+    """
     settings = get_settings()
+    started = time.perf_counter()
+    cutoff = datetime.now() - timedelta(days=settings.OVERDUE_DAYS)
+    chunk_size = settings.OVERDUE_CHUNK_SIZE
     try:
-        logger.info(f"Attempting to connect to DATABASE_URL: {settings.DATABASE_URL}")
-        parsed_url = urllib.parse.urlparse(settings.DATABASE_URL)
-        logger.info(f"Parsed DATABASE_URL: scheme={parsed_url.scheme}, host={parsed_url.hostname}, port={parsed_url.port}, path={parsed_url.path}")
-        if parsed_url.path != '/library_db':
-            raise ValueError(f"Invalid database name in DATABASE_URL: {parsed_url.path}, expected '/library_db'")
-        engine = create_engine(settings.DATABASE_URL, echo=True, connect_args={'dbname': 'library_db'})
-        conn = engine.connect()
-        logger.info(f"Successfully connected to database: {conn}")
-        conn.close()
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        session = SessionLocal()
-        try:
-            overdue_date = datetime.now() - timedelta(days=14)
-            overdue_borrows = session.query(Borrow).filter(Borrow.return_date is None, Borrow.borrow_date < overdue_date).all()
-            for borrow in overdue_borrows:
-                member = session.query(Member).get(borrow.member_id)
-                book = session.query(Book).get(borrow.book_id)
-                if member and book:
-                    subject = f"Overdue Book: {book.title}"
-                    body = f"""Dear {member.name},\n\nThe book '{book.title}'
-                    is overdue. Please return it.\n\nThank you."""
-                    send_email.delay(member.email, subject, body)
-                    logger.info(f"Overdue email task triggered for borrow_id: {borrow.id}")
-            return {"status": "Overdue emails sent"}
-        except Exception as e:
-            logger.error(f"check_overdue_books error: {e}")
-            return {"error": str(e)}
-        finally:
-            session.close()
+        session = get_session_factory()()
     except Exception as e:
         logger.error(f"Database connection error in check_overdue_books: {e}")
-        self.retry(countdown=60, exc=e)
+        raise self.retry(countdown=60, exc=e)
+    scanned = notified = batches = 0
+    try:
+        after = None
+        while True:
+            rows = _overdue_chunk(session, cutoff, after, chunk_size)
+            if not rows:
+                break
+            scanned += len(rows)
+            after = (rows[-1].created_at, rows[-1].id)
+            by_member = {}
+            for row in rows:
+                by_member.setdefault(row.member_id, []).append(row.id)
+            session.execute(
+                update(Borrow)
+                .where(Borrow.id.in_([row.id for row in rows]))
+                .values(overdue_notified_at=datetime.now())
+                .execution_options(synchronize_session=False)
+            )
+            session.execute(insert(OutboxMessage), [
+                outbox_row("send_overdue_emails", ids, member_id=member_id) for member_id, ids in by_member.items()
+            ])
+            session.commit()
+            notified += len(rows)
+            batches += 1
+            if len(rows) < chunk_size:
+                break
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Overdue scan: scanned={scanned} notified={notified} batches={batches} elapsed_ms={elapsed_ms}")
+        return {"status": "Overdue emails queued", "scanned": scanned, "notified": notified,
+                "batches": batches, "elapsed_ms": elapsed_ms}
+    except Exception as e:
+        session.rollback()
+        logger.error(f"check_overdue_books error: {e}")
+        return {"error": str(e), "scanned": scanned, "notified": notified}
+    finally:
+        session.close()
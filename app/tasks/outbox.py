@@ -0,0 +1,92 @@
+"""Outbox dispatcher: publishes the tasks services wrote to the outbox.
+
+    python -m app.tasks.outbox           # poll until stopped
+    python -m app.tasks.outbox --once    # drain what is due and exit
+
+With OUTBOX_DISPATCH_MODE=celery each batch is published to the broker
+over one producer connection; direct runs the tasks in this process, for
+local setups without a broker; a task whose email fails raises, so its
+row is kept and retried with backoff. A member's notifications are sent as one
+digest (see app.services.outbox). Several dispatchers may run side by side
+on Postgres.
+"""
+import argparse
+import logging
+import time
+from typing import Optional
+from app.core.config import get_settings
+from app.models.base import dispose_engine, get_session_factory, init_engine
+from app.services.outbox import dispatch_outbox
+from app.tasks import email_tasks
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_MODES = ("celery", "direct")
+
+
+def _task(name: str):
+    return email_tasks.app.tasks[f"app.tasks.email_tasks.{name}"]
+
+
+def _run_here(task: str, args: list, task_id: str):
+    # Start with Celery's retries used up: a failed send raises at once and
+    # the outbox row backs off and stays for the next round instead
+    celery_task = _task(task)
+    celery_task.apply(args=args, task_id=task_id, throw=True, retries=celery_task.max_retries)
+
+
+def dispatch_once(mode: Optional[str] = None, batch_size: Optional[int] = None,
+                  session_factory=None, producer=None) -> dict:
+    """Publish one batch of due outbox rows."""
+    settings = get_settings()
+    mode = mode or settings.OUTBOX_DISPATCH_MODE
+    if mode not in DISPATCH_MODES:
+        raise ValueError(f"Unknown OUTBOX_DISPATCH_MODE {mode!r}, expected one of {', '.join(DISPATCH_MODES)}")
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    session = (session_factory or get_session_factory())()
+    try:
+        if mode == "direct":
+            return dispatch_outbox(session, _run_here, batch_size, settings.OUTBOX_RETRY_SECONDS)
+        with email_tasks.app.producer_or_acquire(producer) as producer:
+            def publish(task, args, task_id):
+                _task(task).apply_async(args=args, task_id=task_id, producer=producer)
+            return dispatch_outbox(session, publish, batch_size, settings.OUTBOX_RETRY_SECONDS)
+    finally:
+        session.close()
+
+
+def run_dispatcher(mode: Optional[str] = None, once: bool = False):
+    """Dispatch until stopped; full batches are followed immediately by the next one."""
+    settings = get_settings()
+    init_engine(pool_size=1, max_overflow=0)
+    logger.info(f"Outbox dispatcher started: mode={mode or settings.OUTBOX_DISPATCH_MODE}")
+    try:
+        while True:
+            try:
+                result = dispatch_once(mode)
+            except Exception as e:
+                logger.error(f"Outbox dispatch error: {e}")
+                result = {"claimed": 0, "published": 0, "tasks": 0, "failed": 1}
+            if result["published"]:
+                logger.info(f"Outbox: published {result['published']} of {result['claimed']} "
+                            f"as {result['tasks']} tasks")
+            if result["claimed"] >= settings.OUTBOX_BATCH_SIZE and not result["failed"]:
+                continue
+            if once:
+                return
+            time.sleep(settings.OUTBOX_POLL_SECONDS)
+    finally:
+        dispose_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=DISPATCH_MODES)
+    parser.add_argument("--once", action="store_true", help="drain the due rows and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    run_dispatcher(args.mode, args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""Latency and throughput of the API hot paths, in process.
+
+Runs the real FastAPI app (lifespan, dependencies, engine and pool from
+Settings) through httpx's ASGI transport against a throwaway SQLite file,
+or any database given with --database-url, and drives each scenario with
+--concurrency clients:
+
+- register: POST /api/v1/register with a fresh email
+- login:    POST /api/v1/login
+- borrow:   POST /api/v1/borrow/
+- history:  GET /api/v1/borrow/member/{id}?limit=20
+- return:   POST /api/v1/borrow/{id}/return, for the borrows made above
+
+Notifications only go into the outbox, so no broker is needed. Login and
+register include bcrypt at BCRYPT_ROUNDS, as in production.
+
+    python -m benchmarks.api --concurrency 8 --requests 400 --output bench.json
+    python -m benchmarks.api --baseline bench.json        # run, then compare
+    python -m benchmarks.api --compare bench.json new.json
+
+A comparison exits with status 1 when any scenario got slower (p50, p95
+or p99 up) or lost throughput by more than --threshold.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+SCENARIOS = ("register", "login", "borrow", "history", "return")
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+    }
+    for metric in LATENCY_METRICS:
+        summary[metric] = round(percentile(latencies, int(metric[1:3])) * 1000, 3)
+    return summary
+
+
+def median_of(runs: list[dict]) -> dict:
+    """Combine repeated runs: requests and errors add up, rates and latencies take the median."""
+    combined = {"requests": sum(run["requests"] for run in runs), "errors": sum(run["errors"] for run in runs)}
+    for metric in ("rps", "mean_ms") + LATENCY_METRICS:
+        combined[metric] = statistics.median(run[metric] for run in runs)
+    return combined
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[dict]:
+    """Scenario metrics that regressed by more than threshold (0.1 = 10%).
+
+    Latency percentiles regress when they grow, rps when it drops; new
+    errors always count. Scenarios missing from either run are ignored.
+    """
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        for metric in LATENCY_METRICS + ("rps",):
+            old, new = before[metric], now[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (change if metric != "rps" else -change) > threshold:
+                regressions.append({"scenario": name, "metric": metric, "baseline": old,
+                                    "current": new, "change": round(change, 3)})
+        if now["errors"] > before["errors"]:
+            regressions.append({"scenario": name, "metric": "errors", "baseline": before["errors"],
+                                "current": now["errors"], "change": None})
+    return regressions
+
+
+async def _drive(requests: int, concurrency: int, send, first: int = 0) -> dict:
+    """Issue requests calls of send(slot, i) from concurrency workers.
+
+    i counts up from first, so warmup and timed runs never reuse an index.
+    """
+    latencies, errors = [], 0
+    counter = iter(range(first, first + requests))
+
+    async def worker(slot: int):
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await send(slot, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(slot) for slot in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def _seed_books(count: int) -> list[int]:
+    from app.models.base import get_async_session_factory
+    from app.models.book import Book
+
+    async with get_async_session_factory()() as db:
+        books = [Book(title=f"Benchmark title {i}", author=f"Author {i % 50}",
+                      total_copies=100000, available_copies=100000) for i in range(count)]
+        db.add_all(books)
+        await db.commit()
+        return [book.id for book in books]
+
+
+def _migrate(database_url: str):
+    """Bring the benchmark database to head; startup only checks the revision."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", database_url)
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+
+async def run_suite(requests: int, concurrency: int, scenarios=SCENARIOS, warmup: int = 20,
+                    repeat: int = 3, books: int = 100) -> dict:
+    """Run the scenarios against the database configured in the environment.
+
+    Each scenario first sends warmup untimed requests, so pool connects and
+    first-call setup stay out of the percentiles, then is timed repeat
+    times; the reported figures are medians over those runs.
+    """
+    from app.main import app
+    from app.models.base import get_database_url
+
+    _migrate(get_database_url())
+    run_id = uuid.uuid4().hex[:8]
+    password = "benchmark-password"
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench/api/v1") as client:
+        book_ids = await _seed_books(books)
+        # One member and token per client, made outside the timed runs
+        members, headers = [], []
+        for slot in range(concurrency):
+            email = f"bench-{run_id}-client{slot}@example.com"
+            member = (await client.post("/register", json={"name": f"Client {slot}", "email": email,
+                                                           "password": password})).json()
+            token = (await client.post("/login", json={"email": email, "password": password})).json()
+            members.append(member["id"])
+            headers.append({"Authorization": f"Bearer {token['access_token']}"})
+        borrow_ids = []
+
+        async def register(slot, i):
+            return await client.post("/register", json={"name": f"Member {i}", "password": password,
+                                                        "email": f"bench-{run_id}-{i}@example.com"})
+
+        async def login(slot, i):
+            return await client.post("/login", json={"email": f"bench-{run_id}-client{slot}@example.com",
+                                                     "password": password})
+
+        async def borrow(slot, i):
+            response = await client.post("/borrow/", headers=headers[slot],
+                                         json={"book_id": book_ids[i % len(book_ids)],
+                                               "member_id": members[slot]})
+            if response.status_code < 400:
+                borrow_ids.append(response.json()["id"])
+            return response
+
+        async def history(slot, i):
+            return await client.get(f"/borrow/member/{members[slot]}", headers=headers[slot],
+                                    params={"limit": 20})
+
+        async def return_(slot, i):
+            return await client.post(f"/borrow/{borrow_ids.pop()}/return", headers=headers[slot])
+
+        senders = {"register": register, "login": login, "borrow": borrow,
+                   "history": history, "return": return_}
+        for name in scenarios:
+            # Every return closes one of the borrows made by the borrow scenario
+            ready = min(warmup, len(borrow_ids)) if name == "return" else warmup
+            await _drive(ready, concurrency, senders[name])
+            runs, first = [], ready
+            for _ in range(repeat):
+                count = min(requests, len(borrow_ids)) if name == "return" else requests
+                if count:
+                    runs.append(await _drive(count, concurrency, senders[name], first=first))
+                    first += count
+            if runs:
+                results[name] = median_of(runs)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_results(results: dict):
+    print(f"{'scenario':<10} {'requests':>8} {'errors':>6} {'rps':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, row in results["scenarios"].items():
+        print(f"{name:<10} {row['requests']:>8} {row['errors']:>6} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}")
+
+
+def _print_regressions(regressions: list[dict], threshold: float) -> int:
+    if not regressions:
+        print(f"no regressions beyond {threshold:.0%}")
+        return 0
+    for item in regressions:
+        change = f"{item['change']:+.1%}" if item["change"] is not None else "new errors"
+        print(f"REGRESSION {item['scenario']:<10} {item['metric']:<7} "
+              f"{item['baseline']} -> {item['current']} ({change})")
+    return 1
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per timed run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests before each scenario")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per scenario; medians are reported")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--database-url", help="throwaway database to run against (default: temporary SQLite file)")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare this run against a stored JSON result")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="only compare two stored results")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative change that counts as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return _print_regressions(compare(*map(_load, args.compare), args.threshold), args.threshold)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'library_db.sqlite')}"
+        os.environ["TEST_DATABASE_URL"] = database_url
+        scenarios = asyncio.run(run_suite(args.requests, args.concurrency, args.scenarios,
+                                          args.warmup, args.repeat))
+    results = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "database": database_url.split(":", 1)[0],
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "repeat": args.repeat,
+        },
+        "scenarios": scenarios,
+    }
+    _print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        return _print_regressions(compare(_load(args.baseline), results, args.threshold), args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
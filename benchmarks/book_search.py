@@ -0,0 +1,114 @@
+"""Latency of catalog search on a large synthetic SQLite catalog.
+
+Builds (or reuses) a catalog of --books titles and times search_books and
+autocomplete_books through the real AsyncSession path:
+
+    python -m benchmarks.book_search --books 1000000 --db /tmp/catalog.sqlite
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.base import Base
+import app.models.borrow  # noqa: F401
+import app.models.member  # noqa: F401
+from app.services.book_service import autocomplete_books, search_books
+
+SYLLABLES = ["ka", "lo", "mi", "ran", "tor", "vel", "sha", "dun", "qui", "ber", "nox", "ael",
+             "gri", "pol", "zen", "mar", "tha", "ost", "ivy", "lum", "dra", "cel", "fen", "wyn"]
+COMMON = ["the", "of", "and", "a", "in", "night", "house", "river", "war", "love", "city", "last"]
+
+QUERIES = {
+    "rare word": lambda rng, words: rng.choice(words),
+    "two words": lambda rng, words: f"{rng.choice(COMMON)} {rng.choice(words)}",
+    "author + title": lambda rng, words: f"{rng.choice(words)} {rng.choice(words)}",
+    "common word, available": lambda rng, words: rng.choice(COMMON[5:]),
+}
+
+
+def _vocabulary(rng: random.Random, size: int) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def build_catalog(path: str, books: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    words = _vocabulary(rng, 50_000)
+    if os.path.exists(path):
+        return words
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    conn = sqlite3.connect(path)
+    started = time.perf_counter()
+    batch = []
+    for i in range(books):
+        title = " ".join(rng.choice(COMMON) if rng.random() < 0.3 else rng.choice(words)
+                         for _ in range(rng.randint(1, 5))).capitalize()
+        author = f"{rng.choice(words).capitalize()} {rng.choice(words).capitalize()}"
+        copies = rng.randint(1, 3)
+        batch.append((title, author, copies, rng.randint(0, copies)))
+        if len(batch) == 50_000 or i == books - 1:
+            conn.executemany("INSERT INTO books (title, author, total_copies, available_copies, "
+                             "created_at, updated_at) VALUES (?, ?, ?, ?, datetime(), datetime())", batch)
+            conn.commit()
+            batch.clear()
+    conn.execute("INSERT INTO books_fts(books_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+    print(f"built {books} books in {time.perf_counter() - started:.1f}s")
+    return words
+
+
+def _percentiles(samples: list[float]) -> str:
+    cuts = statistics.quantiles(samples, n=100)
+    return f"p50={cuts[49]:6.2f}ms p95={cuts[94]:6.2f}ms p99={cuts[98]:6.2f}ms max={max(samples):6.2f}ms"
+
+
+async def run(path: str, words: list[str], iterations: int):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+    rng = random.Random(11)
+    try:
+        async with SessionLocal() as db:
+            for name, make_query in QUERIES.items():
+                available = name.endswith("available")
+                samples = []
+                for _ in range(iterations):
+                    q = make_query(rng, words)
+                    started = time.perf_counter()
+                    await search_books(db, q, available_only=available, limit=20)
+                    samples.append((time.perf_counter() - started) * 1000)
+                print(f"search {name:<24} {_percentiles(samples)}")
+            samples = []
+            for _ in range(iterations):
+                word = rng.choice(words)
+                started = time.perf_counter()
+                await autocomplete_books(db, word[:rng.randint(3, 5)], limit=10)
+                samples.append((time.perf_counter() - started) * 1000)
+            print(f"autocomplete {'3-5 letter prefix':<18} {_percentiles(samples)}")
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--db", default="/tmp/library_db_search_bench.sqlite")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    words = build_catalog(args.db, args.books)
+    asyncio.run(run(args.db, words, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
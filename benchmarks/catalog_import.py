@@ -0,0 +1,92 @@
+"""Throughput and memory of the streaming catalog import.
+
+Writes a synthetic acquisition list in each format to a temporary file and
+imports it into a fresh SQLite database (FTS triggers included), reading
+the file in 1 MiB chunks like the CLI does:
+
+    python -m benchmarks.catalog_import --rows 200000 --formats csv ndjson marc
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.base import Base
+import app.models.borrow  # noqa: F401
+import app.models.member  # noqa: F401
+from app.services.catalog_import import _read_file, import_books, parse_records
+
+
+def _isbn(i: int) -> str:
+    return f"978{i:010d}"
+
+
+def _marc(title: str, author: str, isbn: str) -> bytes:
+    fields = [("020", f"  \x1fa{isbn}"), ("100", f"1 \x1fa{author},"), ("245", f"10\x1fa{title} /")]
+    directory, data = b"", b""
+    for tag, value in fields:
+        encoded = value.encode() + b"\x1e"
+        directory += f"{tag}{len(encoded):04d}{len(data):05d}".encode()
+        data += encoded
+    base = 24 + len(directory) + 1
+    leader = f"{base + len(data) + 1:05d}nam a22{base:05d} a 4500".encode()
+    return leader + directory + b"\x1e" + data + b"\x1d"
+
+
+def _write_input(path: str, fmt: str, rows: int):
+    with open(path, "wb") as out:
+        if fmt == "csv":
+            out.write(b"title,author,total_copies,isbn\n")
+        for i in range(rows):
+            title, author = f"Acquired title number {i}", f"Author {i % 5000}"
+            if fmt == "csv":
+                out.write(f'"{title}",{author},{i % 3 + 1},{_isbn(i)}\n'.encode())
+            elif fmt == "ndjson":
+                out.write(json.dumps({"title": title, "author": author, "total_copies": i % 3 + 1,
+                                      "isbn": _isbn(i)}).encode() + b"\n")
+            else:
+                out.write(_marc(title, author, _isbn(i)))
+
+
+async def _import(db_path: str, input_path: str, fmt: str, chunk_size: int):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    try:
+        async with factory() as db:
+            return await import_books(db, parse_records(fmt, _read_file(input_path)), chunk_size=chunk_size)
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "ndjson", "marc"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats:
+            input_path, db_path = os.path.join(tmp, f"input.{fmt}"), os.path.join(tmp, f"{fmt}.sqlite")
+            _write_input(input_path, fmt, args.rows)
+            engine = create_engine(f"sqlite:///{db_path}")
+            Base.metadata.create_all(engine)
+            engine.dispose()
+            for label in ("insert", "reimport"):
+                started = time.perf_counter()
+                report = asyncio.run(_import(db_path, input_path, fmt, args.chunk_size))
+                elapsed = time.perf_counter() - started
+                assert report.rejected == 0, report.rejects
+                peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                print(f"{fmt:<7} {label:<8} {report.written:>8} rows {elapsed:6.2f}s "
+                      f"{report.written / elapsed:9.0f} rows/s  peak RSS {peak_mb:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Borrow throughput on one hot title: counter vs per-copy inventory.
+
+--clients concurrent clients borrow the same title through borrow_book
+until its --copies copies are gone, once with INVENTORY_MODEL=counter and
+once with copies, each on freshly created tables: throwaway SQLite files,
+or the database given with --database-url (its tables are dropped and
+created again, so point it at a scratch database):
+
+    python -m benchmarks.inventory --clients 16 --copies 2000
+    python -m benchmarks.inventory --database-url postgresql+asyncpg://user:pw@db/library_db_bench
+
+SQLite has a single writer, so both models serialize there; the per-copy
+model only removes the hot row on Postgres.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.models.base import Base
+from app.models.book import Book
+from app.models.book_copy import BookCopy
+from app.models.borrow import Borrow
+from app.models.member import Member
+from app.schemas.borrow import BorrowCreate
+from app.services.borrow_service import borrow_book
+
+MODELS = ("counter", "copies")
+
+
+async def _reset(engine, copies: int, clients: int) -> tuple[int, list[int]]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        book_id = (await conn.execute(
+            insert(Book).values(title="Hot Title", author="Popular Author",
+                                total_copies=copies, available_copies=copies).returning(Book.id)
+        )).scalar_one()
+        member_ids = list((await conn.execute(
+            insert(Member).returning(Member.id),
+            [{"email": f"reader{i}@example.com", "name": f"Reader {i}", "hashed_password": "x"}
+             for i in range(clients)]
+        )).scalars())
+        await conn.execute(insert(BookCopy), [{"book_id": book_id, "status": "available"}] * copies)
+    return book_id, member_ids
+
+
+async def _client(SessionLocal, book_id: int, member_id: int, latencies: list[float]):
+    while True:
+        started = time.perf_counter()
+        async with SessionLocal() as db:
+            try:
+                await borrow_book(BorrowCreate(book_id=book_id, member_id=member_id), db)
+            except HTTPException as e:
+                if e.status_code != 400:
+                    raise
+                return
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run(url: str, model: str, copies: int, clients: int) -> dict:
+    settings.INVENTORY_MODEL = model
+    if url.startswith("sqlite"):
+        engine = create_async_engine(url, poolclass=NullPool, connect_args={"timeout": 60})
+    else:
+        engine = create_async_engine(url, pool_size=clients, max_overflow=0)
+    try:
+        book_id, member_ids = await _reset(engine, copies, clients)
+        SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+        latencies = []
+        started = time.perf_counter()
+        await asyncio.gather(*[_client(SessionLocal, book_id, member_id, latencies) for member_id in member_ids])
+        elapsed = time.perf_counter() - started
+        async with SessionLocal() as db:
+            borrows = await db.scalar(select(func.count(Borrow.id)))
+            available = await db.scalar(select(Book.available_copies).where(Book.id == book_id))
+    finally:
+        await engine.dispose()
+    if borrows != copies or available != 0:
+        raise RuntimeError(f"{model}: {borrows} borrows of {copies} copies, {available} left available")
+    cuts = statistics.quantiles(latencies, n=100)
+    return {"borrows": borrows, "seconds": elapsed, "rate": borrows / elapsed,
+            "p50_ms": cuts[49], "p95_ms": cuts[94]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--copies", type=int, default=2000)
+    parser.add_argument("--database-url", help="async SQLAlchemy URL of a scratch database")
+    args = parser.parse_args()
+    print(f"{'model':<9}{'borrows':>9}{'seconds':>9}{'borrows/s':>11}{'p50 ms':>9}{'p95 ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for model in MODELS:
+            url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp, f'library_db_{model}.sqlite')}"
+            row = asyncio.run(run(url, model, args.copies, args.clients))
+            print(f"{model:<9}{row['borrows']:>9}{row['seconds']:>9.2f}{row['rate']:>11.1f}"
+                  f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
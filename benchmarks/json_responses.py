@@ -0,0 +1,96 @@
+"""CPU time per response: FastAPI's response_model pipeline vs the fast path.
+
+Serializes ORM objects (built in memory, no database) three ways:
+
+- validate twice: the service calls model_validate, then FastAPI dumps the
+  model, validates it again against response_model and encodes with json
+- response_model: ORM objects handed straight to FastAPI
+- fast path: app.core.responses.json_response (cached TypeAdapter,
+  pydantic-core JSON)
+
+    python -m benchmarks.json_responses --rounds 200
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.core.responses import json_response
+from app.models.book import Book
+from app.models.borrow import Borrow
+import app.models.member  # noqa: F401
+from app.schemas.book import BookResponse
+from app.schemas.borrow import BorrowResponse
+
+
+def _books(count: int) -> list[Book]:
+    return [Book(id=i, title=f"Title {i}", author=f"Author {i % 97}", total_copies=3,
+                 available_copies=i % 4) for i in range(count)]
+
+
+def _borrows(count: int) -> list[Borrow]:
+    start = datetime(2024, 1, 1)
+    return [Borrow(id=i, book_id=i % 500, member_id=7, notification_sent=bool(i % 2),
+                   created_at=start + timedelta(hours=i),
+                   return_date=start + timedelta(hours=i, days=7) if i % 3 else None)
+            for i in range(count)]
+
+
+def _fastapi(type_, revalidate_first: bool):
+    field = create_model_field(name="Response", type_=type_, mode="serialization")
+    model = type_.__args__[0] if hasattr(type_, "__args__") else type_
+
+    async def render(value) -> bytes:
+        if revalidate_first:
+            value = [model.model_validate(v) for v in value] if isinstance(value, list) \
+                else model.model_validate(value)
+        content = await serialize_response(field=field, response_content=value)
+        return JSONResponse(content).body
+    return render
+
+
+def _fast(type_):
+    async def render(value) -> bytes:
+        return json_response(type_, value).body
+    return render
+
+
+async def _cpu_per_call(render, value, rounds: int) -> float:
+    await render(value)  # warm adapters and serializers
+    started = time.process_time()
+    for _ in range(rounds):
+        await render(value)
+    return (time.process_time() - started) / rounds
+
+
+async def run(rounds: int):
+    cases = [
+        ("single book", BookResponse, _books(1)[0]),
+        ("1000 books", List[BookResponse], _books(1000)),
+        ("single borrow", BorrowResponse, _borrows(1)[0]),
+        ("1000 borrows", List[BorrowResponse], _borrows(1000)),
+    ]
+    print(f"{'case':<14} {'validate twice':>15} {'response_model':>15} {'fast path':>12} {'speedup':>8}")
+    for name, type_, value in cases:
+        n = rounds * 50 if not isinstance(value, list) else rounds
+        twice = await _cpu_per_call(_fastapi(type_, revalidate_first=True), value, n)
+        once = await _cpu_per_call(_fastapi(type_, revalidate_first=False), value, n)
+        fast = await _cpu_per_call(_fast(type_), value, n)
+        print(f"{name:<14} {twice * 1e6:13.1f}us {once * 1e6:13.1f}us {fast * 1e6:10.1f}us "
+              f"{twice / fast:7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.rounds))
+
+
+if __name__ == "__main__":
+    main()
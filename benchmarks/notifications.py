@@ -0,0 +1,86 @@
+"""Emails and tasks produced by a circulation peak, with and without digests.
+
+Simulates --members members each borrowing --borrows books one by one,
+returning --returns of them and getting an overdue reminder from the scan,
+writes the outbox rows the services would write, lets the digest window
+elapse and drains the outbox through the dispatcher with a publisher that
+only counts. Emails are what the published tasks would send:
+
+    python -m benchmarks.notifications --members 2000 --borrows 12 --window 60
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.base import Base
+import app.models.book  # noqa: F401
+import app.models.borrow  # noqa: F401
+import app.models.member  # noqa: F401
+from app.models.outbox import OutboxMessage
+from app.services.outbox import DIGEST_TASK, dispatch_outbox, outbox_row
+
+
+def _rows(members: int, borrows: int, returns: int) -> list[dict]:
+    rows, borrow_id = [], 0
+    for member_id in range(1, members + 1):
+        first = borrow_id + 1
+        for _ in range(borrows):
+            borrow_id += 1
+            rows.append(outbox_row("send_borrow_email", borrow_id, member_id=member_id))
+        for returned in range(first, first + returns):
+            rows.append(outbox_row("send_return_email", returned, member_id=member_id))
+        rows.append(outbox_row("send_overdue_emails", list(range(first + returns, borrow_id + 1)),
+                               member_id=member_id))
+    return rows
+
+
+def run(members: int, borrows: int, returns: int, window: int, batch_size: int) -> dict:
+    settings.NOTIFICATION_DIGEST_WINDOW = window
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'library_db.sqlite')}")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        rows = _rows(members, borrows, returns)
+        for row in rows:
+            # Let the window elapse
+            row["available_at"] -= timedelta(seconds=window)
+        session.execute(insert(OutboxMessage), rows)
+        session.commit()
+        emails = tasks = 0
+
+        def publish(task, args, task_id):
+            nonlocal emails, tasks
+            tasks += 1
+            emails += 1 if task == DIGEST_TASK or not isinstance(args[0], list) else len(args[0])
+
+        started = time.perf_counter()
+        while dispatch_outbox(session, publish, batch_size)["claimed"]:
+            pass
+        elapsed = time.perf_counter() - started
+        session.close()
+        engine.dispose()
+    return {"tasks": tasks, "emails": emails, "dispatch_s": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--borrows", type=int, default=12)
+    parser.add_argument("--returns", type=int, default=4)
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    print(f"{'window s':>9}{'tasks':>9}{'emails':>9}{'dispatch s':>12}")
+    for window in (0, args.window):
+        row = run(args.members, args.borrows, args.returns, window, args.batch_size)
+        print(f"{window:>9}{row['tasks']:>9}{row['emails']:>9}{row['dispatch_s']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare one SMTP session per message with the pooled sender.
+
+Runs against a local aiosmtpd server, so the numbers measure connection
+and protocol overhead rather than a real relay:
+
+    python -m benchmarks.smtp_pool --messages 500 --pool-size 4
+"""
+import argparse
+import asyncio
+import socket
+import time
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from app.services.smtp_pool import SMTPPool, build_message
+
+
+class _Sink:
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _per_message(host: str, port: int, messages) -> float:
+    started = time.perf_counter()
+    for message in messages:
+        await aiosmtplib.send(message, hostname=host, port=port, use_tls=False)
+    return time.perf_counter() - started
+
+
+async def _pooled(host: str, port: int, messages, pool_size: int) -> float:
+    started = time.perf_counter()
+    async with SMTPPool(host, port, use_tls=False, max_connections=pool_size) as pool:
+        results = await pool.send_many(messages)
+    assert all("error" not in result for result in results)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    controller = Controller(_Sink(), hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    try:
+        messages = [build_message(f"reader{i}@example.com", f"Reminder {i}", "Body", "library@example.com")
+                    for i in range(args.messages)]
+        baseline = asyncio.run(_per_message(controller.hostname, controller.port, messages))
+        pooled = asyncio.run(_pooled(controller.hostname, controller.port, messages, args.pool_size))
+    finally:
+        controller.stop()
+    print(f"per-message sessions: {args.messages / baseline:8.1f} msg/s ({baseline:.2f}s)")
+    print(f"pooled (size={args.pool_size}):    {args.messages / pooled:8.1f} msg/s ({pooled:.2f}s)")
+    print(f"speedup: {baseline / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
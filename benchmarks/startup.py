@@ -0,0 +1,98 @@
+"""Cold start of the API: import time and lifespan startup in fresh processes.
+
+Each run is a new interpreter that imports app.main and enters the
+lifespan against an Alembic-migrated SQLite database, once per
+SCHEMA_STARTUP mode. Reports the median import time, startup time and
+the time spent obtaining database connections during startup:
+
+    python -m benchmarks.startup --runs 10 --modes check create
+    python -m benchmarks.startup --importtime 15
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _measure_once() -> dict:
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+    from prometheus_client import REGISTRY
+
+    connect = REGISTRY.get_sample_value("db_pool_checkout_seconds_sum", {"engine": "async"}) or 0.0
+    return {"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000,
+            "connect_ms": connect * 1000, "modules": len(sys.modules)}
+
+
+def _child(mode: str, database_url: str) -> dict:
+    env = {**os.environ, "SCHEMA_STARTUP": mode, "TEST_DATABASE_URL": database_url, "PYTHONPATH": ROOT}
+    output = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child"], env=env, cwd=ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _migrate(database_url: str):
+    from benchmarks.api import _migrate as migrate
+
+    migrate(database_url)
+
+
+def run(modes, runs: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'library_db.sqlite')}"
+        _migrate(database_url)
+        results = {}
+        for mode in modes:
+            samples = [_child(mode, database_url) for _ in range(runs)]
+            results[mode] = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+        return results
+
+
+def slowest_imports(limit: int) -> list[tuple[float, str]]:
+    """Top modules by cumulative import time, from -X importtime."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT,
+                            env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match and len(match.group(2)) <= 3:  # top-level imports only
+            rows.append((int(match.group(1)) / 1000, match.group(3)))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=["check", "create"], choices=["check", "create", "skip"])
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="also list the N slowest top-level imports of app.main")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        import asyncio
+
+        print(json.dumps(asyncio.run(_measure_once())))
+        return
+
+    print(f"{'mode':<8}{'import ms':>11}{'startup ms':>12}{'connect ms':>12}{'modules':>9}")
+    for mode, row in run(args.modes, args.runs).items():
+        print(f"{mode:<8}{row['import_ms']:>11.0f}{row['startup_ms']:>12.1f}{row['connect_ms']:>12.1f}"
+              f"{row['modules']:>9.0f}")
+    if args.importtime:
+        print("\nslowest imports (cumulative ms)")
+        for ms, module in slowest_imports(args.importtime):
+            print(f"{ms:>8.1f}  {module}")
+
+
+if __name__ == "__main__":
+    main()
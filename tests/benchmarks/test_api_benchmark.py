@@ -0,0 +1,42 @@
+from benchmarks.api import SCENARIOS, compare, median_of, percentile, run_suite
+
+
+def _result(**scenarios) -> dict:
+    base = {"requests": 100, "errors": 0, "rps": 100.0, "mean_ms": 10.0,
+            "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0}
+    return {"scenarios": {name: {**base, **changes} for name, changes in scenarios.items()}}
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (50.0, 95.0, 99.0)
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) == 0.0
+
+
+def test_median_of_repeated_runs():
+    runs = [_result(login={"rps": rps, "p95_ms": p95, "errors": 1})["scenarios"]["login"]
+            for rps, p95 in ((90.0, 25.0), (120.0, 18.0), (100.0, 40.0))]
+    combined = median_of(runs)
+    assert (combined["requests"], combined["errors"]) == (300, 3)
+    assert (combined["rps"], combined["p95_ms"]) == (100.0, 25.0)
+
+
+def test_compare_flags_slower_and_failing_scenarios():
+    baseline = _result(login={}, borrow={}, history={})
+    current = _result(login={"p95_ms": 23.0, "rps": 95.0},  # within 20%
+                      borrow={"p99_ms": 45.0, "rps": 70.0},
+                      history={"errors": 2},
+                      register={"p50_ms": 500.0})  # not in the baseline
+    regressions = compare(baseline, current, threshold=0.2)
+    assert [(item["scenario"], item["metric"]) for item in regressions] == [
+        ("borrow", "p99_ms"), ("borrow", "rps"), ("history", "errors")]
+    assert regressions[0]["change"] == 0.5
+    assert compare(baseline, baseline, threshold=0.2) == []
+
+
+async def test_run_suite_smoke(tmp_path, monkeypatch):
+    monkeypatch.setenv("TEST_DATABASE_URL", f"sqlite:///{tmp_path / 'library_db.sqlite'}")
+    results = await run_suite(requests=3, concurrency=2, warmup=1, repeat=1, books=2)
+    assert list(results) == list(SCENARIOS)
+    assert all(row["errors"] == 0 and row["requests"] == 3 for row in results.values())
@@ -1,10 +1,18 @@
+from contextlib import contextmanager
 import pytest
+import pytest_asyncio
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from app.models.base import Base
+from sqlalchemy.pool import NullPool, StaticPool
+from app.models.base import Base, get_async_db, get_async_session_factory, dispose_engine
 from unittest.mock import patch, MagicMock, AsyncMock
+from redis.exceptions import WatchError
 from fastapi.testclient import TestClient
 from app.main import app
+from app.core.cache import set_cache
+from app.core.queries import track_queries
+from app.core.security import member_cache
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -23,6 +31,14 @@ def mock_settings():
         yield mock_settings
 
 
+@pytest.fixture(autouse=True)
+def fresh_service_cache():
+    """Every test starts with an empty read-through cache; ids repeat across test databases."""
+    set_cache(None)
+    yield
+    set_cache(None)
+
+
 @pytest.fixture(scope="function")
 def db_session():
     """Create an in-memory SQLite session for tests."""
@@ -38,6 +54,76 @@ def db_session():
         engine.dispose()
 
 
+@pytest_asyncio.fixture(scope="function")
+async def async_db_session():
+    """Create an in-memory SQLite AsyncSession for service tests."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        await session.rollback()
+        await session.close()
+        await engine.dispose()
+
+
+@pytest.fixture
+def api_db(tmp_path):
+    """File-backed SQLite database wired into the app's async dependency.
+
+    Yields a sync session for seeding and assertions; requests made through
+    api_client get their own AsyncSession on the same file.
+    """
+    path = tmp_path / "library_db.sqlite"
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: AsyncSessionLocal
+    # Member ids differ between test databases; never serve a previous test's member
+    member_cache.clear()
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        member_cache.clear()
+        app.dependency_overrides.pop(get_async_db, None)
+        app.dependency_overrides.pop(get_async_session_factory, None)
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def api_client(api_db):
+    """FastAPI test client running against the api_db database."""
+    return TestClient(app)
+
+
+@pytest.fixture
+def task_db(tmp_path, monkeypatch):
+    """File-backed SQLite database used by the shared engine in Celery tasks."""
+    url = f"sqlite:///{tmp_path / 'library_db.sqlite'}"
+    monkeypatch.setenv("TEST_DATABASE_URL", url)
+    dispose_engine()
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+        dispose_engine()
+
+
 @pytest.fixture
 def client(db_session):
     """Create a FastAPI test client with overridden DB dependency."""
@@ -50,6 +136,24 @@ def client(db_session):
     return TestClient(app)
 
 
+@pytest.fixture
+def query_budget():
+    """Assert how many SQL statements a block may run.
+
+        with query_budget(2):
+            await borrow_book(...)
+
+    With repeat set, running one statement shape more often than that
+    raises RepeatedQueryError inside the block.
+    """
+    @contextmanager
+    def budget(max_queries: int, repeat: int = 0):
+        with track_queries("query budget", threshold=repeat, action="raise") as stats:
+            yield stats
+        assert stats.count <= max_queries, f"query budget of {max_queries} exceeded: {stats.summary()}"
+    return budget
+
+
 @pytest.fixture
 def mock_celery():
     """Mock Celery task calls."""
@@ -62,3 +166,79 @@ def mock_smtp():
     """Mock aiosmtplib send function."""
     with patch("aiosmtplib.send", new=AsyncMock()) as mock_send:
         yield mock_send
+
+
+class FakeRedis:
+    """In-memory stand-in for the parts of redis.asyncio the cache tiers use."""
+
+    def __init__(self):
+        self.data = {}
+        self.sets = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.sets.pop(key, None)
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    async def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    """Buffers commands until execute(); after watch() they run at once until multi()."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+        self.watched = None
+        self.immediate = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.calls, self.watched, self.immediate = [], None, False
+
+    async def watch(self, *keys):
+        self.watched = {key: self.redis.data.get(key) for key in keys}
+        self.immediate = True
+
+    def multi(self):
+        self.immediate = False
+
+    def __getattr__(self, name):
+        if self.immediate:
+            return getattr(self.redis, name)
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    async def execute(self):
+        if self.watched and any(self.redis.data.get(key) != value for key, value in self.watched.items()):
+            raise WatchError("Watched variable changed.")
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+from app.core.cache import ReadThroughCache, RedisTier, TTLCache, get_cache, set_cache
+from app.models.book import Book
+from app.models.member import Member
+from app.schemas.book import BookResponse
+from app.schemas.borrow import BorrowCreate
+from app.services import borrow_service
+from app.services.book_service import get_book
+
+
+def _statements(session) -> list:
+    statements = []
+    event.listen(session.bind.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+@pytest.fixture
+async def library(async_db_session):
+    books = [Book(title=f"Book {i}", author="Author", total_copies=2, available_copies=2) for i in range(2)]
+    member = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    async_db_session.add_all([*books, member])
+    await async_db_session.commit()
+    return books, member
+
+
+async def test_service_reads_are_cached_and_invalidated_by_tag(async_db_session, library):
+    """Test that borrowing drops exactly the affected book and member entries."""
+    (book, other), member = library
+    await get_book(async_db_session, book.id)
+    await get_book(async_db_session, other.id)
+    assert await borrow_service.get_member_borrows(member.id, async_db_session) == []
+
+    statements = _statements(async_db_session)
+    cached = await get_book(async_db_session, book.id)
+    assert isinstance(cached, BookResponse) and cached.available_copies == 2
+    await borrow_service.get_member_borrows(member.id, async_db_session)
+    assert statements == []
+
+    await borrow_service.borrow_book(BorrowCreate(book_id=book.id, member_id=member.id), async_db_session)
+    statements.clear()
+    await get_book(async_db_session, other.id)
+    assert statements == []
+    assert (await get_book(async_db_session, book.id)).available_copies == 1
+    assert len(await borrow_service.get_member_borrows(member.id, async_db_session)) == 1
+    assert len(statements) == 2
+    assert get_cache().stats()["hit_ratio"] > 0
+
+
+async def test_concurrent_misses_share_one_load():
+    """Test stampede protection: a hot key is loaded once for all waiters."""
+    cache = ReadThroughCache(TTLCache(maxsize=10, ttl=30))
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    results = await asyncio.gather(*(cache.get_or_load("hot", loader, ["t"]) for _ in range(20)))
+    assert calls == 1
+    assert all(result == {"value": 42} for result in results)
+    assert cache.stats()["coalesced"] == 19
+
+
+async def test_load_overlapping_invalidation_is_not_stored():
+    """Test that a result read before an invalidation never lands in the cache."""
+    cache = ReadThroughCache(TTLCache(maxsize=10, ttl=30))
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_loader():
+        started.set()
+        await release.wait()
+        return "old"
+
+    load = asyncio.create_task(cache.get_or_load("key", slow_loader, ["book:1"]))
+    await started.wait()
+    await cache.invalidate_tags("book:1")
+    release.set()
+    assert await load == "old"
+
+    async def fresh_loader():
+        return "new"
+    assert await cache.get_or_load("key", fresh_loader, ["book:1"]) == "new"
+    assert cache.stats()["stale_loads"] == 1
+
+
+async def test_loader_errors_propagate_and_are_not_cached():
+    """Test that exceptions reach every waiter and the next call retries."""
+    cache = ReadThroughCache(TTLCache(maxsize=10, ttl=30))
+
+    async def failing():
+        await asyncio.sleep(0)
+        raise LookupError("missing")
+
+    results = await asyncio.gather(*(cache.get_or_load("k", failing) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, LookupError) for r in results)
+    assert "k" not in cache.local
+
+
+async def test_redis_tier_shared_and_invalidated_by_tag(fake_redis, monkeypatch):
+    """Test that a second process hits Redis and tag invalidation clears it."""
+    def tiered():
+        tier = RedisTier("redis://unused", "cache", ttl=300)
+        monkeypatch.setattr(tier, "_client", lambda: fake_redis)
+        return ReadThroughCache(TTLCache(maxsize=10, ttl=30), tier)
+
+    first, second = tiered(), tiered()
+
+    async def loader():
+        return {"id": 1}
+    await first.get_or_load("book:1", loader, ["book:1"])
+    await first.get_or_load("book:2", loader, ["book:2"])
+
+    async def unexpected():
+        raise AssertionError("should be served from Redis")
+    assert await second.get_or_load("book:1", unexpected, ["book:1"]) == {"id": 1}
+
+    await second.invalidate_tags("book:1")
+    assert set(fake_redis.data) == {"cache:book:2", "cache:gen:book:1"}
+    assert "book:1" not in second.local
+
+
+async def test_load_overlapping_invalidation_in_other_process_skips_redis(fake_redis, monkeypatch):
+    """Test that another process's invalidation during a load keeps the stale value out of Redis."""
+    def tiered():
+        tier = RedisTier("redis://unused", "cache", ttl=300)
+        monkeypatch.setattr(tier, "_client", lambda: fake_redis)
+        return ReadThroughCache(TTLCache(maxsize=10, ttl=30), tier)
+
+    loading, other = tiered(), tiered()
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_loader():
+        started.set()
+        await release.wait()
+        return "old"
+
+    load = asyncio.create_task(loading.get_or_load("key", slow_loader, ["book:1"]))
+    await started.wait()
+    await other.invalidate_tags("book:1")
+    release.set()
+    assert await load == "old"
+    assert "cache:key" not in fake_redis.data
+    assert "key" not in loading.local
+    assert loading.stats()["stale_loads"] == 1
+
+    async def fresh_loader():
+        return "new"
+    assert await loading.get_or_load("key", fresh_loader, ["book:1"]) == "new"
+    assert fake_redis.data["cache:key"] == '"new"'
+
+
+async def test_unreachable_redis_falls_back_to_loader():
+    """Test that a dead Redis is skipped after the first error."""
+    tier = RedisTier("redis://127.0.0.1:1/0", "cache", ttl=300, retry_after=60)
+    cache = ReadThroughCache(TTLCache(maxsize=10, ttl=30), tier)
+
+    async def loader():
+        return "value"
+    assert await cache.get_or_load("a", loader) == "value"
+    assert await cache.get_or_load("b", loader) == "value"
+    assert tier.counters["errors"] == 1
+
+
+def test_backend_none_disables_cache(monkeypatch):
+    """Test that CACHE_BACKEND=none turns the decorator into a pass-through."""
+    monkeypatch.setattr("app.core.config.settings.CACHE_BACKEND", "none")
+    set_cache(None)
+    assert get_cache() is None
@@ -0,0 +1,76 @@
+from unittest.mock import patch
+
+from celery.signals import task_postrun, task_prerun, task_retry
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from app.core.metrics import PoolCollector
+from app.models.base import _time_checkouts
+from app.models.book import Book
+from app.tasks.email_tasks import send_emails
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_requests_recorded_per_route_template(api_client, api_db):
+    """Test that latency and query counts are labelled by route, not by path."""
+    book = Book(title="Dune", author="Frank Herbert", total_copies=1, available_copies=1)
+    api_db.add(book)
+    api_db.commit()
+    route = {"method": "GET", "route": "/api/v1/books/{book_id}"}
+    before = _sample("http_request_duration_seconds_count", status="2xx", **route)
+    queries_before = _sample("http_request_db_queries_sum", **route)
+    unmatched_before = _sample("http_request_duration_seconds_count", method="GET", route="unmatched",
+                               status="4xx")
+
+    assert api_client.get(f"/api/v1/books/{book.id}").status_code == 200
+    assert api_client.get(f"/api/v1/books/{book.id}").status_code == 200
+    assert api_client.get("/no/such/page/123").status_code == 404
+
+    assert _sample("http_request_duration_seconds_count", status="2xx", **route) == before + 2
+    assert _sample("http_request_db_queries_sum", **route) > queries_before
+    assert _sample("http_request_duration_seconds_count", method="GET", route="unmatched",
+                   status="4xx") == unmatched_before + 1
+    assert _sample("http_requests_in_progress", method="GET") == 0
+
+    response = api_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/v1/books/{book_id}"' in response.text
+    assert f"/api/v1/books/{book.id}\"" not in response.text
+
+
+def test_pool_collector_reports_saturation():
+    stats = {"sync": {"initialized": False},
+             "async": {"initialized": True, "size": 10, "checkedout": 15, "overflow": 5, "capacity": 30}}
+    with patch("app.models.base.get_pool_stats", return_value=stats):
+        families = {family.name: family for family in PoolCollector().collect()}
+    assert [(sample.labels, sample.value) for sample in families["db_pool_saturation"].samples] == [
+        ({"engine": "async"}, 0.5)]
+    assert families["db_pool_checked_out"].samples[0].value == 15
+
+
+def test_pool_checkouts_are_timed():
+    engine = create_engine("sqlite://")
+    _time_checkouts(engine.pool, "sync")
+    before = _sample("db_pool_checkout_seconds_count", engine="sync")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert _sample("db_pool_checkout_seconds_count", engine="sync") == before + 1
+    engine.dispose()
+
+
+def test_celery_task_signals_feed_metrics():
+    task = send_emails
+    labels = {"task": task.name, "state": "SUCCESS"}
+    before = _sample("celery_task_duration_seconds_count", **labels)
+    retries = _sample("celery_task_retries_total", task=task.name)
+
+    task_prerun.send(sender=task, task_id="abc", task=task)
+    task_postrun.send(sender=task, task_id="abc", task=task, state="SUCCESS")
+    task_retry.send(sender=task, request=None, reason="SMTP down")
+
+    assert _sample("celery_task_duration_seconds_count", **labels) == before + 1
+    assert _sample("celery_task_retries_total", task=task.name) == retries + 1
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import passwords
+from app.core.passwords import PasswordHasher, get_password_context
+from app.models.member import Member
+from app.services.auth_service import authenticate_member
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    hasher = PasswordHasher(workers=2, max_queue=4, rounds=5)
+    monkeypatch.setattr(passwords, "password_hasher", hasher)
+    yield hasher
+    hasher.shutdown()
+
+
+async def test_hashing_does_not_block_event_loop(hasher):
+    """Test that the loop keeps running while bcrypt works in the pool."""
+    hasher.rounds = 10
+    ticks = 0
+
+    async def heartbeat():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    beat = asyncio.create_task(heartbeat())
+    hashed = await passwords.hash_password("secret")
+    beat.cancel()
+    assert hashed.startswith("$2b$10$")
+    assert ticks > 5
+    assert (await passwords.verify_password("secret", hashed)) == (True, None)
+
+
+async def test_queue_limit_rejects_excess_requests(monkeypatch):
+    """Test that requests beyond workers + max_queue get a 503."""
+    hasher = PasswordHasher(workers=1, max_queue=1, rounds=8)
+    monkeypatch.setattr(passwords, "password_hasher", hasher)
+    try:
+        results = await asyncio.gather(*(passwords.hash_password("secret") for _ in range(3)),
+                                       return_exceptions=True)
+    finally:
+        hasher.shutdown()
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 1 and rejected[0].status_code == 503
+    stats = hasher.stats()
+    assert (stats["completed"], stats["rejected"], stats["queued"], stats["running"]) == (2, 1, 0, 0)
+
+
+async def test_login_rehashes_outdated_cost(async_db_session, hasher):
+    """Test that a hash at an old cost factor is upgraded on successful login."""
+    old_hash = get_password_context(4).hash("secret")
+    member = Member(email="reader@example.com", name="Reader", hashed_password=old_hash)
+    async_db_session.add(member)
+    await async_db_session.commit()
+
+    assert await authenticate_member(async_db_session, member.email, "wrong") is None
+    assert member.hashed_password == old_hash
+
+    assert await authenticate_member(async_db_session, member.email, "secret") is member
+    await async_db_session.refresh(member)
+    assert member.hashed_password.startswith("$2b$05$")
+    assert hasher.stats()["rehashed"] == 1
+
+    await authenticate_member(async_db_session, member.email, "secret")
+    assert hasher.stats()["rehashed"] == 1
@@ -0,0 +1,83 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.pool import StaticPool
+
+from app.core.metrics import MetricsMiddleware
+from app.core.queries import RepeatedQueryError, statement_shape, track_queries
+from app.models.book import Book
+
+
+def test_statement_shape_folds_literals_and_in_lists():
+    assert statement_shape("SELECT *\n  FROM books WHERE id IN (?, ?, ?)") == \
+        statement_shape("SELECT * FROM books WHERE id IN (?, ?)") == \
+        "SELECT * FROM books WHERE id IN (?, ...)"
+    assert statement_shape("SELECT * FROM borrows WHERE id = $1 LIMIT 20") == \
+        "SELECT * FROM borrows WHERE id = $1 LIMIT N"
+    assert statement_shape("SELECT * FROM t2 WHERE x IN (%(a)s, %(b)s)") == "SELECT * FROM t2 WHERE x IN (?, ...)"
+
+
+async def _load_one_by_one(db, ids):
+    return [await db.get(Book, book_id) for book_id in ids]
+
+
+async def test_repeated_statement_raises(async_db_session):
+    db = async_db_session
+    db.add_all([Book(title=f"Book {i}", author="Author", total_copies=1, available_copies=1) for i in range(5)])
+    await db.commit()
+    db.expunge_all()
+    with pytest.raises(RepeatedQueryError, match="more than 3 runs"):
+        with track_queries("loop", threshold=3, action="raise"):
+            await _load_one_by_one(db, range(1, 6))
+
+    db.expunge_all()
+    with track_queries("batched", threshold=3, action="raise") as stats:
+        books = (await db.execute(select(Book).where(Book.id.in_(range(1, 6))))).scalars().all()
+    assert len(books) == 5 and stats.count == 1 and stats.seconds > 0
+
+
+async def test_repeated_statement_logged_once(async_db_session, caplog):
+    db = async_db_session
+    db.add_all([Book(title=f"Book {i}", author="Author", total_copies=1, available_copies=1) for i in range(6)])
+    await db.commit()
+    db.expunge_all()
+    with caplog.at_level(logging.WARNING, logger="app.core.queries"), \
+            track_queries("GET /books", threshold=2, action="log") as stats:
+        await _load_one_by_one(db, range(1, 7))
+    assert stats.count == 6
+    assert [record.message.split(":")[0] for record in caplog.records] == ["Repeated query in GET /books"]
+    assert stats.most_repeated(1)[0][1] == 6
+
+
+def test_nested_blocks_report_to_enclosing_ones():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.connect() as conn, track_queries("outer", threshold=0) as outer:
+        conn.execute(text("SELECT 1"))
+        with track_queries("inner", threshold=0) as inner:
+            conn.execute(text("SELECT 2"))
+    assert (outer.count, inner.count) == (2, 1)
+    with pytest.raises(ValueError):
+        with track_queries(action="ignore"):
+            pass
+    engine.dispose()
+
+
+def test_debug_headers_report_queries_and_db_time():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    debug_app = FastAPI()
+    debug_app.add_middleware(MetricsMiddleware, debug_headers=True)
+
+    @debug_app.get("/twice")
+    def twice():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {}
+
+    response = TestClient(debug_app).get("/twice")
+    assert response.headers["x-db-query-count"] == "2"
+    assert response.headers["server-timing"].startswith("db;dur=")
+    engine.dispose()
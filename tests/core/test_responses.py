@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List
+from unittest.mock import patch
+
+from app.core import responses
+from app.core.responses import FastJSONResponse, dump_json, get_adapter, json_response
+from app.schemas.book import BookResponse, BookSearchResponse
+from app.schemas.borrow import BorrowResponse
+
+
+def _book(i: int = 1):
+    return SimpleNamespace(id=i, title=f"Book {i}", author="Author", total_copies=2, available_copies=1)
+
+
+def test_adapters_are_built_once():
+    """Test that one TypeAdapter is shared per response type."""
+    assert get_adapter(List[BookResponse]) is get_adapter(List[BookResponse])
+
+
+def test_dump_json_validates_orm_objects_once():
+    """Test that nested ORM-style objects encode like the model round trip."""
+    books = [_book(i) for i in range(3)]
+    body = dump_json(BookSearchResponse, {"items": books, "next_offset": 3})
+    expected = BookSearchResponse(items=[BookResponse.model_validate(b) for b in books], next_offset=3)
+    assert json.loads(body) == expected.model_dump(mode="json")
+
+    borrow = SimpleNamespace(id=1, book_id=2, member_id=3, borrow_date=datetime(2024, 5, 1, 12, 30),
+                             return_date=None, notification_sent=False)
+    assert json.loads(dump_json(BorrowResponse, borrow))["borrow_date"] == "2024-05-01T12:30:00"
+
+
+def test_json_response_keeps_status_and_headers():
+    response = json_response(BookResponse, _book(), status_code=201, headers={"X-Next-Cursor": "abc"})
+    assert response.status_code == 201
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["x-next-cursor"] == "abc"
+    assert json.loads(response.body)["available_copies"] == 1
+
+
+def test_fast_json_response_without_orjson():
+    """Test that pydantic-core encodes the same content when orjson is absent."""
+    content = {"when": datetime(2024, 1, 2, 3, 4, 5), "count": 2}
+    with_orjson = FastJSONResponse(content).body
+    with patch.object(responses, "orjson", None):
+        without = FastJSONResponse(content).body
+    assert json.loads(with_orjson) == json.loads(without) == {"when": "2024-01-02T03:04:05", "count": 2}
@@ -0,0 +1,106 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.core import security
+from app.core.cache import RedisTier, TTLCache
+from app.models.member import Member
+from app.services.auth_service import create_access_token
+
+
+@pytest.fixture(autouse=True)
+def clean_member_cache():
+    security.member_cache.clear()
+    yield
+    security.member_cache.clear()
+
+
+@pytest.fixture
+async def member(async_db_session):
+    member = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    async_db_session.add(member)
+    await async_db_session.commit()
+    return member
+
+
+def _count_statements(session) -> list:
+    statements = []
+    event.listen(session.bind.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+async def test_repeat_requests_skip_database(async_db_session, member):
+    """Test that a cached member is resolved without any SQL."""
+    token = create_access_token({"sub": member.email})
+    first = await security.get_current_user(token, async_db_session)
+    async_db_session.expunge_all()
+
+    statements = _count_statements(async_db_session)
+    second = await security.get_current_user(token, async_db_session)
+    assert statements == []
+    assert (second.id, second.email, second.name) == (first.id, first.email, first.name)
+    assert second in async_db_session
+    stats = security.get_member_cache_stats()["local"]
+    assert stats["hits"] >= 1 and stats["misses"] >= 1
+
+
+async def test_member_update_invalidates_cache(async_db_session, member):
+    """Test that changing a member drops its cached entry, old email included."""
+    token = create_access_token({"sub": member.email})
+    await security.get_current_user(token, async_db_session)
+    assert security.member_cache.get("reader@example.com") is not None
+
+    member.email = "renamed@example.com"
+    await async_db_session.commit()
+    assert security.member_cache.get("reader@example.com") is None
+    with pytest.raises(HTTPException) as exc:
+        await security.get_current_user(token, async_db_session)
+    assert exc.value.status_code == 401
+
+
+async def test_unknown_subject_is_not_cached(async_db_session):
+    """Test that a token for a missing member is rejected every time."""
+    token = create_access_token({"sub": "ghost@example.com"})
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            await security.get_current_user(token, async_db_session)
+    assert len(security.member_cache) == 0
+
+
+async def test_redis_tier_shared_between_processes(async_db_session, member, monkeypatch, fake_redis):
+    """Test that a cold local cache is filled from the shared Redis tier."""
+    tier = RedisTier("redis://unused", "auth:member", ttl=60)
+    fake = fake_redis
+    monkeypatch.setattr(tier, "_client", lambda: fake)
+    monkeypatch.setattr(security, "_member_redis", tier)
+    token = create_access_token({"sub": member.email})
+    await security.get_current_user(token, async_db_session)
+    assert "auth:member:reader@example.com" in fake.data
+    assert "hashed" not in fake.data["auth:member:reader@example.com"]
+
+    security.member_cache.clear()
+    async_db_session.expunge_all()
+    statements = _count_statements(async_db_session)
+    resolved = await security.get_current_user(token, async_db_session)
+    assert statements == [] and resolved.id == member.id
+    assert tier.counters["hits"] == 1
+
+    await security.invalidate_member(member.email)
+    assert fake.data == {}
+
+
+def test_ttl_cache_evicts_and_expires(monkeypatch):
+    """Test LRU eviction at maxsize and expiry after ttl."""
+    clock = [100.0]
+    monkeypatch.setattr("app.core.cache.time.monotonic", lambda: clock[0])
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    clock[0] += 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["evictions"], stats["expirations"], stats["hits"]) == (1, 1, 1)
@@ -24,3 +24,26 @@ def test_v1_create_book(client: TestClient):
     assert response.status_code == 200
     assert response.json()["title"] == "1984"
     assert response.json()["available_copies"] == 5
+
+
+def test_v1_import_books_admin_only(api_client: TestClient, api_db):
+    """Test the streamed catalog import and its admin check."""
+    from app.models.book import Book
+    from app.models.member import Member
+    from app.services.auth_service import create_access_token
+    api_db.add_all([Member(email="admin@example.com", name="Admin", hashed_password="x", is_admin=True),
+                    Member(email="reader@example.com", name="Reader", hashed_password="x")])
+    api_db.commit()
+    body = b"title,author,total_copies,isbn\nDune,Frank Herbert,2,0441013597\nUbik,Philip K. Dick,none,\n"
+    url = "/api/v1/books/import?format=csv"
+
+    def auth(email):
+        return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+    assert api_client.post(url, content=body, headers=auth("reader@example.com")).status_code == 403
+    response = api_client.post(url, content=body, headers=auth("admin@example.com"))
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["written"], report["rejected"]) == (1, 1)
+    assert report["rejects"][0]["position"] == 3
+    assert api_db.query(Book).filter_by(isbn="0441013597").one().available_copies == 2
@@ -1,10 +1,14 @@
+import json
 import pytest
+from datetime import datetime
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from app.main import app
 from app.models.base import get_db
 from app.models.book import Book
+from app.models.borrow import Borrow
 from app.models.member import Member
+from app.models.outbox import OutboxMessage
 from app.services.auth_service import create_access_token
 from unittest.mock import patch
 
@@ -70,3 +74,104 @@ async def test_borrow_book_unauthorized(client: TestClient, db_session: Session)
     )
     assert response.status_code == 401
     assert response.json()["detail"] == "Could not validate credentials"
+
+
+def _outbox(db: Session) -> list[tuple[str, list]]:
+    """(task, payload) of the pending outbox rows, oldest first."""
+    db.expire_all()
+    return [(row.task, row.payload) for row in db.query(OutboxMessage).order_by(OutboxMessage.id)]
+
+
+def test_batch_borrow_and_return(api_client: TestClient, api_db: Session):
+    """Test the v1 batch borrow and batch return endpoints."""
+    member = Member(email="desk@example.com", name="Desk", hashed_password="hashed")
+    book = Book(title="1984", author="George Orwell", total_copies=2, available_copies=2)
+    api_db.add_all([member, book])
+    api_db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': member.email})}"}
+
+    response = api_client.post(
+        "/api/v1/borrow/batch",
+        json={"items": [{"book_id": book.id, "member_id": member.id}] * 3},
+        headers=headers
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+    assert [r["status_code"] for r in body["results"]] == [200, 200, 400]
+    borrow_ids = [r["borrow"]["id"] for r in body["results"] if r["ok"]]
+    assert _outbox(api_db)[-1] == ("send_borrow_emails", [borrow_ids])
+
+    response = api_client.post(
+        "/api/v1/borrow/return/batch",
+        json={"items": [{"borrow_id": borrow_id} for borrow_id in borrow_ids + [999]]},
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert [r["status_code"] for r in response.json()["results"]] == [200, 200, 404]
+    assert _outbox(api_db)[-1] == ("send_return_emails", [borrow_ids])
+    api_db.refresh(book)
+    assert book.available_copies == 2
+
+
+def test_member_history_pages_and_stream(api_client: TestClient, api_db: Session):
+    """Test keyset pages, the status filter and NDJSON streaming."""
+    member = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    book = Book(title="1984", author="George Orwell", total_copies=5, available_copies=5)
+    api_db.add_all([member, book])
+    api_db.commit()
+    api_db.add_all([Borrow(book_id=book.id, member_id=member.id,
+                           return_date=datetime.utcnow() if i % 2 else None) for i in range(5)])
+    api_db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': member.email})}"}
+    url = f"/api/v1/borrow/member/{member.id}"
+
+    first = api_client.get(url, params={"limit": 3}, headers=headers)
+    assert first.status_code == 200
+    assert len(first.json()) == 3
+    second = api_client.get(url, params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]},
+                            headers=headers)
+    assert len(second.json()) == 2
+    assert "X-Next-Cursor" not in second.headers
+    paged = [b["id"] for b in first.json() + second.json()]
+
+    opened = api_client.get(url, params={"status": "open"}, headers=headers)
+    assert all(b["return_date"] is None for b in opened.json())
+    assert len(opened.json()) == 3
+
+    streamed = api_client.get(url, params={"stream": True}, headers=headers)
+    assert streamed.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in streamed.text.splitlines()] == paged
+
+
+def test_member_history_conditional_get(api_client: TestClient, api_db: Session):
+    """Test ETag / Last-Modified validators and 304s answered by the version probe."""
+    member = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    book = Book(title="1984", author="George Orwell", total_copies=5, available_copies=5)
+    api_db.add_all([member, book])
+    api_db.commit()
+    api_db.add(Borrow(book_id=book.id, member_id=member.id))
+    api_db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': member.email})}"}
+    url = f"/api/v1/borrow/member/{member.id}"
+
+    first = api_client.get(url, headers=headers)
+    etag, last_modified = first.headers["ETag"], first.headers["Last-Modified"]
+    assert etag.startswith('"') and last_modified.endswith("GMT")
+
+    with patch("app.api.v1.endpoints.borrow.get_member_borrows") as load_page:
+        cached = api_client.get(url, headers={**headers, "If-None-Match": etag})
+        by_date = api_client.get(url, headers={**headers, "If-Modified-Since": last_modified})
+    load_page.assert_not_called()
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["ETag"] == etag
+    assert by_date.status_code == 304
+
+    other_page = api_client.get(url, params={"status": "open"}, headers={**headers, "If-None-Match": etag})
+    assert other_page.status_code == 200
+
+    api_client.post("/api/v1/borrow/", json={"book_id": book.id, "member_id": member.id}, headers=headers)
+    changed = api_client.get(url, headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert len(changed.json()) == 2
+    assert changed.headers["ETag"] != etag
@@ -0,0 +1,35 @@
+import gzip
+
+from fastapi.testclient import TestClient
+
+from app.models.book import Book
+from app.models.member import Member
+from app.services.auth_service import create_access_token
+
+
+def _auth(email: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+
+def test_v1_export_streams_for_admins_only(api_client: TestClient, api_db):
+    """Test the books export, its filters and its admin check."""
+    api_db.add_all([Member(email="admin@example.com", name="Admin", hashed_password="x", is_admin=True),
+                    Member(email="reader@example.com", name="Reader", hashed_password="x"),
+                    Book(title="Dune", author="Frank Herbert", total_copies=1, available_copies=1)])
+    api_db.commit()
+
+    assert api_client.get("/api/v1/export/books", headers=_auth("reader@example.com")).status_code == 403
+    response = api_client.get("/api/v1/export/books", params={"gzip": True}, headers=_auth("admin@example.com"))
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="books.csv.gz"'
+    lines = gzip.decompress(response.content).decode().splitlines()
+    assert lines[0].startswith("id,title,author,isbn") and "Dune" in lines[1]
+
+    members = api_client.get("/api/v2/export/members", params={"format": "ndjson"},
+                             headers=_auth("admin@example.com"))
+    assert members.headers["content-type"] == "application/x-ndjson"
+    assert b"hashed_password" not in members.content and members.content.count(b"\n") == 2
+
+    bad = api_client.get("/api/v1/export/books", params={"member_id": 1}, headers=_auth("admin@example.com"))
+    assert bad.status_code == 400
+    assert api_client.get("/api/v1/export/loans", headers=_auth("admin@example.com")).status_code == 422
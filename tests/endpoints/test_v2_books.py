@@ -23,3 +23,46 @@ async def test_v2_create_book(client: TestClient):
     assert response.status_code == 200
     assert response.json()["title"] == "1984"
     assert response.json()["available_copies"] == 5
+
+
+def test_v2_search_and_autocomplete(api_client: TestClient, api_db):
+    """Test the catalog search and autocomplete endpoints."""
+    from app.models.book import Book
+    api_db.add_all([
+        Book(title="Dune", author="Frank Herbert", total_copies=1, available_copies=0),
+        Book(title="Children of Dune", author="Frank Herbert", total_copies=1, available_copies=1),
+    ])
+    api_db.commit()
+
+    response = api_client.get("/api/v2/books/search", params={"q": "dune", "limit": 1})
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 1 and response.json()["next_offset"] == 1
+
+    response = api_client.get("/api/v2/books/search", params={"q": "herbert", "available": True})
+    assert [b["title"] for b in response.json()["items"]] == ["Children of Dune"]
+
+    response = api_client.get("/api/v1/books/autocomplete", params={"q": "chil"})
+    assert response.json() == [{"id": 2, "title": "Children of Dune", "author": "Frank Herbert"}]
+
+    assert api_client.get("/api/v2/books/search", params={"q": ""}).status_code == 422
+
+
+def test_v2_get_book_conditional(api_client: TestClient, api_db):
+    """Test that a book carries validators and unchanged books answer 304."""
+    from app.models.book import Book
+    book = Book(title="Dune", author="Frank Herbert", total_copies=2, available_copies=2)
+    api_db.add(book)
+    api_db.commit()
+    url = f"/api/v2/books/{book.id}"
+
+    response = api_client.get(url)
+    assert response.status_code == 200 and response.json()["title"] == "Dune"
+    etag = response.headers["ETag"]
+    assert api_client.get(url, headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+    assert api_client.get(url, headers={"If-Modified-Since": response.headers["Last-Modified"]}).status_code == 304
+
+    book.available_copies = 1
+    api_db.commit()
+    refreshed = api_client.get(url, headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200 and refreshed.json()["available_copies"] == 1
+    assert api_client.get("/api/v2/books/999").status_code == 404
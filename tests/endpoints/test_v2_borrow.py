@@ -5,6 +5,7 @@ from app.main import app
 from app.models.base import get_db
 from app.models.book import Book
 from app.models.member import Member
+from app.models.outbox import OutboxMessage
 from app.services.auth_service import create_access_token
 from unittest.mock import patch
 
@@ -72,3 +73,81 @@ def test_borrow_book_unauthorized(client: TestClient, db_session: Session):
     )
     assert response.status_code == 401
     assert response.json()["detail"] == "Could not validate credentials"
+
+
+def _outbox(db: Session) -> list[tuple[str, list]]:
+    """(task, payload) of the pending outbox rows, oldest first."""
+    db.expire_all()
+    return [(row.task, row.payload) for row in db.query(OutboxMessage).order_by(OutboxMessage.id)]
+
+
+def test_batch_borrow_and_return(api_client: TestClient, api_db: Session):
+    """Test the v2 batch borrow and batch return endpoints."""
+    member = Member(email="desk@example.com", name="Desk", hashed_password="hashed")
+    book = Book(title="1984", author="George Orwell", total_copies=2, available_copies=2)
+    api_db.add_all([member, book])
+    api_db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': member.email})}"}
+
+    response = api_client.post(
+        "/api/v2/borrow/batch",
+        json={"items": [{"book_id": book.id, "member_id": member.id}] * 3},
+        headers=headers
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+    assert [r["status_code"] for r in body["results"]] == [200, 200, 400]
+    borrow_ids = [r["borrow"]["id"] for r in body["results"] if r["ok"]]
+    assert _outbox(api_db)[-1] == ("send_borrow_emails", [borrow_ids])
+
+    response = api_client.post(
+        "/api/v2/borrow/return/batch",
+        json={"items": [{"borrow_id": borrow_id} for borrow_id in borrow_ids + [999]]},
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert [r["status_code"] for r in response.json()["results"]] == [200, 200, 404]
+    assert _outbox(api_db)[-1] == ("send_return_emails", [borrow_ids])
+    api_db.refresh(book)
+    assert book.available_copies == 2
+
+
+def test_v2_holds_use_current_member(api_client: TestClient, api_db: Session):
+    """Test that v2 places, reads and cancels holds for the authenticated member."""
+    member = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    book = Book(title="Dune", author="Frank Herbert", total_copies=1, available_copies=0)
+    api_db.add_all([member, book])
+    api_db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': member.email})}"}
+
+    response = api_client.post("/api/v2/borrow/holds", json={"book_id": book.id, "member_id": 999},
+                               headers=headers)
+    assert response.status_code == 200
+    hold = response.json()
+    assert (hold["member_id"], hold["status"], hold["position"]) == (member.id, "waiting", 1)
+    assert api_client.get(f"/api/v2/borrow/holds/{hold['id']}", headers=headers).json()["position"] == 1
+    cancelled = api_client.delete(f"/api/v2/borrow/holds/{hold['id']}", headers=headers)
+    assert cancelled.json()["status"] == "cancelled"
+    assert api_client.get("/api/v2/borrow/holds/999", headers=headers).status_code == 404
+
+
+def test_v2_holds_are_private_to_their_member(api_client: TestClient, api_db: Session):
+    """Test that a member can neither read nor cancel another member's hold."""
+    owner = Member(email="owner@example.com", name="Owner", hashed_password="hashed")
+    other = Member(email="other@example.com", name="Other", hashed_password="hashed")
+    admin = Member(email="admin@example.com", name="Admin", hashed_password="hashed", is_admin=True)
+    book = Book(title="Dune", author="Frank Herbert", total_copies=1, available_copies=0)
+    api_db.add_all([owner, other, admin, book])
+    api_db.commit()
+    headers = {member.email: {"Authorization": f"Bearer {create_access_token({'sub': member.email})}"}
+               for member in (owner, other, admin)}
+    hold = api_client.post("/api/v2/borrow/holds", json={"book_id": book.id, "member_id": owner.id},
+                           headers=headers[owner.email]).json()
+
+    assert api_client.get(f"/api/v2/borrow/holds/{hold['id']}", headers=headers[other.email]).status_code == 404
+    assert api_client.delete(f"/api/v2/borrow/holds/{hold['id']}", headers=headers[other.email]).status_code == 404
+    assert api_client.get(f"/api/v2/borrow/holds/{hold['id']}",
+                          headers=headers[owner.email]).json()["status"] == "waiting"
+    cancelled = api_client.delete(f"/api/v2/borrow/holds/{hold['id']}", headers=headers[admin.email])
+    assert cancelled.json()["status"] == "cancelled"
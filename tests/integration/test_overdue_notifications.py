@@ -1,17 +1,15 @@
-import pytest
 from sqlalchemy.orm import Session
 from app.models.book import Book
 from app.models.member import Member
 from app.models.borrow import Borrow
-from app.tasks.email_tasks import check_overdue_books
+from app.models.outbox import OutboxMessage
+from app.tasks.email_tasks import check_overdue_books, send_overdue_emails
 from datetime import datetime, timedelta
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 
-@pytest.mark.asyncio
-async def test_overdue_notification(db_session: Session, mock_smtp):
-    """Test the overdue notification Celery task."""
-    # Create an overdue borrow
+def test_overdue_notification(task_db: Session):
+    """Test that an overdue borrow gets one reminder through the outbox."""
     book = Book(title="1984", author="George Orwell",
                 total_copies=5, available_copies=4)
     member = Member(email="test@example.com", name="Test User",
@@ -22,18 +20,67 @@ async def test_overdue_notification(db_session: Session, mock_smtp):
         created_at=datetime.now() - timedelta(days=15),  # Overdue by 1 day
         notification_sent=False
     )
-    db_session.add_all([book, member, borrow])
-    db_session.commit()
-
-    # Run the overdue notification task
-    with patch("app.tasks.email_tasks.send_email") as mock_email:
-        check_overdue_books()
-        mock_email.assert_called_once()
-        call_args = mock_email.call_args[0]
-        assert call_args[0] == "test@example.com"
-        assert "Overdue Book Reminder" in call_args[1]
-        assert "1984" in call_args[2]
-
-    # Verify notification_sent was updated
-    db_session.refresh(borrow)
-    assert borrow.notification_sent is True
+    task_db.add_all([book, member, borrow])
+    task_db.commit()
+
+    assert check_overdue_books.apply().get()["notified"] == 1
+    task_db.expire_all()
+    reminder = task_db.query(OutboxMessage).one()
+    assert (reminder.task, reminder.payload, reminder.member_id) == \
+        ("send_overdue_emails", [[borrow.id]], member.id)
+
+    # The dispatched task sends the reminder to the member
+    with patch("app.tasks.email_tasks._send_all", new_callable=AsyncMock) as send_all:
+        send_overdue_emails.apply(args=reminder.payload).get()
+    (to_email, subject, body), = send_all.call_args[0][0]
+    assert to_email == "test@example.com"
+    assert "Overdue Book Reminder" in subject
+    assert "1984" in body
+
+    # The reminder is recorded apart from notification_sent
+    assert borrow.overdue_notified_at is not None
+    assert borrow.notification_sent is False
+
+
+def _seed_overdue(session: Session, count: int, days_ago: int = 20, prefix: str = "late"):
+    book = Book(title="1984", author="George Orwell", total_copies=count, available_copies=0)
+    members = [Member(email=f"{prefix}{i}@example.com", name=f"Late {i}", hashed_password="hashed")
+               for i in range(count)]
+    session.add_all([book, *members])
+    session.flush()
+    borrows = [Borrow(book_id=book.id, member_id=m.id, notification_sent=False,
+                      created_at=datetime.now() - timedelta(days=days_ago, minutes=i))
+               for i, m in enumerate(members)]
+    session.add_all(borrows)
+    session.commit()
+    return borrows
+
+
+def test_overdue_scan_batches_chunks(task_db: Session):
+    """Test that the overdue scan joins, chunks and enqueues per chunk."""
+    _seed_overdue(task_db, 5)
+    recent = _seed_overdue(task_db, 1, days_ago=1, prefix="recent")[0]
+    returned = _seed_overdue(task_db, 1, prefix="returned")[0]
+    returned.return_date = datetime.now()
+    task_db.commit()
+
+    with patch("app.tasks.email_tasks.get_settings") as get_settings:
+        get_settings.return_value.OVERDUE_DAYS = 14
+        get_settings.return_value.OVERDUE_CHUNK_SIZE = 2
+        result = check_overdue_books.apply().get()
+
+    assert (result["scanned"], result["notified"], result["batches"]) == (5, 5, 3)
+    assert "elapsed_ms" in result
+    task_db.expire_all()
+    reminders = task_db.query(OutboxMessage).order_by(OutboxMessage.id).all()
+    assert [row.task for row in reminders] == ["send_overdue_emails"] * 5
+    assert len({row.member_id for row in reminders}) == 5
+
+    flags = {b.id: b.overdue_notified_at is not None for b in task_db.query(Borrow).all()}
+    assert flags[recent.id] is False and flags[returned.id] is False
+    assert sum(flags.values()) == 5
+    assert not any(b.notification_sent for b in task_db.query(Borrow).all())
+
+    result = check_overdue_books.apply().get()
+    assert result["notified"] == 0
+    assert task_db.query(OutboxMessage).count() == 5
@@ -0,0 +1,138 @@
+import pytest
+from pathlib import Path
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.models.base import Base, SCHEMA_REVISION, prepare_schema
+from app.models.book import is_search_index_object
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+@pytest.fixture
+def migrated_engine(tmp_path):
+    """SQLite database built by running the migrations to head."""
+    url = f"sqlite:///{tmp_path / 'library_db.sqlite'}"
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("sqlalchemy.url", url)
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+    engine = create_engine(url)
+    yield engine
+    engine.dispose()
+
+
+def _plan(engine, sql: str, **params) -> str:
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_migrations_match_models(migrated_engine):
+    """Test that upgrading to head yields the schema the models describe."""
+    with migrated_engine.connect() as conn:
+        context = MigrationContext.configure(conn, opts={
+            "include_name": lambda name, type_, parents: not is_search_index_object(name, type_)
+        })
+        diff = compare_metadata(context, Base.metadata)
+    assert diff == []
+
+
+def test_member_history_uses_index(migrated_engine):
+    """Test that keyset history pages are served from the composite index."""
+    plan = _plan(migrated_engine,
+                 "SELECT * FROM borrows WHERE member_id = :m "
+                 "ORDER BY created_at DESC, id DESC LIMIT 20", m=1)
+    assert "ix_borrows_member_created" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_open_borrows_per_member_use_partial_index(migrated_engine):
+    """Test that open borrows of a member hit the partial index."""
+    plan = _plan(migrated_engine,
+                 "SELECT id FROM borrows WHERE member_id = :m AND return_date IS NULL", m=1)
+    assert "ix_borrows_member_open" in plan
+
+
+def test_overdue_scan_uses_partial_index(migrated_engine):
+    """Test that the overdue scan walks open, not yet reminded borrows by date."""
+    plan = _plan(migrated_engine,
+                 "SELECT id, created_at, member_id FROM borrows "
+                 "WHERE return_date IS NULL AND overdue_notified_at IS NULL AND created_at < :cutoff "
+                 "ORDER BY created_at, id LIMIT 500", cutoff="2024-01-01")
+    assert "SEARCH borrows USING INDEX ix_borrows_overdue_pending" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_book_lookup_uses_index(migrated_engine):
+    """Test that per-book lookups do not scan the table."""
+    plan = _plan(migrated_engine, "SELECT id FROM borrows WHERE book_id = :b", b=1)
+    assert "ix_borrows_book_id" in plan
+
+
+def test_book_search_index_tracks_books(migrated_engine):
+    """Test that the migrated FTS index is kept in sync by its triggers."""
+    with migrated_engine.begin() as conn:
+        conn.execute(text("INSERT INTO books (title, author, total_copies, available_copies) "
+                          "VALUES ('Dune', 'Frank Herbert', 1, 1)"))
+        conn.execute(text("UPDATE books SET title = 'Dune Messiah' WHERE title = 'Dune'"))
+        hits = conn.execute(text("SELECT rowid FROM books_fts WHERE books_fts MATCH 'messiah'")).all()
+    assert len(hits) == 1
+    plan = _plan(migrated_engine, "SELECT rowid FROM books_fts WHERE books_fts MATCH 'dune'")
+    assert "VIRTUAL TABLE INDEX" in plan
+
+
+def test_history_version_probe_is_index_only(migrated_engine):
+    """Test that the ETag probe never reads borrow rows."""
+    plan = _plan(migrated_engine,
+                 "SELECT count(*), max(updated_at) FROM borrows WHERE member_id = :m", m=1)
+    assert "COVERING INDEX ix_borrows_member_created" in plan
+
+
+def test_hold_queue_is_index_only(migrated_engine):
+    """Test that positions and the next hold in line never read hold rows."""
+    position = _plan(migrated_engine,
+                     "SELECT count(*) FROM holds WHERE book_id = :b AND status = 'waiting' AND id < :h",
+                     b=1, h=10)
+    assert "COVERING INDEX ix_holds_queue" in position
+    head = _plan(migrated_engine,
+                 "SELECT id FROM holds WHERE book_id = :b AND status = 'waiting' ORDER BY id LIMIT 1", b=1)
+    assert "COVERING INDEX ix_holds_queue" in head
+    assert "TEMP B-TREE" not in head
+
+
+def test_copy_claim_and_count_are_index_only(migrated_engine):
+    """Test that claiming a free copy and counting them never read copy rows."""
+    claim = _plan(migrated_engine,
+                  "SELECT id FROM book_copies WHERE book_id = :b AND status = 'available' ORDER BY id LIMIT 1", b=1)
+    assert "COVERING INDEX ix_book_copies_free" in claim
+    assert "TEMP B-TREE" not in claim
+    count = _plan(migrated_engine,
+                  "SELECT count(id) FROM book_copies WHERE book_id = :b AND status = 'available'", b=1)
+    assert "COVERING INDEX ix_book_copies_free" in count
+
+
+def test_schema_revision_is_migration_head():
+    """Test that the revision checked at startup is the newest migration."""
+    config = Config(str(ALEMBIC_INI))
+    assert ScriptDirectory.from_config(config).get_current_head() == SCHEMA_REVISION
+
+
+async def test_prepare_schema_checks_revision(migrated_engine, tmp_path):
+    """Test that startup accepts a migrated database and refuses an empty one."""
+    engine = create_async_engine(migrated_engine.url.set(drivername="sqlite+aiosqlite"))
+    empty = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'empty.sqlite'}")
+    try:
+        assert await prepare_schema(engine, "check") == SCHEMA_REVISION
+        with pytest.raises(RuntimeError, match="alembic upgrade head"):
+            await prepare_schema(empty, "check")
+        assert await prepare_schema(empty, "create") is None
+        with pytest.raises(ValueError):
+            await prepare_schema(empty, "migrate")
+    finally:
+        await engine.dispose()
+        await empty.dispose()
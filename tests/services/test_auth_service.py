@@ -1,5 +1,5 @@
 import pytest
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.auth_service import create_access_token, authenticate_member, login_member
 from app.models.member import Member
 from app.schemas.auth import LoginRequest, TokenResponse
@@ -29,67 +29,67 @@ async def test_create_access_token():
 
 
 @pytest.mark.asyncio
-async def test_authenticate_member_success(db_session: Session, set_test_db):
+async def test_authenticate_member_success(async_db_session: AsyncSession, set_test_db):
     """Test successful member authentication."""
     unique_email = f"auth_success_{int(datetime.utcnow().timestamp())}@example.com"
     member = Member(email=unique_email, name="Test User")
     member.set_password("testpassword")
-    db_session.add(member)
-    db_session.commit()
-    authenticated_member = await authenticate_member(db_session, unique_email, "testpassword")
+    async_db_session.add(member)
+    await async_db_session.commit()
+    authenticated_member = await authenticate_member(async_db_session, unique_email, "testpassword")
     assert authenticated_member.email == unique_email
-    db_session.rollback()
+    await async_db_session.rollback()
 
 
 @pytest.mark.asyncio
-async def test_authenticate_member_invalid(db_session: Session, set_test_db):
+async def test_authenticate_member_invalid(async_db_session: AsyncSession, set_test_db):
     """Test authentication with invalid credentials."""
     unique_email = f"auth_invalid_{int(datetime.utcnow().timestamp())}@example.com"
     member = Member(email=unique_email, name="Test User")
     member.set_password("testpassword")
-    db_session.add(member)
-    db_session.commit()
-    authenticated_member = await authenticate_member(db_session, unique_email, "wrongpassword")
+    async_db_session.add(member)
+    await async_db_session.commit()
+    authenticated_member = await authenticate_member(async_db_session, unique_email, "wrongpassword")
     assert authenticated_member is None
-    authenticated_member = await authenticate_member(db_session, "nonexistent@example.com", "testpassword")
+    authenticated_member = await authenticate_member(async_db_session, "nonexistent@example.com", "testpassword")
     assert authenticated_member is None
-    db_session.rollback()
+    await async_db_session.rollback()
 
 
 @pytest.mark.asyncio
-async def test_login_member(db_session: Session, set_test_db):
+async def test_login_member(async_db_session: AsyncSession, set_test_db):
     """Test member login with valid credentials."""
     unique_email = f"login_member_{int(datetime.utcnow().timestamp())}@example.com"
     member = Member(email=unique_email, name="Test User")
     member.set_password("testpassword")
-    db_session.add(member)
-    db_session.commit()
+    async_db_session.add(member)
+    await async_db_session.commit()
     login_request = LoginRequest(email=unique_email, password="testpassword")
-    token_response = await login_member(login_request, db_session)
+    token_response = await login_member(login_request, async_db_session)
     assert isinstance(token_response, TokenResponse)
     assert token_response.token_type == "bearer"
     assert token_response.access_token
     decoded = jwt.decode(token_response.access_token, settings.JWT_SECRET_KEY, algorithms=["HS256"])
     assert decoded["sub"] == unique_email
-    db_session.rollback()
+    await async_db_session.rollback()
 
 
 @pytest.mark.asyncio
-async def test_login_member_invalid(db_session: Session, set_test_db):
+async def test_login_member_invalid(async_db_session: AsyncSession, set_test_db):
     """Test member login with invalid credentials."""
     unique_email = f"login_invalid_{int(datetime.utcnow().timestamp())}@example.com"
     member = Member(email=unique_email, name="Test User")
     member.set_password("testpassword")
-    db_session.add(member)
-    db_session.commit()
+    async_db_session.add(member)
+    await async_db_session.commit()
     login_request = LoginRequest(email=unique_email, password="wrongpassword")
     with pytest.raises(HTTPException) as exc:
-        await login_member(login_request, db_session)
+        await login_member(login_request, async_db_session)
     assert exc.value.status_code == 401
     assert exc.value.detail == "Invalid credentials"
     login_request = LoginRequest(email="nonexistent@example.com", password="testpassword")
     with pytest.raises(HTTPException) as exc:
-        await login_member(login_request, db_session)
+        await login_member(login_request, async_db_session)
     assert exc.value.status_code == 401
     assert exc.value.detail == "Invalid credentials"
-    db_session.rollback()
+    await async_db_session.rollback()
@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import update
+
+from app.models.book import Book
+from app.services.book_service import autocomplete_books, search_books
+
+
+@pytest.fixture
+async def catalog(async_db_session):
+    books = [
+        Book(title="The Hobbit", author="J. R. R. Tolkien", total_copies=2, available_copies=2),
+        Book(title="The Fellowship of the Ring", author="J. R. R. Tolkien", total_copies=1, available_copies=0),
+        Book(title="Tolkien: A Biography", author="Humphrey Carpenter", total_copies=1, available_copies=1),
+        Book(title="Dune", author="Frank Herbert", total_copies=3, available_copies=3),
+        Book(title="Éléments de géométrie", author="Adrien-Marie Legendre", total_copies=1, available_copies=1),
+    ]
+    async_db_session.add_all(books)
+    await async_db_session.commit()
+    return {book.title: book for book in books}
+
+
+async def test_title_matches_rank_above_author_matches(async_db_session, catalog):
+    """Test that relevance ranking prefers a title hit over an author hit."""
+    books, next_offset = await search_books(async_db_session, "tolkien")
+    assert books[0].title == "Tolkien: A Biography"
+    assert {b.title for b in books} == {"Tolkien: A Biography", "The Hobbit", "The Fellowship of the Ring"}
+    assert next_offset is None
+
+
+async def test_available_filter_and_pagination(async_db_session, catalog):
+    """Test the available-only filter and offset pages."""
+    books, _ = await search_books(async_db_session, "tolkien", available_only=True)
+    assert "The Fellowship of the Ring" not in {b.title for b in books}
+
+    first, next_offset = await search_books(async_db_session, "tolkien", limit=2)
+    assert len(first) == 2 and next_offset == 2
+    rest, next_offset = await search_books(async_db_session, "tolkien", limit=2, offset=2)
+    assert len(rest) == 1 and next_offset is None
+    assert not {b.id for b in first} & {b.id for b in rest}
+
+
+async def test_every_match_is_ranked_across_pages(async_db_session):
+    """Test that an old title match beats newer author matches and pages tile the results."""
+    db = async_db_session
+    db.add(Book(title="Dragon", author="Old Author", total_copies=1, available_copies=1))
+    await db.commit()
+    db.add_all([Book(title=f"Volume {i}", author="Dragon Press", total_copies=1, available_copies=1)
+                for i in range(45)])
+    await db.commit()
+
+    seen, offset = [], 0
+    while offset is not None:
+        page, offset = await search_books(db, "dragon", limit=10, offset=offset)
+        seen += [book.title for book in page]
+    assert seen[0] == "Dragon"
+    assert len(seen) == len(set(seen)) == 46
+
+
+async def test_prefix_autocomplete_and_diacritics(async_db_session, catalog):
+    """Test that every typed word is treated as a prefix and accents are folded."""
+    suggestions = await autocomplete_books(async_db_session, "fell ri")
+    assert [b.title for b in suggestions] == ["The Fellowship of the Ring"]
+    assert [b.title for b in await autocomplete_books(async_db_session, "geomet")] == ["Éléments de géométrie"]
+    # Query syntax is never passed through to the index
+    assert await autocomplete_books(async_db_session, '" OR *') == []
+
+
+async def test_index_follows_updates_and_circulation(async_db_session, catalog):
+    """Test that renames, deletes and borrows are reflected immediately."""
+    dune = catalog["Dune"]
+    dune.title = "Dune Messiah"
+    await async_db_session.commit()
+    assert [b.id for b in (await search_books(async_db_session, "messiah"))[0]] == [dune.id]
+
+    await async_db_session.execute(update(Book).where(Book.id == dune.id).values(available_copies=0))
+    await async_db_session.commit()
+    assert (await search_books(async_db_session, "dune", available_only=True))[0] == []
+
+    await async_db_session.delete(catalog["The Hobbit"])
+    await async_db_session.commit()
+    assert (await search_books(async_db_session, "hobbit"))[0] == []
@@ -1,5 +1,5 @@
 import pytest
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.book_service import create_book, get_book
 from app.schemas.book import BookCreate
 from app.models.book import Book
@@ -16,32 +16,32 @@ def set_test_db():
 
 
 @pytest.mark.asyncio
-async def test_create_book(db_session: Session, set_test_db):
+async def test_create_book(async_db_session: AsyncSession, set_test_db):
     """Test creating a book."""
     book_data = BookCreate(title="1984", author="George Orwell", total_copies=5)
-    book = await create_book(db_session, book_data)
+    book = await create_book(async_db_session, book_data)
     assert book.id is not None
     assert book.title == "1984"
-    db_session.rollback()
+    await async_db_session.rollback()
 
 
 @pytest.mark.asyncio
-async def test_get_book_success(db_session: Session, set_test_db):
+async def test_get_book_success(async_db_session: AsyncSession, set_test_db):
     """Test retrieving a book by ID."""
     book = Book(title="1984", author="George Orwell", total_copies=5, available_copies=5)
-    db_session.add(book)
-    db_session.commit()
-    retrieved_book = get_book(db_session, book.id)
+    async_db_session.add(book)
+    await async_db_session.commit()
+    retrieved_book = await get_book(async_db_session, book.id)
     assert retrieved_book.id == book.id
     assert retrieved_book.title == "1984"
-    db_session.rollback()
+    await async_db_session.rollback()
 
 
 @pytest.mark.asyncio
-async def test_get_book_not_found(db_session: Session, set_test_db):
+async def test_get_book_not_found(async_db_session: AsyncSession, set_test_db):
     """Test retrieving a non-existent book."""
     with pytest.raises(HTTPException) as exc:
-        await get_book(db_session, 999)
+        await get_book(async_db_session, 999)
     assert exc.value.status_code == 404
     assert exc.value.detail == "Book not found"
-    db_session.rollback()
+    await async_db_session.rollback()
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.models.base import Base
+from app.models.book import Book
+from app.models.book_copy import BookCopy
+from app.models.borrow import Borrow
+from app.models.member import Member
+from app.models.outbox import OutboxMessage
+from app.schemas.borrow import BorrowCreate
+from app.services import borrow_service
+
+THREADS = 8
+ATTEMPTS_PER_THREAD = 20
+COPIES = 60
+
+
+@pytest.fixture
+def stress_db(tmp_path):
+    """File-backed SQLite database shared by all stress test threads."""
+    path = tmp_path / "library_db.sqlite"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    book = Book(title="Hot Title", author="Popular Author", total_copies=COPIES, available_copies=COPIES)
+    members = [Member(email=f"reader{i}@example.com", name=f"Reader {i}", hashed_password="hashed")
+               for i in range(THREADS)]
+    session.add_all([book, *members])
+    session.flush()
+    # Only used with INVENTORY_MODEL=copies
+    session.add_all([BookCopy(book_id=book.id) for _ in range(COPIES)])
+    session.commit()
+    ids = {"book_id": book.id, "member_ids": [m.id for m in members]}
+    session.close()
+    yield engine, f"sqlite+aiosqlite:///{path}", ids
+    engine.dispose()
+
+
+def _borrow_worker(async_url: str, book_id: int, member_id: int, start: threading.Barrier):
+    """Run ATTEMPTS_PER_THREAD borrows on a private event loop and engine."""
+    async def run():
+        engine = create_async_engine(async_url, poolclass=NullPool, connect_args={"timeout": 30})
+        SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+        granted = rejected = 0
+        try:
+            start.wait()
+            for _ in range(ATTEMPTS_PER_THREAD):
+                async with SessionLocal() as db:
+                    try:
+                        await borrow_service.borrow_book(BorrowCreate(book_id=book_id, member_id=member_id), db)
+                        granted += 1
+                    except HTTPException as e:
+                        assert e.status_code == 400
+                        rejected += 1
+        finally:
+            await engine.dispose()
+        return granted, rejected
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("inventory_model", ["counter", "copies"])
+def test_concurrent_borrows_never_oversell(stress_db, inventory_model, monkeypatch):
+    """Hammer one title from many threads and check copies are never oversold."""
+    monkeypatch.setattr("app.core.config.settings.INVENTORY_MODEL", inventory_model)
+    engine, async_url, ids = stress_db
+    start = threading.Barrier(THREADS)
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        futures = [pool.submit(_borrow_worker, async_url, ids["book_id"], member_id, start)
+                   for member_id in ids["member_ids"]]
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - began
+
+    granted = sum(r[0] for r in results)
+    rejected = sum(r[1] for r in results)
+    assert granted == COPIES
+    assert granted + rejected == THREADS * ATTEMPTS_PER_THREAD
+
+    session = sessionmaker(bind=engine)()
+    try:
+        assert session.get(Book, ids["book_id"]).available_copies == 0
+        assert session.scalar(select(func.count(Borrow.id))) == COPIES
+        assert session.scalar(select(func.count(OutboxMessage.id))) == COPIES
+        if inventory_model == "copies":
+            assert session.scalar(select(func.count(func.distinct(Borrow.copy_id)))) == COPIES
+    finally:
+        session.close()
+    print(f"\n{inventory_model}: {THREADS} threads, {granted + rejected} attempts in {elapsed:.2f}s: "
+          f"{granted / elapsed:.1f} borrows/sec, {(granted + rejected) / elapsed:.1f} attempts/sec")
@@ -1,12 +1,16 @@
 from fastapi import HTTPException, status
 import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.orm import Session
+from app.services import borrow_service
 from app.models.book import Book
 from app.models.borrow import Borrow
 from app.models.member import Member
+from app.models.outbox import OutboxMessage
 from app.schemas.borrow import BorrowCreate
 from app.tasks.email_tasks import send_borrow_email, send_return_email
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 @pytest.mark.asyncio
@@ -50,3 +54,166 @@ async def get_member_borrows(member_id: int, db: Session) -> list[Borrow]:
     """Retrieve a member's borrows."""
     return db.query(Borrow).filter(Borrow.member_id == member_id).all()
 
+
+async def _outbox(db: AsyncSession) -> list[tuple[str, list]]:
+    """(task, payload) of the pending outbox rows, oldest first."""
+    rows = await db.scalars(select(OutboxMessage).order_by(OutboxMessage.id))
+    return [(row.task, row.payload) for row in rows]
+
+
+async def _seed(db: AsyncSession, copies: int = 1):
+    book = Book(title="1984", author="George Orwell", total_copies=copies, available_copies=copies)
+    member = Member(email="borrower@example.com", name="Borrower", hashed_password="hashed")
+    db.add_all([book, member])
+    await db.commit()
+    return book, member
+
+
+async def test_borrow_book_claims_copy(async_db_session: AsyncSession):
+    """Test that a borrow decrements available_copies and inserts the Borrow."""
+    book, member = await _seed(async_db_session, copies=2)
+    borrow = await borrow_service.borrow_book(BorrowCreate(book_id=book.id, member_id=member.id), async_db_session)
+    assert borrow.id is not None
+    assert borrow.borrow_date is not None
+    assert borrow.notification_sent is False
+    await async_db_session.refresh(book)
+    assert book.available_copies == 1
+    assert await _outbox(async_db_session) == [("send_borrow_email", [borrow.id])]
+
+
+async def test_borrow_and_return_query_budget(async_db_session: AsyncSession, query_budget):
+    """Test the statements of a borrow (three) and a return (four, hold lookup included)."""
+    book, member = await _seed(async_db_session, copies=2)
+    with query_budget(3, repeat=1):
+        borrow = await borrow_service.borrow_book(BorrowCreate(book_id=book.id, member_id=member.id),
+                                                  async_db_session)
+    with query_budget(4, repeat=1):
+        await borrow_service.return_book(borrow.id, async_db_session)
+
+
+async def test_borrow_book_no_copies(async_db_session: AsyncSession):
+    """Test that the last copy cannot be borrowed twice."""
+    book, member = await _seed(async_db_session, copies=1)
+    await borrow_service.borrow_book(BorrowCreate(book_id=book.id, member_id=member.id), async_db_session)
+    with pytest.raises(HTTPException) as exc:
+        await borrow_service.borrow_book(BorrowCreate(book_id=book.id, member_id=member.id), async_db_session)
+    assert exc.value.status_code == 400
+    await async_db_session.refresh(book)
+    assert book.available_copies == 0
+
+
+async def test_borrow_book_unknown_member_keeps_copy(async_db_session: AsyncSession):
+    """Test that a missing member rolls the copy claim back."""
+    book, _ = await _seed(async_db_session, copies=1)
+    with pytest.raises(HTTPException) as exc:
+        await borrow_service.borrow_book(BorrowCreate(book_id=book.id, member_id=999), async_db_session)
+    assert exc.value.status_code == 404
+    with pytest.raises(HTTPException) as exc:
+        await borrow_service.borrow_book(BorrowCreate(book_id=999, member_id=1), async_db_session)
+    assert exc.value.status_code == 404
+    await async_db_session.refresh(book)
+    assert book.available_copies == 1
+    assert (await async_db_session.execute(select(Borrow))).first() is None
+    assert await _outbox(async_db_session) == []
+
+
+async def test_return_book_restores_copy_once(async_db_session: AsyncSession):
+    """Test that a return increments available_copies and cannot repeat."""
+    book, member = await _seed(async_db_session, copies=1)
+    borrow = await borrow_service.borrow_book(BorrowCreate(book_id=book.id, member_id=member.id), async_db_session)
+    returned = await borrow_service.return_book(borrow.id, async_db_session)
+    assert returned.return_date is not None
+    await async_db_session.refresh(book)
+    assert book.available_copies == 1
+    with pytest.raises(HTTPException) as exc:
+        await borrow_service.return_book(borrow.id, async_db_session)
+    assert exc.value.status_code == 400
+    with pytest.raises(HTTPException) as exc:
+        await borrow_service.return_book(999, async_db_session)
+    assert exc.value.status_code == 404
+    await async_db_session.refresh(book)
+    assert book.available_copies == 1
+
+
+async def test_borrow_books_reports_per_item(async_db_session: AsyncSession):
+    """Test a batch borrow with partial availability and bad items."""
+    book, member = await _seed(async_db_session, copies=2)
+    items = [BorrowCreate(book_id=book.id, member_id=member.id) for _ in range(3)]
+    items.append(BorrowCreate(book_id=999, member_id=member.id))
+    results = await borrow_service.borrow_books(items, async_db_session)
+    assert [r.status_code for r in results] == [200, 200, 400, 404]
+    assert [r.index for r in results] == [0, 1, 2, 3]
+    await async_db_session.refresh(book)
+    assert book.available_copies == 0
+    assert [task for task, _ in await _outbox(async_db_session)] == ["send_borrow_emails"]
+
+
+async def test_borrow_books_unknown_member_releases_copy(async_db_session: AsyncSession):
+    """Test that copies claimed for unknown members are handed back."""
+    book, member = await _seed(async_db_session, copies=2)
+    items = [BorrowCreate(book_id=book.id, member_id=member.id),
+             BorrowCreate(book_id=book.id, member_id=999)]
+    results = await borrow_service.borrow_books(items, async_db_session)
+    assert await _outbox(async_db_session) == [("send_borrow_emails", [[results[0].borrow.id]])]
+    assert [r.status_code for r in results] == [200, 404]
+    await async_db_session.refresh(book)
+    assert book.available_copies == 1
+
+
+async def test_return_books_reports_per_item(async_db_session: AsyncSession):
+    """Test a batch return closes open borrows once and restores copies."""
+    book, member = await _seed(async_db_session, copies=2)
+    borrowed = await borrow_service.borrow_books(
+        [BorrowCreate(book_id=book.id, member_id=member.id) for _ in range(2)], async_db_session)
+    ids = [r.borrow.id for r in borrowed]
+    results = await borrow_service.return_books(ids + [ids[0], 999], async_db_session)
+    assert (await _outbox(async_db_session))[-1] == ("send_return_emails", [ids])
+    assert [r.status_code for r in results] == [200, 200, 400, 404]
+    assert all(r.borrow.return_date is not None for r in results[:2])
+    await async_db_session.refresh(book)
+    assert book.available_copies == 2
+
+
+async def _seed_history(db: AsyncSession, count: int):
+    book, member = await _seed(db, copies=count)
+    start = datetime(2024, 1, 1)
+    borrows = [Borrow(book_id=book.id, member_id=member.id, created_at=start + timedelta(days=i // 2),
+                      return_date=start if i % 3 == 0 else None)
+               for i in range(count)]
+    db.add_all(borrows)
+    await db.commit()
+    return member, borrows
+
+
+async def test_get_member_borrows_keyset_pages(async_db_session: AsyncSession):
+    """Test that cursor pages walk the history newest first without gaps."""
+    member, borrows = await _seed_history(async_db_session, 7)
+    seen, cursor = [], None
+    while True:
+        page = await borrow_service.get_member_borrows(member.id, async_db_session, cursor=cursor, limit=3)
+        seen.extend(page)
+        if len(page) < 3:
+            break
+        cursor = borrow_service.encode_borrow_cursor(page[-1])
+    expected = sorted(borrows, key=lambda b: (b.created_at, b.id), reverse=True)
+    assert [b.id for b in seen] == [b.id for b in expected]
+
+
+async def test_get_member_borrows_filters_state(async_db_session: AsyncSession):
+    """Test the open/returned filter."""
+    member, borrows = await _seed_history(async_db_session, 6)
+    open_ = await borrow_service.get_member_borrows(member.id, async_db_session, state="open")
+    returned = await borrow_service.get_member_borrows(member.id, async_db_session, state="returned")
+    assert {b.id for b in open_} == {b.id for b in borrows if b.return_date is None}
+    assert {b.id for b in returned} == {b.id for b in borrows if b.return_date is not None}
+    with pytest.raises(HTTPException):
+        await borrow_service.get_member_borrows(member.id, async_db_session, cursor="not-a-cursor")
+
+
+async def test_stream_member_borrows(async_db_session: AsyncSession):
+    """Test that streaming yields the full history in page order."""
+    member, borrows = await _seed_history(async_db_session, 5)
+    factory = async_sessionmaker(bind=async_db_session.bind, expire_on_commit=False)
+    streamed = [b.id async for b in borrow_service.stream_member_borrows(member.id, factory, chunk_size=2)]
+    paged = await borrow_service.get_member_borrows(member.id, async_db_session)
+    assert streamed == [b.id for b in paged]
@@ -0,0 +1,71 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models.book import Book
+from app.models.borrow import Borrow
+from app.models.member import Member
+from app.services.catalog_export import encode_export, export_query, export_rows
+
+
+@pytest.fixture
+async def history(async_db_session):
+    db = async_db_session
+    members = [Member(email=f"m{i}@example.com", name=f"Member {i}", hashed_password="secret-hash")
+               for i in range(2)]
+    book = Book(title="Dune", author="Frank Herbert", total_copies=9, available_copies=9)
+    db.add_all([*members, book])
+    await db.flush()
+    db.add_all([Borrow(book_id=book.id, member_id=members[i % 2].id, created_at=datetime(2024, 1, 1 + i),
+                       return_date=datetime(2024, 2, 1) if i % 3 == 0 else None)
+                for i in range(7)])
+    await db.commit()
+    return async_sessionmaker(bind=db.bind, expire_on_commit=False), members
+
+
+async def _export(factory, dataset, fmt, gzip=False, chunk_size=2, **filters) -> bytes:
+    query = export_query(dataset, **filters)
+    chunks = [chunk async for chunk in encode_export(dataset, fmt, export_rows(factory, query, chunk_size),
+                                                     gzip=gzip)]
+    return b"".join(chunks)
+
+
+async def test_export_borrows_csv_with_filters(history):
+    factory, members = history
+    body = await _export(factory, "borrows", "csv", since=datetime(2024, 1, 2),
+                         until=datetime(2024, 1, 7), member_id=members[1].id)
+    rows = list(csv.DictReader(io.StringIO(body.decode())))
+    assert [row["borrow_date"] for row in rows] == ["2024-01-02T00:00:00", "2024-01-04T00:00:00",
+                                                    "2024-01-06T00:00:00"]
+    assert rows[0]["return_date"] == "" and rows[0]["notification_sent"] == "false"
+    assert rows[1]["return_date"] == "2024-02-01T00:00:00"
+
+
+async def test_export_members_ndjson_gzip_has_no_password(history):
+    factory, _ = history
+    body = gzip.decompress(await _export(factory, "members", "ndjson", gzip=True))
+    members = [json.loads(line) for line in body.splitlines()]
+    assert [member["email"] for member in members] == ["m0@example.com", "m1@example.com"]
+    assert "hashed_password" not in members[0] and members[0]["is_admin"] is False
+
+
+async def test_export_rejects_bad_combinations():
+    with pytest.raises(ValueError):
+        export_query("books", member_id=1)
+    with pytest.raises(ValueError):
+        export_query("loans")
+    with pytest.raises(ValueError):
+        encode_export("books", "parquet", None, gzip=True)
+
+
+async def test_export_books_parquet(history):
+    pq = pytest.importorskip("pyarrow.parquet")
+    factory, _ = history
+    table = pq.read_table(io.BytesIO(await _export(factory, "borrows", "parquet")))
+    assert table.num_rows == 7
+    assert table.column_names[3] == "borrow_date"
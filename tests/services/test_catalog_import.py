@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from sqlalchemy import select, text
+
+from app.models.book import Book
+from app.services.catalog_import import import_books, marc_to_record, parse_records
+
+
+async def _chunks(data: bytes, size: int = 7):
+    """Feed the parser in small pieces so records straddle chunk borders."""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def _marc(title: str, author: str, isbn: str = None, holdings: int = 0) -> bytes:
+    """Minimal MARC 21 record (UTF-8) with 020, 100, 245 and 852 fields."""
+    fields = [("100", f"1 \x1fa{author},"), ("245", f"10\x1fa{title} /\x1fcby {author}.")]
+    if isbn:
+        fields.insert(0, ("020", f"  \x1fa{isbn} (hardcover)"))
+    fields += [("852", "  \x1fbMain")] * holdings
+    directory, data = b"", b""
+    for tag, value in fields:
+        encoded = value.encode() + b"\x1e"
+        directory += f"{tag}{len(encoded):04d}{len(data):05d}".encode()
+        data += encoded
+    base = 24 + len(directory) + 1
+    length = base + len(data) + 1
+    leader = f"{length:05d}nam a22{base:05d} a 4500".encode()
+    return leader + directory + b"\x1e" + data + b"\x1d"
+
+
+async def _parse(fmt: str, data: bytes) -> list:
+    return [item async for item in parse_records(fmt, _chunks(data))]
+
+
+async def test_parse_csv_handles_quotes_bom_and_bad_rows():
+    data = ('﻿title,author,total_copies,isbn\r\n'
+            '"War and Peace, Vol. 1",Leo Tolstoy,2,978-0-14-044793-4\r\n'
+            '"A title\nover two lines",Someone,1,\r\n'
+            'Too,few\r\n'
+            '\r\n'
+            'Dune,Frank Herbert,3,0441013597').encode()
+    parsed = await _parse("csv", data)
+    assert [position for position, _, _ in parsed] == [2, 3, 5, 7]
+    assert parsed[0][1] == {"title": "War and Peace, Vol. 1", "author": "Leo Tolstoy",
+                            "total_copies": "2", "isbn": "978-0-14-044793-4"}
+    assert parsed[1][1]["title"] == "A title\nover two lines"
+    assert parsed[2] == (5, None, "expected 4 fields, got 2")
+
+
+async def test_parse_ndjson_reports_bad_lines():
+    data = b'{"title": "Dune", "author": "Frank Herbert", "total_copies": 1}\nnot json\n[1]\n'
+    parsed = await _parse("ndjson", data)
+    assert parsed[0][1]["title"] == "Dune"
+    assert parsed[1][0] == 2 and parsed[1][2].startswith("invalid JSON")
+    assert parsed[2] == (3, None, "expected a JSON object")
+
+
+async def test_parse_marc_records():
+    data = _marc("Ubik", "Dick, Philip K.", isbn="9780547572291", holdings=2) + _marc("Solaris", "Lem, Stanisław")
+    parsed = await _parse("marc", data + b"garbage\x1d")
+    assert parsed[0] == (1, {"title": "Ubik", "author": "Dick, Philip K.", "isbn": "9780547572291",
+                             "total_copies": 2}, None)
+    assert parsed[1][1]["author"] == "Lem, Stanisław" and parsed[1][1]["total_copies"] == 1
+    assert parsed[2][0] == 3 and parsed[2][2].startswith("malformed MARC record")
+    with pytest.raises(ValueError):
+        marc_to_record(b"00010")
+
+
+async def test_import_books_chunks_upserts_and_rejects(async_db_session):
+    db = async_db_session
+    db.add(Book(title="Old title", author="Frank Herbert", total_copies=4, available_copies=1,
+                isbn="0441013597"))
+    await db.commit()
+    lines = [{"title": f"Book {i}", "author": "Author", "total_copies": 1} for i in range(5)]
+    lines += [
+        {"title": "Dune", "author": "Frank Herbert", "total_copies": 2, "isbn": "0-441-01359-7"},
+        {"title": "Ubik", "author": "Philip K. Dick", "total_copies": 1, "isbn": "9780547572291"},
+        {"title": "Ubik (2nd printing)", "author": "Philip K. Dick", "total_copies": 2, "isbn": "9780547572291"},
+        {"title": "", "author": "Nobody", "total_copies": 0},
+        {"title": "Bad ISBN", "author": "Nobody", "total_copies": 1, "isbn": "12345"},
+    ]
+    data = "\n".join(json.dumps(line) for line in lines).encode()
+    seen = []
+    report = await import_books(db, parse_records("ndjson", _chunks(data, 64)), chunk_size=3,
+                                on_reject=seen.append)
+
+    assert (report.received, report.written, report.rejected, report.duplicates) == (10, 7, 2, 1)
+    assert report.chunks == 3
+    assert [reject.position for reject in report.rejects] == [9, 10] == [reject.position for reject in seen]
+    assert "isbn" in report.rejects[1].error
+    books = {book.isbn: book for book in (await db.execute(select(Book).where(Book.isbn.isnot(None)))).scalars()}
+    dune = books["0441013597"]
+    await db.refresh(dune)
+    # Title and total replaced; three copies were on loan, none of the new two is free
+    assert (dune.title, dune.total_copies, dune.available_copies) == ("Dune", 2, 0)
+    assert books["9780547572291"].title == "Ubik (2nd printing)"
+    # New rows are indexed in bulk, updated ones by the trigger, and the pause is lifted
+    for word, expected in (("printing", 1), ("dune", 1), ("old", 0), ("book", 5)):
+        hits = (await db.execute(text("SELECT rowid FROM books_fts WHERE books_fts MATCH :q"), {"q": word})).all()
+        assert len(hits) == expected, word
+    assert (await db.execute(text("SELECT count(*) FROM books_fts_paused"))).scalar() == 0
+
+
+async def test_import_books_skip_keeps_existing(async_db_session):
+    db = async_db_session
+    db.add(Book(title="Dune", author="Frank Herbert", total_copies=1, available_copies=1, isbn="0441013597"))
+    await db.commit()
+    data = b"title,author,total_copies,isbn\nDune (reissue),Frank Herbert,5,0441013597\nUbik,Philip K. Dick,1,\n"
+    report = await import_books(db, parse_records("csv", _chunks(data)), on_conflict="skip")
+    assert report.rejected == 0
+    titles = (await db.execute(select(Book.title).order_by(Book.id))).scalars().all()
+    assert titles == ["Dune", "Ubik"]
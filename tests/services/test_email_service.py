@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from app.tasks.email_tasks import send_email, send_borrow_email, send_return_email
 from app.models.borrow import Borrow
 from app.models.member import Member
@@ -20,10 +20,12 @@ def set_test_db():
 @pytest.mark.asyncio
 async def test_send_email():
     """Test sending a generic email."""
-    with patch("aiosmtplib.send") as mock_send:
+    with patch("app.services.smtp_pool.SMTPPool.send",
+               new=AsyncMock(return_value={"status": "Email sent"})) as mock_send:
         result = await send_email("test@example.com", "Test Subject", "Test Body")
         assert result == {"status": "Email sent"}
-        mock_send.assert_called_once()
+        mock_send.assert_awaited_once()
+        assert mock_send.await_args.args[0]["To"] == "test@example.com"
 
 
 @pytest.mark.asyncio
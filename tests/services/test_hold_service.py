@@ -0,0 +1,210 @@
+import asyncio
+import os
+
+from fastapi import HTTPException
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.models.base import Base
+from app.models.book import Book
+from app.models.borrow import Borrow
+from app.models.hold import HOLD_FULFILLED, Hold
+from app.models.member import Member
+from app.models.outbox import OutboxMessage
+from app.schemas.borrow import BorrowCreate
+from app.services import borrow_service, hold_service, inventory
+from app.services.catalog_import import import_books
+
+
+async def _seed(db: AsyncSession, waiting: int = 2):
+    """A single-copy book out on loan and members waiting for it."""
+    book = Book(title="Dune", author="Frank Herbert", total_copies=1, available_copies=1)
+    members = [Member(email=f"reader{i}@example.com", name=f"Reader {i}", hashed_password="hashed")
+               for i in range(waiting + 1)]
+    db.add_all([book, *members])
+    await db.commit()
+    borrow = await borrow_service.borrow_book(BorrowCreate(book_id=book.id, member_id=members[0].id), db)
+    return book, borrow, members[1:]
+
+
+async def test_holds_queue_in_order(async_db_session: AsyncSession):
+    """Test that holds get consecutive positions and duplicates are refused."""
+    book, _, members = await _seed(async_db_session)
+    book_id, member_ids = book.id, [member.id for member in members]
+    first = await hold_service.place_hold(book_id, member_ids[0], async_db_session)
+    second = await hold_service.place_hold(book_id, member_ids[1], async_db_session)
+    assert (first.status, first.position, second.position) == ("waiting", 1, 2)
+    with pytest.raises(HTTPException) as exc:
+        await hold_service.place_hold(book_id, member_ids[0], async_db_session)
+    assert exc.value.detail == "Already waiting for this book"
+    with pytest.raises(HTTPException) as exc:
+        await hold_service.place_hold(book_id, 999, async_db_session)
+    assert exc.value.status_code == 404
+
+
+async def test_hold_refused_while_copies_available(async_db_session: AsyncSession):
+    """Test that a book on the shelf is borrowed, not held."""
+    book, borrow, members = await _seed(async_db_session)
+    await borrow_service.return_book(borrow.id, async_db_session)
+    with pytest.raises(HTTPException) as exc:
+        await hold_service.place_hold(book.id, members[0].id, async_db_session)
+    assert exc.value.status_code == 409
+
+
+async def test_cancel_moves_queue_up(async_db_session: AsyncSession):
+    """Test that cancelling a hold advances the ones behind it."""
+    book, _, members = await _seed(async_db_session)
+    first = await hold_service.place_hold(book.id, members[0].id, async_db_session)
+    second = await hold_service.place_hold(book.id, members[1].id, async_db_session)
+    cancelled = await hold_service.cancel_hold(first.id, async_db_session)
+    assert (cancelled.status, cancelled.position) == ("cancelled", None)
+    assert (await hold_service.get_hold(second.id, async_db_session)).position == 1
+    with pytest.raises(HTTPException) as exc:
+        await hold_service.cancel_hold(first.id, async_db_session)
+    assert exc.value.detail == "Hold is no longer waiting"
+
+
+async def test_return_checks_out_to_oldest_hold(async_db_session: AsyncSession, query_budget):
+    """Test that a returned copy goes to the head of the queue, not the shelf."""
+    book, borrow, members = await _seed(async_db_session)
+    first = await hold_service.place_hold(book.id, members[0].id, async_db_session)
+    second = await hold_service.place_hold(book.id, members[1].id, async_db_session)
+    with query_budget(5, repeat=1):
+        await borrow_service.return_book(borrow.id, async_db_session)
+
+    held = await async_db_session.get(Hold, first.id, populate_existing=True)
+    assert held.status == HOLD_FULFILLED
+    loan = await async_db_session.get(Borrow, held.borrow_id)
+    assert (loan.member_id, loan.book_id, loan.return_date) == (members[0].id, book.id, None)
+    await async_db_session.refresh(book)
+    assert book.available_copies == 0
+    assert (await hold_service.get_hold(second.id, async_db_session)).position == 1
+    rows = (await async_db_session.scalars(select(OutboxMessage).order_by(OutboxMessage.id))).all()
+    assert [(row.task, row.payload) for row in rows][-1] == ("send_hold_email", [loan.id])
+
+
+async def test_batch_return_serves_holds_then_shelf(async_db_session: AsyncSession):
+    """Test that a batch return fills the waitlist and shelves the remaining copies."""
+    book = Book(title="Dune", author="Frank Herbert", total_copies=3, available_copies=3)
+    members = [Member(email=f"reader{i}@example.com", name=f"Reader {i}", hashed_password="hashed")
+               for i in range(2)]
+    async_db_session.add_all([book, *members])
+    await async_db_session.commit()
+    borrowed = await borrow_service.borrow_books(
+        [BorrowCreate(book_id=book.id, member_id=members[0].id) for _ in range(3)], async_db_session)
+    hold = await hold_service.place_hold(book.id, members[1].id, async_db_session)
+
+    results = await borrow_service.return_books([r.borrow.id for r in borrowed], async_db_session)
+    assert [r.status_code for r in results] == [200, 200, 200]
+    await async_db_session.refresh(book)
+    assert book.available_copies == 2
+    fulfilled = await async_db_session.get(Hold, hold.id, populate_existing=True)
+    loan = await async_db_session.get(Borrow, fulfilled.borrow_id)
+    assert (fulfilled.status, loan.member_id) == (HOLD_FULFILLED, members[1].id)
+
+
+async def test_borrow_refused_while_members_wait(async_db_session: AsyncSession):
+    """Test that a copy on the shelf past a waitlist is not lent to a walk-in."""
+    book, _, members = await _seed(async_db_session)
+    await hold_service.place_hold(book.id, members[0].id, async_db_session)
+    book.total_copies, book.available_copies = 2, 1
+    await async_db_session.commit()
+    walk_in = BorrowCreate(book_id=book.id, member_id=members[1].id)
+    with pytest.raises(HTTPException) as exc:
+        await borrow_service.borrow_book(walk_in, async_db_session)
+    assert exc.value.status_code == 409
+    results = await borrow_service.borrow_books([walk_in], async_db_session)
+    assert (results[0].status_code, results[0].detail) == (409, borrow_service.WAITLISTED)
+
+
+@pytest.mark.parametrize("model", ["counter", "copies"])
+async def test_import_serves_waiting_holds(async_db_session: AsyncSession, model, monkeypatch):
+    """Test that copies an import adds go to the waitlist before the shelf."""
+    book, _, members = await _seed(async_db_session)
+    book.isbn = "9780441013593"
+    await async_db_session.commit()
+    monkeypatch.setattr("app.core.config.settings.INVENTORY_MODEL", model)
+    await inventory.sync_copies(async_db_session)
+    hold = await hold_service.place_hold(book.id, members[0].id, async_db_session)
+
+    async def records():
+        yield 1, {"title": "Dune", "author": "Frank Herbert", "isbn": book.isbn, "total_copies": 3}, None
+    await import_books(async_db_session, records())
+
+    served = await async_db_session.get(Hold, hold.id, populate_existing=True)
+    assert served.status == HOLD_FULFILLED
+    await async_db_session.refresh(book)
+    assert book.available_copies == 1
+    reminder = await async_db_session.scalar(select(OutboxMessage).where(OutboxMessage.task == "send_hold_email"))
+    assert (reminder.payload, reminder.member_id) == ([served.borrow_id], members[0].id)
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+async def race_engine(request, tmp_path):
+    """Database shared by concurrent sessions: a SQLite file, or TEST_POSTGRES_URL when set."""
+    if request.param == "postgresql":
+        url = os.getenv("TEST_POSTGRES_URL")
+        if not url:
+            pytest.skip("TEST_POSTGRES_URL is not set")
+    else:
+        url = f"sqlite+aiosqlite:///{tmp_path / 'library_db.sqlite'}"
+    engine = create_async_engine(url, poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.parametrize("model", ["counter", "copies"])
+async def test_hold_placed_during_return_never_strands_a_copy(race_engine, model, monkeypatch):
+    """Test a hold placed after a return looked for holds but before it committed."""
+    monkeypatch.setattr("app.core.config.settings.INVENTORY_MODEL", model)
+    SessionLocal = async_sessionmaker(bind=race_engine, expire_on_commit=False)
+    async with SessionLocal() as db:
+        book = Book(title="Dune", author="Frank Herbert", total_copies=1, available_copies=1)
+        members = [Member(email=f"reader{i}@example.com", name=f"Reader {i}", hashed_password="hashed")
+                   for i in range(2)]
+        db.add_all([book, *members])
+        await db.commit()
+        book_id, (lender, waiter) = book.id, [member.id for member in members]
+        await inventory.sync_copies(db)
+        borrow = await borrow_service.borrow_book(BorrowCreate(book_id=book_id, member_id=lender), db)
+
+    looked, resume = asyncio.Event(), asyncio.Event()
+    assign_holds = borrow_service.assign_holds
+
+    async def paused(*args, **kwargs):
+        result = await assign_holds(*args, **kwargs)
+        looked.set()
+        await resume.wait()
+        return result
+    monkeypatch.setattr(borrow_service, "assign_holds", paused)
+
+    async def give_back():
+        async with SessionLocal() as db:
+            await borrow_service.return_book(borrow.id, db)
+
+    async def hold():
+        async with SessionLocal() as db:
+            try:
+                return (await hold_service.place_hold(book_id, waiter, db)).status
+            except HTTPException as e:
+                return e.status_code
+
+    returning = asyncio.create_task(give_back())
+    await looked.wait()
+    holding = asyncio.create_task(hold())
+    # Let the hold reach the database while the return is still open
+    await asyncio.sleep(0.3)
+    resume.set()
+    await returning
+    outcome = await holding
+
+    async with SessionLocal() as db:
+        waiting = await db.scalar(select(func.count(Hold.id)).where(Hold.status == "waiting"))
+        available = await db.scalar(select(Book.available_copies).where(Book.id == book_id))
+    assert (outcome, waiting, available) == (409, 0, 1)
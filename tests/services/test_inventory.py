@@ -0,0 +1,159 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.book import Book
+from app.models.book_copy import COPY_AVAILABLE, COPY_ON_LOAN, COPY_RETIRED, BookCopy
+from app.models.borrow import Borrow
+from app.models.member import Member
+from app.schemas.borrow import BorrowCreate
+from app.schemas.book import BookCreate
+from app.services import book_service, borrow_service, hold_service, inventory
+from app.services.catalog_import import import_books, parse_records
+
+
+@pytest.fixture
+def copies_model(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.INVENTORY_MODEL", "copies")
+
+
+async def _seed(db: AsyncSession, copies: int = 2, members: int = 1):
+    book = Book(title="Dune", author="Frank Herbert", total_copies=copies, available_copies=copies)
+    readers = [Member(email=f"reader{i}@example.com", name=f"Reader {i}", hashed_password="hashed")
+               for i in range(members)]
+    db.add_all([book, *readers])
+    await db.commit()
+    await inventory.sync_copies(db)
+    return book.id, [reader.id for reader in readers]
+
+
+async def _statuses(db: AsyncSession, book_id: int) -> list[str]:
+    return list((await db.scalars(
+        select(BookCopy.status).where(BookCopy.book_id == book_id).order_by(BookCopy.id))).all())
+
+
+async def _available(db: AsyncSession, book_id: int) -> int:
+    return await db.scalar(select(Book.available_copies).where(Book.id == book_id))
+
+
+async def test_borrow_claims_a_copy(async_db_session: AsyncSession, copies_model, query_budget):
+    """Test that a borrow lends a specific copy and the counter follows the copies."""
+    book_id, (member_id,) = await _seed(async_db_session)
+    with query_budget(4, repeat=1):
+        borrow = await borrow_service.borrow_book(BorrowCreate(book_id=book_id, member_id=member_id),
+                                                  async_db_session)
+    borrow_id, copy_id = borrow.id, borrow.copy_id
+    assert copy_id is not None
+    assert await _statuses(async_db_session, book_id) == [COPY_ON_LOAN, COPY_AVAILABLE]
+    assert await _available(async_db_session, book_id) == 1
+
+    await borrow_service.borrow_book(BorrowCreate(book_id=book_id, member_id=member_id), async_db_session)
+    with pytest.raises(HTTPException) as exc:
+        await borrow_service.borrow_book(BorrowCreate(book_id=book_id, member_id=member_id), async_db_session)
+    assert exc.value.detail == "No copies available"
+
+    await borrow_service.return_book(borrow_id, async_db_session)
+    assert await _statuses(async_db_session, book_id) == [COPY_AVAILABLE, COPY_ON_LOAN]
+    assert await _available(async_db_session, book_id) == 1
+
+
+async def test_unknown_member_gives_copy_back(async_db_session: AsyncSession, copies_model):
+    """Test that a failed borrow leaves the copy on the shelf."""
+    book_id, _ = await _seed(async_db_session, copies=1)
+    with pytest.raises(HTTPException) as exc:
+        await borrow_service.borrow_book(BorrowCreate(book_id=book_id, member_id=999), async_db_session)
+    assert exc.value.status_code == 404
+    assert await _statuses(async_db_session, book_id) == [COPY_AVAILABLE]
+
+
+async def test_batches_claim_and_release_copies(async_db_session: AsyncSession, copies_model):
+    """Test batch borrows and returns against per-copy inventory."""
+    book_id, (member_id,) = await _seed(async_db_session, copies=3)
+    items = [BorrowCreate(book_id=book_id, member_id=member_id) for _ in range(3)]
+    items.insert(1, BorrowCreate(book_id=book_id, member_id=999))
+    results = await borrow_service.borrow_books(items, async_db_session)
+    assert [r.status_code for r in results] == [200, 404, 200, 400]
+    assert len({results[0].borrow.copy_id, results[2].borrow.copy_id}) == 2
+    assert await _available(async_db_session, book_id) == 1
+
+    returned = await borrow_service.return_books([results[0].borrow.id], async_db_session)
+    assert returned[0].ok
+    assert sorted(await _statuses(async_db_session, book_id)) == [COPY_AVAILABLE, COPY_AVAILABLE, COPY_ON_LOAN]
+    assert await _available(async_db_session, book_id) == 2
+
+
+async def test_hold_takes_over_returned_copy(async_db_session: AsyncSession, copies_model):
+    """Test that the holder's borrow gets the very copy that came back."""
+    book_id, (first, second) = await _seed(async_db_session, copies=1, members=2)
+    borrow = await borrow_service.borrow_book(BorrowCreate(book_id=book_id, member_id=first),
+                                              async_db_session)
+    hold = await hold_service.place_hold(book_id, second, async_db_session)
+    await borrow_service.return_book(borrow.id, async_db_session)
+
+    fulfilled = await hold_service.get_hold(hold.id, async_db_session)
+    loan = await async_db_session.get(Borrow, fulfilled.borrow_id)
+    assert (loan.member_id, loan.copy_id) == (second, borrow.copy_id)
+    assert await _statuses(async_db_session, book_id) == [COPY_ON_LOAN]
+    assert await _available(async_db_session, book_id) == 0
+
+
+async def test_sync_attaches_open_borrows(async_db_session: AsyncSession):
+    """Test that switching over creates copies and puts open borrows on them."""
+    book = Book(title="Dune", author="Frank Herbert", total_copies=3, available_copies=1)
+    member = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    async_db_session.add_all([book, member])
+    await async_db_session.flush()
+    async_db_session.add_all([Borrow(book_id=book.id, member_id=member.id) for _ in range(2)])
+    await async_db_session.commit()
+    book_id = book.id
+
+    assert await inventory.sync_copies(async_db_session) == \
+        {"copies_created": 3, "copies_retired": 0, "borrows_attached": 2, "borrows_without_copy": 0}
+    assert await inventory.sync_copies(async_db_session) == \
+        {"copies_created": 0, "copies_retired": 0, "borrows_attached": 0, "borrows_without_copy": 0}
+    assert await _statuses(async_db_session, book_id) == [COPY_ON_LOAN, COPY_ON_LOAN, COPY_AVAILABLE]
+    assert await _available(async_db_session, book_id) == 1
+    copy_ids = (await async_db_session.scalars(select(Borrow.copy_id).order_by(Borrow.id))).all()
+    assert None not in copy_ids and len(set(copy_ids)) == 2
+
+
+async def test_new_books_get_their_copies(async_db_session: AsyncSession, copies_model):
+    """Test that creating a book under the copies model shelves its copies."""
+    book = await book_service.create_book(async_db_session, BookCreate(title="Dune", author="Frank Herbert",
+                                                                       total_copies=3))
+    assert await _statuses(async_db_session, book.id) == [COPY_AVAILABLE] * 3
+
+
+async def _import(db: AsyncSession, csv: bytes):
+    async def chunks():
+        yield csv
+    return await import_books(db, parse_records("csv", chunks()))
+
+
+async def test_imported_books_can_be_borrowed(async_db_session: AsyncSession, copies_model):
+    """Test that the catalog import shelves copies and an upsert adds or retires them."""
+    db = async_db_session
+    member = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    db.add(member)
+    await db.commit()
+    member_id = member.id
+    await _import(db, b"title,author,total_copies,isbn\nDune,Frank Herbert,3,0441013597\n")
+    book_id = await db.scalar(select(Book.id).where(Book.isbn == "0441013597"))
+    assert await _statuses(db, book_id) == [COPY_AVAILABLE] * 3
+
+    borrow = await borrow_service.borrow_book(BorrowCreate(book_id=book_id, member_id=member_id), db)
+    assert borrow.copy_id is not None
+    await _import(db, b"title,author,total_copies,isbn\nDune,Frank Herbert,4,0441013597\n")
+    assert await _statuses(db, book_id) == [COPY_ON_LOAN] + [COPY_AVAILABLE] * 3
+    assert await _available(db, book_id) == 3
+
+    await _import(db, b"title,author,total_copies,isbn\nDune,Frank Herbert,2,0441013597\n")
+    assert await _statuses(db, book_id) == [COPY_ON_LOAN, COPY_AVAILABLE, COPY_RETIRED, COPY_RETIRED]
+    assert await _available(db, book_id) == 1
+
+
+def test_unknown_inventory_model(monkeypatch):
+    """Test that a misspelt INVENTORY_MODEL fails loudly."""
+    monkeypatch.setattr("app.core.config.settings.INVENTORY_MODEL", "shelves")
+    with pytest.raises(ValueError):
+        inventory.copies_enabled()
@@ -0,0 +1,88 @@
+import socket
+
+import pytest
+
+from app.services.smtp_pool import SMTPPool, build_message
+
+aiosmtpd = pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller  # noqa: E402
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps every delivered message and session."""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    yield handler, controller.hostname, controller.port
+    controller.stop()
+
+
+def _pool(host, port, **kwargs) -> SMTPPool:
+    return SMTPPool(hostname=host, port=port, use_tls=False, timeout=5, **kwargs)
+
+
+def _messages(count: int):
+    return [build_message(f"reader{i}@example.com", f"Subject {i}", "Body", "library@example.com")
+            for i in range(count)]
+
+
+async def test_send_many_reuses_connections(smtp_server):
+    """Test that a batch is delivered over at most max_connections sessions."""
+    handler, host, port = smtp_server
+    async with _pool(host, port, max_connections=3) as pool:
+        results = await pool.send_many(_messages(30))
+    assert results == [{"status": "Email sent"}] * 30
+    assert len(handler.messages) == 30
+    assert pool.stats["connects"] <= 3
+    assert len(handler.sessions) <= 3
+
+
+async def test_connections_recycled_after_message_limit(smtp_server):
+    """Test that a connection is replaced once it has carried its quota."""
+    handler, host, port = smtp_server
+    async with _pool(host, port, max_connections=1, max_messages_per_connection=4) as pool:
+        for message in _messages(10):
+            assert await pool.send(message) == {"status": "Email sent"}
+    assert pool.stats["connects"] == 3
+    assert len(handler.sessions) == 3
+
+
+async def test_reconnects_after_dropped_connection(smtp_server):
+    """Test that a message on a dead connection is retried on a new one."""
+    handler, host, port = smtp_server
+    async with _pool(host, port, max_connections=1) as pool:
+        first, second = _messages(2)
+        await pool.send(first)
+        # Simulate the server timing the idle session out
+        pool._idle[0][0].transport.close()
+        assert await pool.send(second) == {"status": "Email sent"}
+    assert len(handler.messages) == 2
+    assert pool.stats["connects"] == 2
+    assert pool.stats["failed"] == 0
+
+
+async def test_unreachable_server_reports_error():
+    """Test that connection failures come back as error results, not exceptions."""
+    pool = _pool("127.0.0.1", 1, max_connections=1)
+    result = await pool.send(_messages(1)[0])
+    assert "error" in result
+    assert pool.stats["failed"] == 1
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy.orm import Session
+
+from app.models.base import get_engine
+from app.models.book import Book
+from app.models.borrow import Borrow
+from app.models.member import Member
+from app.tasks import email_tasks
+
+
+def test_worker_process_init_builds_single_connection_pool():
+    """Test that each prefork child drops inherited connections and sizes for one task."""
+    with patch("app.tasks.email_tasks.dispose_engine") as dispose, \
+            patch("app.tasks.email_tasks.init_engine") as init:
+        email_tasks._init_worker_process()
+    dispose.assert_called_once_with(close=False)
+    init.assert_called_once_with(pool_size=1, max_overflow=1)
+
+
+def test_worker_init_sizes_pool_for_thread_pools():
+    """Test that in-process pools get one connection per concurrent task."""
+    with patch("app.tasks.email_tasks.init_engine") as init:
+        email_tasks._init_worker(sender=SimpleNamespace(pool_cls="threads", concurrency=8))
+        init.assert_called_once_with(pool_size=8, max_overflow=1)
+        init.reset_mock()
+        email_tasks._init_worker(sender=SimpleNamespace(pool_cls="prefork", concurrency=8))
+        init.assert_not_called()
+
+
+def test_worker_shutdown_disposes_engine():
+    """Test that shutdown releases the worker's database and SMTP pools."""
+    with patch("app.tasks.email_tasks.dispose_engine") as dispose, \
+            patch("app.tasks.email_tasks.close_smtp_pool") as close_smtp:
+        email_tasks._shutdown_worker_db()
+    dispose.assert_called_once_with()
+    close_smtp.assert_called_once_with()
+
+
+def test_tasks_share_worker_engine(task_db: Session):
+    """Test that notification tasks reuse one engine instead of building their own."""
+    book = Book(title="1984", author="George Orwell", total_copies=2, available_copies=0)
+    member = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    task_db.add_all([book, member])
+    task_db.flush()
+    borrows = [Borrow(book_id=book.id, member_id=member.id) for _ in range(2)]
+    task_db.add_all(borrows)
+    task_db.commit()
+
+    engine = get_engine()
+    pool = MagicMock(send=AsyncMock(return_value={"status": "Email sent"}),
+                     send_many=AsyncMock(side_effect=lambda messages: [{"status": "Email sent"}] * len(messages)))
+    with patch("app.tasks.email_tasks.get_smtp_pool", return_value=pool):
+        assert email_tasks.send_borrow_email.apply(args=[borrows[0].id]).get() == {"status": "Borrow email sent"}
+        assert email_tasks.send_return_email.apply(args=[borrows[1].id]).get() == {"status": "Return email sent"}
+        result = email_tasks.send_borrow_emails.apply(args=[[b.id for b in borrows]]).get()
+    assert result["count"] == 2
+    assert pool.send.await_count == 2
+    assert pool.send.await_args_list[0].args[0]["To"] == "reader@example.com"
+    assert len(pool.send_many.await_args.args[0]) == 2
+    assert get_engine() is engine
+
+    with patch("app.tasks.email_tasks.send_email", new=AsyncMock()) as send:
+        assert "error" in email_tasks.send_borrow_email.apply(args=[999]).get()
+    send.assert_not_awaited()
+
+
+def test_batch_task_loads_borrows_in_one_query(task_db: Session, query_budget):
+    """Test that a batch notification does not query once per borrow."""
+    book = Book(title="1984", author="George Orwell", total_copies=5, available_copies=0)
+    member = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    task_db.add_all([book, member])
+    task_db.flush()
+    borrows = [Borrow(book_id=book.id, member_id=member.id) for _ in range(5)]
+    task_db.add_all(borrows)
+    task_db.flush()
+    borrow_ids = [borrow.id for borrow in borrows]
+    task_db.commit()
+
+    pool = MagicMock(send_many=AsyncMock(side_effect=lambda messages: [{"status": "Email sent"}] * len(messages)))
+    with patch("app.tasks.email_tasks.get_smtp_pool", return_value=pool), query_budget(1, repeat=1) as stats:
+        assert email_tasks.send_borrow_emails.apply(args=[borrow_ids]).get()["count"] == 5
+    assert stats.count == 1
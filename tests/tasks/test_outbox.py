@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from kombu import Connection
+from sqlalchemy.orm import Session
+
+from app.models.base import get_session_factory
+from app.models.book import Book
+from app.models.borrow import Borrow
+from app.models.member import Member
+from app.models.outbox import OutboxMessage
+from app.services.outbox import dispatch_outbox, outbox_row
+from app.tasks import email_tasks
+from app.tasks.outbox import dispatch_once
+
+
+def _seed_outbox(db: Session, count: int) -> list[int]:
+    book = Book(title="1984", author="George Orwell", total_copies=count, available_copies=0)
+    member = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    db.add_all([book, member])
+    db.flush()
+    borrows = [Borrow(book_id=book.id, member_id=member.id) for _ in range(count)]
+    db.add_all(borrows)
+    db.flush()
+    db.add_all([OutboxMessage(task="send_borrow_email", payload=[borrow.id]) for borrow in borrows])
+    db.commit()
+    return [borrow.id for borrow in borrows]
+
+
+def test_dispatch_publishes_batch_to_broker(task_db: Session):
+    """Test that due rows reach the broker once, in order, and leave the outbox."""
+    borrow_ids = _seed_outbox(task_db, 3)
+    with Connection("memory://") as conn:
+        producer = email_tasks.app.amqp.Producer(conn)
+        assert dispatch_once("celery", batch_size=2, producer=producer) == \
+            {"claimed": 2, "published": 2, "tasks": 2, "failed": 0}
+        assert dispatch_once("celery", batch_size=2, producer=producer)["published"] == 1
+        assert dispatch_once("celery", batch_size=2, producer=producer)["claimed"] == 0
+
+        queue = conn.SimpleQueue(email_tasks.app.conf.task_default_queue)
+        messages = [queue.get(timeout=1) for _ in borrow_ids]
+        queue.close()
+    assert [message.headers["task"] for message in messages] == ["app.tasks.email_tasks.send_borrow_email"] * 3
+    assert [message.payload[0] for message in messages] == [[borrow_id] for borrow_id in borrow_ids]
+    task_db.expire_all()
+    assert task_db.query(OutboxMessage).count() == 0
+
+
+def test_failed_publish_backs_off_and_keeps_rest(task_db: Session):
+    """Test that a broker failure stops the batch and pushes the failing row back."""
+    _seed_outbox(task_db, 3)
+    published = []
+
+    def publish(task, args, task_id):
+        if len(published) == 1:
+            raise ConnectionError("broker unreachable")
+        published.append(task_id)
+
+    session = get_session_factory()()
+    try:
+        result = dispatch_outbox(session, publish, batch_size=10, retry_seconds=30)
+    finally:
+        session.close()
+    assert result == {"claimed": 3, "published": 1, "tasks": 1, "failed": 1}
+    task_db.expire_all()
+    failed, waiting = task_db.query(OutboxMessage).order_by(OutboxMessage.id).all()
+    assert (failed.attempts, failed.last_error) == (1, "broker unreachable")
+    assert failed.available_at > datetime.now()
+    assert (waiting.attempts, waiting.available_at <= datetime.now()) == (0, True)
+
+
+def test_direct_mode_sends_without_broker(task_db: Session):
+    """Test that direct mode runs the notification tasks in the dispatcher."""
+    _seed_outbox(task_db, 2)
+    pool = MagicMock(send=AsyncMock(return_value={"status": "Email sent"}))
+    with patch("app.tasks.email_tasks.get_smtp_pool", return_value=pool):
+        assert dispatch_once("direct")["published"] == 2
+    assert pool.send.await_count == 2
+    with pytest.raises(ValueError):
+        dispatch_once("kafka")
+
+
+def test_direct_mode_keeps_rows_whose_email_failed(task_db: Session):
+    """Test that an SMTP failure leaves the row in the outbox to retry with backoff."""
+    _seed_outbox(task_db, 1)
+    pool = MagicMock(send=AsyncMock(return_value={"error": "SMTP unavailable"}))
+    with patch("app.tasks.email_tasks.get_smtp_pool", return_value=pool):
+        assert dispatch_once("direct") == {"claimed": 1, "published": 0, "tasks": 0, "failed": 1}
+    assert pool.send.await_count == 1
+    task_db.expire_all()
+    row = task_db.query(OutboxMessage).one()
+    assert row.attempts == 1 and "SMTP unavailable" in row.last_error
+    assert row.available_at > datetime.now()
+
+
+class _MarkerRedis:
+    """Sync stand-in for the SET NX / DELETE calls of the delivery markers."""
+
+    def __init__(self):
+        self.keys = set()
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys.add(key)
+        return True
+
+    def delete(self, *keys):
+        self.keys.difference_update(keys)
+
+
+def test_republished_outbox_task_is_delivered_once(task_db: Session, monkeypatch):
+    """Test that a second publish of the same outbox row does not send again."""
+    borrow_id, = _seed_outbox(task_db, 1)
+    markers = _MarkerRedis()
+    monkeypatch.setattr(email_tasks, "_dedup_redis", lambda: markers)
+    task = email_tasks.send_borrow_email
+    failing = MagicMock(send=AsyncMock(return_value={"error": "SMTP unavailable"}))
+    with patch("app.tasks.email_tasks.get_smtp_pool", return_value=failing):
+        with pytest.raises(email_tasks.EmailDeliveryError):
+            task.apply(args=[borrow_id], task_id="outbox-1", throw=True, retries=task.max_retries)
+    assert markers.keys == set()
+
+    pool = MagicMock(send=AsyncMock(return_value={"status": "Email sent"}))
+    with patch("app.tasks.email_tasks.get_smtp_pool", return_value=pool):
+        assert task.apply(args=[borrow_id], task_id="outbox-1").get() == {"status": "Borrow email sent"}
+        assert task.apply(args=[borrow_id], task_id="outbox-1").get() == {"status": "Already delivered"}
+    assert pool.send.await_count == 1
+
+
+def test_member_notifications_coalesce_into_one_digest(task_db: Session):
+    """Test that a member's burst becomes one digest once the first row is due."""
+    book = Book(title="Dune", author="Frank Herbert", total_copies=20, available_copies=0)
+    reader = Member(email="reader@example.com", name="Reader", hashed_password="hashed")
+    other = Member(email="other@example.com", name="Other", hashed_password="hashed")
+    task_db.add_all([book, reader, other])
+    task_db.flush()
+    borrows = [Borrow(book_id=book.id, member_id=reader.id) for _ in range(12)]
+    late = Borrow(book_id=book.id, member_id=reader.id, created_at=datetime.now() - timedelta(days=30))
+    waiting = Borrow(book_id=book.id, member_id=other.id)
+    task_db.add_all([*borrows, late, waiting])
+    task_db.flush()
+    due, pending = datetime.now() - timedelta(seconds=1), datetime.now() + timedelta(minutes=1)
+    task_db.add_all([OutboxMessage(task="send_borrow_email", payload=[borrow.id], member_id=reader.id,
+                                   available_at=due if i == 0 else pending)
+                     for i, borrow in enumerate(borrows)])
+    task_db.add_all([
+        OutboxMessage(task="send_overdue_emails", payload=[[late.id]], member_id=reader.id, available_at=pending),
+        OutboxMessage(task="send_borrow_email", payload=[waiting.id], member_id=other.id, available_at=pending),
+    ])
+    task_db.commit()
+
+    pool = MagicMock(send=AsyncMock(return_value={"status": "Email sent"}))
+    with patch("app.tasks.email_tasks.get_smtp_pool", return_value=pool):
+        assert dispatch_once("direct") == {"claimed": 13, "published": 13, "tasks": 1, "failed": 0}
+    message = pool.send.await_args.args[0]
+    assert message["To"] == "reader@example.com"
+    assert message["Subject"] == "Your library activity: 12 borrowed, 1 overdue"
+    body = message.get_content()
+    assert body.count("- Dune, due back by") == 12 and "Overdue, please return:" in body
+    task_db.expire_all()
+    assert [row.member_id for row in task_db.query(OutboxMessage)] == [other.id]
+
+
+def test_single_notification_keeps_its_own_message(task_db: Session):
+    """Test that a digest of one event is sent with the usual template."""
+    _seed_outbox(task_db, 1)
+    row = task_db.query(OutboxMessage).one()
+    pool = MagicMock(send=AsyncMock(return_value={"status": "Email sent"}))
+    with patch("app.tasks.email_tasks.get_smtp_pool", return_value=pool):
+        result = email_tasks.send_notification_digest.apply(
+            args=[1, {"borrowed": row.payload, "returned": [999]}]).get()
+    assert result == {"status": "Digest email sent", "count": 1}
+    assert pool.send.await_args.args[0]["Subject"] == "Book Borrowed: 1984"
+
+
+def test_outbox_rows_wait_for_the_digest_window(monkeypatch):
+    """Test that only member rows are held back, and a zero window sends right away."""
+    monkeypatch.setattr("app.core.config.settings.NOTIFICATION_DIGEST_WINDOW", 60)
+    held = outbox_row("send_borrow_emails", [1, 2], member_id=7)
+    assert held["member_id"] == 7 and held["available_at"] > datetime.now() + timedelta(seconds=50)
+    assert outbox_row("send_borrow_email", 1)["available_at"] <= datetime.now()
+    monkeypatch.setattr("app.core.config.settings.NOTIFICATION_DIGEST_WINDOW", 0)
+    assert outbox_row("send_return_email", 1, member_id=7)["member_id"] is None
+    with pytest.raises(ValueError):
+        outbox_row("send_emails", [])